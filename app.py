@@ -1,17 +1,44 @@
 #!/usr/bin/env python3
 
+import asyncio
+import atexit
+import contextvars
+import base64
+import bisect
+import hmac
 import os
 import json
 import requests
 from datetime import datetime
-from typing import Dict, List, Optional
-import re
+from typing import Dict, Iterable, Iterator, List, MutableMapping, Optional, Set, Tuple, Union
+import threading
+import time
+from functools import wraps
+from itertools import count
 
 from flask import Flask, request, jsonify, render_template
 from dotenv import load_dotenv
 from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 
+from call_session import CallSession
+from caterers import FIELDS as CATERER_FIELDS, Caterer, SearchHit
+from area_matrix import AreaDistanceMatrix
+from catalog_loader import CatalogLoader
+from catalog_snapshot import CatalogSnapshot, write_snapshot
+from context_store import ContextStore
+from state_backends import ContextSync, StateBackend, make_backend
+from intent_engine import IntentEngine, MatchSet
+from gazetteer import DEFAULT_GAZETTEER_PATH, Gazetteer
+from geocoding import AsyncNominatim, GeocodeCache, normalize_query
+from geo_index import GridIndex, HAVERSINE_TOLERANCE
+from location_resolver import LocationResolver
+from metrics import Tracer, prometheus_histograms, prometheus_values
+from profiler import SamplingProfiler
+from ranking import Ranker, RankQuery
+from response_cache import CachedResponse, ResponseCache, encode_json, make_response
+from text_index import TermIndex, normalize_term
+
 # Load environment variables
 load_dotenv()
 
@@ -31,14 +58,205 @@ try:
 except (ValueError, AttributeError):
     MAX_SEARCH_RADIUS = 50.0  # Default fallback
 
+# Optional catalog file (.jsonl, .csv or SQLite) replacing the built-in demo caterers
+CATALOG_PATH = os.getenv('CATALOG_PATH')
+CATALOG_BATCH_SIZE = int(os.getenv('CATALOG_BATCH_SIZE', '1000'))
+# Binary snapshot of the loaded catalog and its indexes, written whenever a catalog file
+# finishes loading and mapped at startup instead of re-parsing CATALOG_PATH
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH')  # e.g. catalog.snap
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# Distance precision: "haversine" (fast, ~0.5% error) or "geodesic" (exact refinement of final results)
+DISTANCE_PRECISION = os.getenv('DISTANCE_PRECISION', 'haversine').lower()
+
+# Spatial index grid cell size in degrees (~7 miles of latitude)
+SPATIAL_CELL_SIZE = float(os.getenv('SPATIAL_CELL_SIZE', '0.1'))
+
+# Above this fraction of the catalog, text matches are intersected with the spatial index
+# instead of having every match's distance computed directly
+SPATIAL_SELECTIVITY = 0.05
+
+# Geocode cache configuration
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '1024'))
+GEOCODE_CACHE_TTL = float(os.getenv('GEOCODE_CACHE_TTL', str(7 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL = float(os.getenv('GEOCODE_NEGATIVE_TTL', '3600'))
+GEOCODE_CACHE_PATH = os.getenv('GEOCODE_CACHE_PATH')  # e.g. geocode_cache.db
+
+# Async geocoding (ASGI server): per-request timeout in seconds and pooled connections
+GEOCODER_TIMEOUT = float(os.getenv('GEOCODER_TIMEOUT', '2.0'))
+GEOCODER_MAX_CONNECTIONS = int(os.getenv('GEOCODER_MAX_CONNECTIONS', '20'))
+
+# Seconds of a voice turn that may be spent waiting on the remote geocoder before the
+# agent answers "let me check" and finishes the lookup in the background
+GEOCODE_DEADLINE = float(os.getenv('GEOCODE_DEADLINE', '0.8'))
+
+# Offline place names (city, neighborhood, ZIP -> centroid) answered without the geocoder
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', DEFAULT_GAZETTEER_PATH)
+
+# File holding precomputed service area -> caterer distances, shared read-only by
+# workers. Unset disables the matrix: it costs 4 bytes per area per caterer
+AREA_MATRIX_PATH = os.getenv('AREA_MATRIX_PATH')  # e.g. area_matrix.npy
+# Gazetteer entry kinds that count as service areas (ZIP codes are left out)
+AREA_MATRIX_KINDS = tuple(kind.strip() for kind in os.getenv('AREA_MATRIX_KINDS', 'city,neighborhood').split(',') if kind.strip())
+
+# Conversation context limits: calls kept in memory, idle expiry, sweep interval
+# (seconds) and turns of dialogue history kept per call
+CONTEXT_MAX_CALLS = int(os.getenv('CONTEXT_MAX_CALLS', '10000'))
+CONTEXT_IDLE_TTL = float(os.getenv('CONTEXT_IDLE_TTL', '1800'))
+CONTEXT_SWEEP_INTERVAL = float(os.getenv('CONTEXT_SWEEP_INTERVAL', '60'))
+DIALOGUE_HISTORY_LIMIT = int(os.getenv('DIALOGUE_HISTORY_LIMIT', '50'))
+
+# Shared conversation state for multi-worker deployments: "memory", "sqlite" or "redis"
+# (unset keeps contexts in this process only). STATE_BACKEND_URL is the SQLite path or
+# Redis URL; writes are batched every STATE_FLUSH_INTERVAL seconds (0 writes through)
+STATE_BACKEND = os.getenv('STATE_BACKEND')
+STATE_BACKEND_URL = os.getenv('STATE_BACKEND_URL')
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', '0.05'))
+
+# Encoded /services and /search responses kept per catalog version (0 disables)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '512'))
+
+# Stage timing of the webhook hot path, exported at /metrics; WEBHOOK_TIMING also adds
+# each turn's stage timings (ms) to the webhook response, for debugging
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+WEBHOOK_TIMING = os.getenv('WEBHOOK_TIMING', 'false').lower() == 'true'
+
+# On-demand sampling profiler at /admin/profile (also requires ADMIN_TOKEN)
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+
+# /services paging: default and largest page, and caterers read per batch when streaming NDJSON
+SERVICES_PAGE_SIZE = 100
+SERVICES_MAX_PAGE_SIZE = 1000
+SERVICES_STREAM_BATCH = 500
+
+# Ranked caterers remembered per call for follow-ups such as "the second one"
+RECOMMENDATIONS_KEPT = 10
+
+# Most searches accepted in one /search/batch request
+SEARCH_BATCH_MAX = 1000
+
+tracer = Tracer(enabled=METRICS_ENABLED)
+profiler = SamplingProfiler()
+
 # Initialize geocoder
 geolocator = Nominatim(user_agent="ezcaters_voice_agent")
+async_geolocator = AsyncNominatim(
+    user_agent="ezcaters_voice_agent",
+    timeout=GEOCODER_TIMEOUT,
+    max_connections=GEOCODER_MAX_CONNECTIONS
+)
+geocode_cache = GeocodeCache(
+    geolocator,
+    max_entries=GEOCODE_CACHE_SIZE,
+    ttl=GEOCODE_CACHE_TTL,
+    negative_ttl=GEOCODE_NEGATIVE_TTL,
+    db_path=GEOCODE_CACHE_PATH,
+    async_geocoder=async_geolocator
+)
+def load_gazetteer(path: str) -> Gazetteer:
+    """The bundled place index, or an empty one (everything goes to the geocoder) if it can't be read"""
+    try:
+        return Gazetteer.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Gazetteer error: {e}")
+        return Gazetteer()
+
+location_resolver = LocationResolver(
+    geocode_cache,
+    gazetteer=load_gazetteer(GAZETTEER_PATH),
+    deadline=GEOCODE_DEADLINE,
+    max_workers=GEOCODER_MAX_CONNECTIONS
+)
+
+def open_area_matrix() -> Optional[AreaDistanceMatrix]:
+    """Distance matrix over the service-area centroids, mapped from AREA_MATRIX_PATH; None unless that is set"""
+    if not AREA_MATRIX_PATH:
+        return None
+    areas = [(place.name, place.coordinates) for place in location_resolver.gazetteer.places
+             if place.kind in AREA_MATRIX_KINDS]
+    return AreaDistanceMatrix.open(AREA_MATRIX_PATH, areas)
+
+def distance_miles(origin: Tuple[float, float], destination: Tuple[float, float]) -> float:
+    """Geodesic distance between two (latitude, longitude) points in miles"""
+    return geodesic(origin, destination).miles
+
+def synchronized(method):
+    """Run a CateringService method under the catalog lock so searches never see a half-applied batch"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def traced(stage: str):
+    """Time every call of a function as a tracer stage"""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
 
 class CateringService:
     """Mock catering service database for demonstration"""
     
-    def __init__(self):
-        self.services = [
+    _generations = count(1)
+    
+    def __init__(self, services: Optional[List[Dict]] = None, precision: str = DISTANCE_PRECISION,
+                 area_matrix: Optional[AreaDistanceMatrix] = None):
+        self.precision = precision
+        self.area_matrix = area_matrix
+        self.snapshot: Optional[Dict] = None
+        self.generation = next(self._generations)
+        self.revision = 0
+        self._lock = threading.RLock()
+        self._caterers: MutableMapping[int, Caterer] = {}
+        # id -> catalog position; None until first use in a catalog opened from a snapshot
+        self._catalog_order: Optional[Dict[int, int]] = {}
+        self._next_position = 0
+        # Positions in catalog order with their ids (None once removed), for cursor paging
+        self._order_positions: List[int] = []
+        self._order_ids: List[Optional[int]] = []
+        self._order_holes = 0
+        self.spatial_index = GridIndex(cell_size=SPATIAL_CELL_SIZE)
+        self.cuisine_index = TermIndex()
+        self.specialty_index = TermIndex()
+        self.ranker = Ranker()
+        for service in (services if services is not None else self.default_services()):
+            self.add_service(service)
+    
+    @classmethod
+    def from_snapshot(cls, snapshot: CatalogSnapshot, precision: str = DISTANCE_PRECISION,
+                      area_matrix: Optional[AreaDistanceMatrix] = None) -> "CateringService":
+        """Open a catalog from a mapped snapshot without re-indexing it
+        
+        Columns stay views of the mapping until the catalog first changes, and
+        id lookups are built on first use. An area matrix saved for this
+        catalog is taken over as it is; otherwise each caterer's column is
+        reused or computed.
+        """
+        service = cls(services=[], precision=precision, area_matrix=area_matrix)
+        ids, lats, lons = snapshot.coordinates()
+        service._caterers = snapshot.records()
+        service._catalog_order = None
+        service._next_position = len(ids)
+        service._order_positions = range(len(ids))
+        service._order_ids = ids
+        service.spatial_index = GridIndex.from_arrays(ids, lats, lons, cell_size=SPATIAL_CELL_SIZE)
+        service.cuisine_index = TermIndex.from_postings(snapshot.postings('cuisine_index'))
+        service.specialty_index = TermIndex.from_postings(snapshot.postings('specialty_index'))
+        service.ranker = Ranker.from_snapshot(snapshot)
+        if area_matrix is not None and not area_matrix.adopt(snapshot.column('id'), lats, lons):
+            for service_id, lat, lon in zip(ids, lats.tolist(), lons.tolist()):
+                area_matrix.set(service_id, lat, lon)
+        service.snapshot = snapshot.meta
+        return service
+    
+    @staticmethod
+    def default_services() -> List[Dict]:
+        """Built-in demo catalog"""
+        return [
             {
                 "id": 1,
                 "name": "Bella's Italian Catering",
@@ -106,153 +324,595 @@ class CateringService:
             }
         ]
     
-    def search_by_cuisine(self, cuisine: str) -> List[Dict]:
+    @synchronized
+    def add_services(self, services: Iterable[Union[Dict, Caterer]]) -> None:
+        """Add a batch of caterers while holding the lock once"""
+        for service in services:
+            self.add_service(service)
+    
+    @synchronized
+    def add_service(self, service: Union[Dict, Caterer]) -> Caterer:
+        """Add a caterer (or replace one with the same id) and index it"""
+        caterer = service if isinstance(service, Caterer) else Caterer.from_dict(service)
+        if caterer.id in self._caterers:
+            self.remove_service(caterer.id)
+        self.revision += 1
+        self._caterers[caterer.id] = caterer
+        self._catalog_positions()[caterer.id] = self._next_position
+        self._order_positions.append(self._next_position)
+        self._order_ids.append(caterer.id)
+        self._next_position += 1
+        self.spatial_index.insert(caterer.id, caterer.latitude, caterer.longitude)
+        if self.area_matrix is not None:
+            self.area_matrix.set(caterer.id, caterer.latitude, caterer.longitude)
+        self.cuisine_index.add(caterer.id, [caterer.cuisine])
+        self.specialty_index.add(caterer.id, caterer.specialties)
+        self.ranker.add(caterer)
+        return caterer
+    
+    @synchronized
+    def remove_service(self, service_id: int) -> Optional[Caterer]:
+        """Remove a caterer from the catalog and its indexes"""
+        caterer = self._caterers.pop(service_id, None)
+        if caterer is None:
+            return None
+        self.revision += 1
+        self._forget_position(self._catalog_positions().pop(service_id))
+        self.spatial_index.remove(service_id)
+        if self.area_matrix is not None:
+            self.area_matrix.remove(service_id)
+        self.cuisine_index.remove(service_id, [caterer.cuisine])
+        self.specialty_index.remove(service_id, caterer.specialties)
+        self.ranker.remove(service_id)
+        return caterer
+    
+    def _catalog_positions(self) -> Dict[int, int]:
+        """id -> catalog position, built on first use in a catalog opened from a snapshot
+        
+        The cursor order is copied then too, since it starts out shared with the spatial index.
+        """
+        if self._catalog_order is None:
+            self._catalog_order = {service_id: position for position, service_id in enumerate(self._order_ids)}
+            self._order_positions = list(self._order_positions)
+            self._order_ids = list(self._order_ids)
+        return self._catalog_order
+    
+    def _forget_position(self, position: int) -> None:
+        """Leave a hole in the cursor order, compacting once holes outnumber caterers"""
+        self._order_ids[bisect.bisect_left(self._order_positions, position)] = None
+        self._order_holes += 1
+        if self._order_holes > 1024 and self._order_holes * 2 > len(self._order_ids):
+            live = [(p, i) for p, i in zip(self._order_positions, self._order_ids) if i is not None]
+            self._order_positions = [p for p, _ in live]
+            self._order_ids = [i for _, i in live]
+            self._order_holes = 0
+    
+    @synchronized
+    def page_after(self, cursor: Optional[int], limit: int) -> Tuple[List[Caterer], Optional[int]]:
+        """Up to limit caterers after a catalog position, in catalog order, and the cursor of the next page
+        
+        Cursors are catalog positions, so caterers added while a client pages
+        through the catalog show up on later pages and removals never shift them.
+        """
+        positions, ids = self._order_positions, self._order_ids
+        index = bisect.bisect_right(positions, -1 if cursor is None else cursor)
+        page, last = [], None
+        while index < len(ids) and len(page) < limit:
+            if ids[index] is not None:
+                page.append(self._caterers[ids[index]])
+                last = index
+            index += 1
+        while index < len(ids) and ids[index] is None:
+            index += 1
+        return page, (positions[last] if index < len(ids) and last is not None else None)
+    
+    @property
+    def version(self) -> Tuple[int, int]:
+        """Changes whenever the catalog does; part of every response cache key"""
+        return (self.generation, self.revision)
+    
+    def get_service(self, service_id: int) -> Optional[Caterer]:
+        """Look up a caterer by id"""
+        return self._caterers.get(service_id)
+    
+    @property
+    def services(self) -> List[Caterer]:
+        """Every caterer, in catalog order"""
+        with self._lock:
+            return list(self._caterers.values())
+    
+    def __len__(self) -> int:
+        return len(self._caterers)
+    
+    @synchronized
+    def serialize(self, hits: Iterable[SearchHit]) -> List[Dict]:
+        """Turn search hits into JSON-ready dicts, skipping caterers no longer in the catalog"""
+        results = []
+        for hit in hits:
+            caterer = self._caterers.get(hit.id)
+            if caterer is not None:
+                data = caterer.to_dict(hit.distance)
+                if hit.score is not None:
+                    data["score"] = round(hit.score, 4)
+                results.append(data)
+        return results
+    
+    @traced('search')
+    @synchronized
+    def search_by_cuisine(self, cuisine: str) -> List[SearchHit]:
         """Search catering services by cuisine type"""
-        return [service for service in self.services 
-                if cuisine.lower() in service['cuisine'].lower()]
+        return self._in_catalog_order(self.cuisine_index.search(cuisine))
     
-    def search_by_location(self, location: str, radius: float = MAX_SEARCH_RADIUS) -> List[Dict]:
+    @traced('geocode')
+    def resolve_location(self, location: str) -> Optional[Tuple[float, float]]:
+        """Geocode a location once, returning (latitude, longitude) or None"""
+        return location_resolver.resolve(location, timeout=GEOCODER_TIMEOUT).coordinates
+    
+    async def resolve_location_async(self, location: str) -> Optional[Tuple[float, float]]:
+        """Geocode without blocking the event loop, returning (latitude, longitude) or None"""
+        with tracer.span('geocode'):
+            return (await location_resolver.resolve_async(location, timeout=GEOCODER_TIMEOUT)).coordinates
+    
+    async def search_by_location_async(self, location: str, radius: float = MAX_SEARCH_RADIUS) -> List[SearchHit]:
+        """Async variant of search_by_location"""
+        coordinates = await self.resolve_location_async(location)
+        return self.search_by_location(location, radius, coordinates=coordinates) if coordinates else []
+    
+    @traced('search')
+    def search_by_location(self, location: str, radius: float = MAX_SEARCH_RADIUS,
+                           coordinates: Optional[Tuple[float, float]] = None) -> List[SearchHit]:
         """Search catering services by location"""
-        try:
-            user_location = geolocator.geocode(location)
-            if not user_location:
-                return []
-            
-            user_coords = (user_location.latitude, user_location.longitude)
-            nearby_services = []
-            
-            for service in self.services:
-                distance = geodesic(user_coords, service['coordinates']).miles
-                if distance <= radius:
-                    service_copy = service.copy()
-                    service_copy['distance'] = round(distance, 1)
-                    nearby_services.append(service_copy)
-            
-            return sorted(nearby_services, key=lambda x: x['distance'])
-        except Exception as e:
-            print(f"Location search error: {e}")
+        user_coords = coordinates or self.resolve_location(location)
+        if not user_coords:
             return []
+        with self._lock:
+            return self._within_radius_indexed(user_coords, radius)
     
-    def search_by_menu_item(self, menu_item: str) -> List[Dict]:
+    @traced('search')
+    @synchronized
+    def nearest(self, coordinates: Tuple[float, float], k: int = 3,
+                radius: float = MAX_SEARCH_RADIUS) -> List[SearchHit]:
+        """Return the k caterers closest to coordinates, within radius"""
+        row = self._area_row(coordinates)
+        if row is not None and self.precision != 'geodesic':
+            return [SearchHit(service_id, distance) for service_id, distance in
+                    self.area_matrix.within_radius(row, radius, k)]
+        hits = [SearchHit(service_id, distance) for service_id, distance in
+                self.spatial_index.nearest(*coordinates, k, max_radius=self._candidate_radius(radius))]
+        if self.precision == 'geodesic' and hits:
+            # Haversine order can differ slightly from geodesic order; refine everything close to the k-th hit
+            hits = self._within_radius_indexed(coordinates, min(hits[-1].distance * (1 + HAVERSINE_TOLERANCE), radius))
+        return hits[:k]
+    
+    @traced('search')
+    @synchronized
+    def search_by_menu_item(self, menu_item: str) -> List[SearchHit]:
         """Search catering services by menu item"""
-        results = []
-        for service in self.services:
-            if any(menu_item.lower() in specialty.lower() for specialty in service['specialties']):
-                results.append(service)
-        return results
+        return self._in_catalog_order(self.specialty_index.search(menu_item))
+    
+    def _in_catalog_order(self, service_ids: Set[int]) -> List[SearchHit]:
+        """Return hits for a set of ids, in the order they were added to the catalog"""
+        return [SearchHit(service_id) for service_id in sorted(service_ids, key=self._catalog_positions().__getitem__)]
+    
+    @traced('search')
+    @synchronized
+    def search_by_menu_item_near(self, menu_item: str, coordinates: Tuple[float, float],
+                                 radius: float = MAX_SEARCH_RADIUS) -> List[SearchHit]:
+        """Search catering services offering a menu item within radius of already-resolved coordinates"""
+        return self.within_radius(self.specialty_index.search(menu_item), coordinates, radius)
+    
+    @synchronized
+    def within_radius(self, service_ids: Iterable[int], user_coords: Tuple[float, float],
+                      radius: float) -> List[SearchHit]:
+        """Distances from user_coords to the given caterers, keeping those within radius, closest first"""
+        ids = list(service_ids)
+        if not ids:
+            return []
+        columns = self.spatial_index.columns
+        distances = columns.distances(*user_coords, columns.rows(ids))
+        limit = self._candidate_radius(radius)
+        hits = sorted((SearchHit(ids[i], float(distances[i])) for i in range(len(ids)) if distances[i] <= limit),
+                      key=lambda hit: hit.distance)
+        return self._refine(user_coords, hits, radius)
+    
+    @traced('search')
+    def search(self, cuisine: Optional[str] = None, menu_item: Optional[str] = None,
+               near=None, radius: float = MAX_SEARCH_RADIUS, min_rating: Optional[float] = None,
+               price_range=None, max_min_order: Optional[float] = None,
+               limit: Optional[int] = None, offset: int = 0, budget: Optional[float] = None,
+               preferred_price: Optional[str] = None) -> Dict:
+        """Search on any combination of criteria, intersecting index results cheapest first
+        
+        ``near`` is a location string or (latitude, longitude). ``price_range`` is a
+        single value such as "$$" or a list of accepted values. Results are ranked
+        by relevance (see ranking.Ranker): distance, rating, how well the cuisine or
+        menu item matched, and fit with the optional ``budget`` and ``preferred_price``,
+        which only reorder results. The returned page is described by ``total``,
+        ``offset`` and ``limit``.
+        """
+        # Geocode before taking the lock so a slow lookup never blocks other searches
+        coordinates = None
+        if near:
+            coordinates = self.resolve_location(near) if isinstance(near, str) else tuple(near)
+            if not coordinates:
+                return self._page([], limit, offset)
+        
+        with self._lock:
+            return self._search(cuisine, menu_item, coordinates, radius, min_rating,
+                                price_range, max_min_order, limit, offset, budget, preferred_price)
+    
+    async def search_async(self, near=None, **criteria) -> Dict:
+        """Async variant of search; only geocoding a ``near`` string awaits"""
+        if isinstance(near, str) and near:
+            near = await self.resolve_location_async(near)
+            if not near:
+                return self._page([], criteria.get('limit'), criteria.get('offset', 0))
+        return self.search(near=near, **criteria)
+    
+    @traced('search')
+    def search_many(self, batch: List[Tuple[int, Dict]],
+                    coordinates: Optional[Tuple[float, float]] = None) -> List[Tuple[int, Dict]]:
+        """Evaluate searches that share one location (or have none) in a single pass
+        
+        ``batch`` holds (position, search keyword arguments) pairs whose ``near``
+        resolved to ``coordinates``. The caterers around them are found once, out
+        to the widest radius asked for, and each search cuts that distance-sorted
+        list at its own radius. Searches whose location didn't resolve get empty pages.
+        """
+        with self._lock:
+            nearby = distances = None
+            if coordinates:
+                widest = max(criteria.get('radius', MAX_SEARCH_RADIUS) for _, criteria in batch)
+                nearby = self._within_radius_indexed(coordinates, widest)
+                distances = [hit.distance for hit in nearby]
+            
+            pages = []
+            for position, criteria in batch:
+                limit, offset = criteria.get('limit'), criteria.get('offset', 0)
+                if criteria.get('near') and not coordinates:
+                    pages.append((position, self._page([], limit, offset)))
+                    continue
+                radius = criteria.get('radius', MAX_SEARCH_RADIUS)
+                within = nearby[:bisect.bisect_right(distances, radius)] if nearby is not None else None
+                pages.append((position, self._search(
+                    criteria.get('cuisine'), criteria.get('menu_item'), coordinates, radius,
+                    criteria.get('min_rating'), criteria.get('price_range'), criteria.get('max_min_order'),
+                    limit, offset, criteria.get('budget'), criteria.get('preferred_price'), nearby=within)))
+            return pages
+    
+    def _search(self, cuisine, menu_item, coordinates, radius, min_rating,
+                price_range, max_min_order, limit, offset, budget=None, preferred_price=None,
+                nearby: Optional[List[SearchHit]] = None) -> Dict:
+        # Text indexes first: their id sets are cheap to build and usually small
+        candidate_ids = None
+        matches = []
+        for index, query in ((self.cuisine_index, cuisine), (self.specialty_index, menu_item)):
+            if query:
+                weights = index.search_weighted(query)
+                matches.append(weights)
+                ids = weights.keys()
+                candidate_ids = ids if candidate_ids is None else (
+                    candidate_ids & ids if len(candidate_ids) <= len(ids) else ids & candidate_ids)
+                if not candidate_ids:
+                    return self._page([], limit, offset)
+        
+        tiebreak = None
+        if coordinates:
+            if nearby is not None:
+                # Already found for this location by search_many
+                hits = nearby if candidate_ids is None else [hit for hit in nearby if hit.id in candidate_ids]
+            elif candidate_ids is None or len(candidate_ids) > len(self._caterers) * SPATIAL_SELECTIVITY:
+                hits = self._within_radius_indexed(coordinates, radius)
+                if candidate_ids is not None:
+                    hits = [hit for hit in hits if hit.id in candidate_ids]
+            else:
+                hits = self.within_radius(candidate_ids, coordinates, radius)
+        elif candidate_ids is not None:
+            # Equal scores fall back to catalog order without sorting every candidate by it
+            hits = [SearchHit(service_id) for service_id in candidate_ids]
+            tiebreak = self._catalog_positions()
+        else:
+            hits = None
+        
+        # Only the hits up to the end of the requested page are ever put in order
+        end = None if limit is None else offset + limit
+        rank_query = RankQuery(budget, preferred_price, matches)
+        filtered = min_rating is not None or price_range or max_min_order is not None
+        if hits is None:
+            if not filtered:
+                # The whole catalog: rank the precomputed columns without a hit per caterer
+                return {
+                    "results": self.ranker.top_all(rank_query, end, self._catalog_positions())[offset:],
+                    "total": len(self._caterers),
+                    "offset": offset,
+                    "limit": limit
+                }
+            hits = [SearchHit(service_id) for service_id in self._caterers]
+        
+        # Attribute filters run last, over the surviving candidates only
+        if filtered:
+            accepted_prices = {price_range} if isinstance(price_range, str) else set(price_range or ())
+            caterers = self._caterers
+            hits = [hit for hit in hits if self._matches_attributes(
+                caterers[hit.id], min_rating, accepted_prices, max_min_order)]
+        
+        ranked = self.ranker.top(hits, rank_query, end, tiebreak)
+        return {
+            "results": ranked[offset:],
+            "total": len(hits),
+            "offset": offset,
+            "limit": limit
+        }
+    
+    @staticmethod
+    def _matches_attributes(caterer: Caterer, min_rating: Optional[float], accepted_prices: Set[str],
+                            max_min_order: Optional[float]) -> bool:
+        if min_rating is not None and caterer.rating < min_rating:
+            return False
+        if accepted_prices and caterer.price_range not in accepted_prices:
+            return False
+        if max_min_order is not None and caterer.min_order > max_min_order:
+            return False
+        return True
+    
+    @staticmethod
+    def _page(hits: List[SearchHit], limit: Optional[int], offset: int) -> Dict:
+        """Slice one page out of the ranked hits"""
+        end = None if limit is None else offset + limit
+        return {
+            "results": hits[offset:end],
+            "total": len(hits),
+            "offset": offset,
+            "limit": limit
+        }
+    
+    def _within_radius_indexed(self, user_coords: Tuple[float, float], radius: float) -> List[SearchHit]:
+        """Radius query closest first: a precomputed slice for known areas, the spatial index otherwise"""
+        row = self._area_row(user_coords)
+        if row is not None:
+            neighbours = self.area_matrix.within_radius(row, self._candidate_radius(radius))
+        else:
+            neighbours = self.spatial_index.within_radius(*user_coords, self._candidate_radius(radius))
+        hits = [SearchHit(service_id, distance) for service_id, distance in neighbours]
+        return self._refine(user_coords, hits, radius)
+    
+    def _area_row(self, coordinates: Tuple[float, float]) -> Optional[int]:
+        """Matrix row when coordinates are a service-area centroid, which is how known areas resolve"""
+        return self.area_matrix.area_row(coordinates) if self.area_matrix is not None else None
+    
+    def _candidate_radius(self, radius: float) -> float:
+        """Widen the haversine cut-off when results will be refined geodesically"""
+        return radius * (1 + HAVERSINE_TOLERANCE) if self.precision == 'geodesic' else radius
+    
+    def _refine(self, user_coords: Tuple[float, float], hits: List[SearchHit],
+                radius: float) -> List[SearchHit]:
+        """Replace haversine distances with exact geodesic ones in geodesic precision mode"""
+        if self.precision != 'geodesic':
+            return hits
+        caterers = self._caterers
+        refined = [hit._replace(distance=distance_miles(user_coords, caterers[hit.id].coordinates)) for hit in hits]
+        return sorted((hit for hit in refined if hit.distance <= radius), key=lambda hit: hit.distance)
+
+def open_catalog_snapshot() -> Optional[CateringService]:
+    """The catalog from CATALOG_SNAPSHOT_PATH, unless it is missing, unreadable or older than CATALOG_PATH"""
+    if not CATALOG_SNAPSHOT_PATH or not os.path.exists(CATALOG_SNAPSHOT_PATH):
+        return None
+    if CATALOG_PATH and os.path.exists(CATALOG_PATH) and \
+            os.path.getmtime(CATALOG_PATH) > os.path.getmtime(CATALOG_SNAPSHOT_PATH):
+        return None
+    try:
+        return CateringService.from_snapshot(CatalogSnapshot(CATALOG_SNAPSHOT_PATH), area_matrix=open_area_matrix())
+    except (OSError, ValueError) as e:
+        print(f"Catalog snapshot error: {e}")
+        return None
+
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE)
 
-# Initialize catering service
-catering_service = CateringService()
+# Initialize catering service from a snapshot when there is a current one; otherwise a
+# configured catalog file is indexed in the background so the server can answer
+# requests while it loads
+catering_service = open_catalog_snapshot()
+catalog_from_snapshot = catering_service is not None
+if not catalog_from_snapshot:
+    catering_service = CateringService(services=[] if CATALOG_PATH else None, area_matrix=open_area_matrix())
+
+def publish_catalog(service: CateringService, source: Optional[str] = None) -> None:
+    """Atomically swap in a fully built catalog and persist its distance matrix and snapshot for other workers"""
+    global catering_service
+    catering_service = service
+    response_cache.clear()
+    # The lock is only held to copy what gets written, never across the disk writes
+    try:
+        if service.area_matrix is not None:
+            with service._lock:
+                exported = service.area_matrix.export()
+            service.area_matrix.save(exported=exported)
+        if source and CATALOG_SNAPSHOT_PATH:
+            write_snapshot(service, CATALOG_SNAPSHOT_PATH, source)
+    except (OSError, ValueError) as e:
+        print(f"Catalog persistence error: {e}")
+
+if not CATALOG_PATH:
+    publish_catalog(catering_service)
+
+catalog_loader = CatalogLoader(
+    factory=lambda: CateringService(services=[], area_matrix=open_area_matrix()),
+    publish=publish_catalog,
+    batch_size=CATALOG_BATCH_SIZE
+)
+if CATALOG_PATH and not catalog_from_snapshot:
+    catalog_loader.load_in_background(CATALOG_PATH, catering_service)
 
 class VoiceAssistant:
     """Voice assistant logic for handling customer inquiries with conversation memory"""
     
-    def __init__(self):
-        self.conversation_context = {}
+    def __init__(self, intent_engine: Optional[IntentEngine] = None,
+                 context_store: Optional[ContextStore] = None,
+                 state_backend: Optional[StateBackend] = None):
+        self.conversation_context = context_store if context_store is not None else ContextStore(
+            max_entries=CONTEXT_MAX_CALLS, idle_ttl=CONTEXT_IDLE_TTL)
+        self.intent_engine = intent_engine or IntentEngine()
+        self.state_sync = None
+        if state_backend is not None:
+            self.state_sync = ContextSync(
+                state_backend,
+                self.conversation_context,
+                history_limit=DIALOGUE_HISTORY_LIMIT,
+                ttl=CONTEXT_IDLE_TTL,
+                flush_interval=STATE_FLUSH_INTERVAL
+            )
     
     def process_inquiry(self, call_id: str, message: str, user_location: str = None) -> str:
         """Process customer inquiry and return appropriate response with conversation context"""
         
-        # Initialize or update conversation context
-        if call_id not in self.conversation_context:
-            self.conversation_context[call_id] = {
-                "stage": "greeting",
-                "preferences": {},
-                "location": user_location,
-                "recommendations": [],
-                "dialogue_history": [],
-                "last_intent": None,
-                "pending_actions": []
-            }
+        started = time.perf_counter()
+        context = self.open_session(call_id, user_location)
+        intent = self.begin_turn(context, message)
+        response = self.finish_turn(call_id, context, intent, message)
+        tracer.observe_turn(intent["type"], time.perf_counter() - started)
+        return response
+    
+    async def process_inquiry_async(self, call_id: str, message: str, user_location: str = None) -> str:
+        """Async variant of process_inquiry for the ASGI server
+        
+        Geocoding for the turn is awaited up front, so the rest of the turn runs
+        from cached coordinates and never blocks the event loop on the network.
+        Shared state backend I/O runs on a worker thread.
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if self.state_sync is not None:
+            # Run in a copy of this task's context so the worker thread's spans count towards the turn
+            context = await loop.run_in_executor(
+                None, contextvars.copy_context().run, self.open_session, call_id, user_location)
+        else:
+            context = self.open_session(call_id, user_location)
+        intent = self.begin_turn(context, message)
         
-        context = self.conversation_context[call_id]
+        location = intent.get("location") if intent["type"] == "location_inquiry" else None
+        with tracer.span('geocode'):
+            await context.resolved_coordinates_async(
+                lambda place: location_resolver.resolve_async(place, timeout=self.geocode_budget(context)), location)
         
+        if self.state_sync is not None:
+            response = await loop.run_in_executor(
+                None, contextvars.copy_context().run, self.finish_turn, call_id, context, intent, message)
+        else:
+            response = self.finish_turn(call_id, context, intent, message)
+        tracer.observe_turn(intent["type"], time.perf_counter() - started)
+        return response
+    
+    @traced('session')
+    def open_session(self, call_id: str, user_location: str = None) -> CallSession:
+        """Fetch the call's session, starting a new one on the first turn"""
+        # With a shared backend another worker may have handled the previous turn
+        if self.state_sync is not None:
+            context = self.state_sync.checkout(call_id)
+        else:
+            context = self.conversation_context.get(call_id)
+        if context is None:
+            context = CallSession(location=user_location, history_limit=DIALOGUE_HISTORY_LIMIT)
+            self.conversation_context[call_id] = context
+        return context
+    
+    @traced('intent')
+    def begin_turn(self, context: CallSession, message: str) -> Dict:
+        """Record the user's message and work out what they want"""
         # Add user message to dialogue history
-        context["dialogue_history"].append({
-            "speaker": "user",
-            "message": message,
-            "timestamp": datetime.now().isoformat()
-        })
+        context.record_user_turn(message)
         
         # Analyze intent with conversation context
         intent = self.analyze_intent_with_context(message, context)
-        context["last_intent"] = intent
-        
+        context.record_intent(intent)
+        return intent
+    
+    def finish_turn(self, call_id: str, context: CallSession, intent: Dict, message: str) -> str:
+        """Answer the analyzed message and save the session"""
         # Generate contextual response
-        response = self.generate_contextual_response(call_id, intent, message)
+        with tracer.span('respond'):
+            response = self.generate_contextual_response(call_id, intent, message)
         
         # Add assistant response to dialogue history
-        context["dialogue_history"].append({
-            "speaker": "assistant",
-            "message": response,
-            "timestamp": datetime.now().isoformat()
-        })
+        context.record_assistant_turn(response)
         
         # Update conversation stage
         self.update_conversation_stage(context, intent)
         
+        if self.state_sync is not None:
+            with tracer.span('commit'):
+                self.state_sync.commit(call_id, context)
+        
         return response
     
-    def analyze_intent_with_context(self, message: str, context: Dict) -> Dict:
+    def end_call(self, call_id: str) -> None:
+        """Drop a finished call's context, including from the shared backend"""
+        if self.state_sync is not None:
+            self.state_sync.discard(call_id)
+        else:
+            self.conversation_context.pop(call_id, None)
+    
+    def analyze_intent_with_context(self, message: str, context: CallSession) -> Dict:
         """Analyze customer intent using rule-based pattern matching with conversation context"""
         message_lower = message.lower().strip()
+        matches = self.intent_engine.match(message_lower)
         
-        # Check for continuation phrases that reference previous context
-        continuation_patterns = [
-            r'\b(yes|yeah|yep|sure|ok|okay|sounds good|that works|perfect)\b',
-            r'\b(no|nope|not really|maybe not|different|something else)\b',
-            r'\b(tell me more|more info|details|what else|continue)\b',
-            r'\b(the first one|first option|second one|third option)\b',
-            r'\b(call them|contact|phone|order|book)\b'
-        ]
+        # Budget and price words are remembered whatever the intent, to rank later searches
+        budget = self.intent_engine.extract_budget(message_lower)
+        if budget:
+            context.preferences["budget"] = budget
+        price = matches.best("price")
+        if price:
+            context.preferences["price_range"] = price
         
         # Check if user is responding to previous recommendations
-        for pattern in continuation_patterns:
-            if re.search(pattern, message_lower):
-                return self.handle_contextual_response(message_lower, context)
+        if matches.has("continuation"):
+            return self.handle_contextual_response(message_lower, context, matches)
         
         # Regular intent analysis (existing logic)
-        return self.analyze_intent(message)
+        return self.analyze_intent(message, matches)
     
-    def handle_contextual_response(self, message_lower: str, context: Dict) -> Dict:
+    def handle_contextual_response(self, message_lower: str, context: CallSession,
+                                   matches: Optional[MatchSet] = None) -> Dict:
         """Handle responses that reference previous conversation context"""
-        last_intent = context.get("last_intent", {})
-        recommendations = context.get("recommendations", [])
+        if matches is None:
+            matches = self.intent_engine.match(message_lower)
+        last_intent = context.last_intent or {}
+        recommendations = context.recommendations
         
         # Positive responses
-        if re.search(r'\b(yes|yeah|yep|sure|ok|okay|sounds good|that works|perfect)\b', message_lower):
+        if matches.has("continuation", "positive"):
             if recommendations:
                 return {
                     "type": "booking_confirmation",
                     "cuisine": last_intent.get("cuisine"),
-                    "location": context.get("location"),
+                    "location": context.location,
                     "selected_caterer": recommendations[0] if recommendations else None
                 }
             else:
                 return {"type": "general_affirmation", "context": "positive"}
         
         # Negative responses
-        elif re.search(r'\b(no|nope|not really|maybe not|different|something else)\b', message_lower):
+        elif matches.has("continuation", "negative"):
             return {"type": "search_refinement", "context": "negative"}
         
         # More information requests
-        elif re.search(r'\b(tell me more|more info|details|what else|continue)\b', message_lower):
+        elif matches.has("continuation", "more_info"):
             return {"type": "detail_request", "target": recommendations[0] if recommendations else None}
         
         # Specific selection
-        elif re.search(r'\b(first one|first option)\b', message_lower) and recommendations:
+        elif matches.has("selection", "first") and recommendations:
             return {
                 "type": "specific_selection",
                 "selected_caterer": recommendations[0],
                 "selection_index": 0
             }
-        elif re.search(r'\b(second one|second option)\b', message_lower) and len(recommendations) > 1:
+        elif matches.has("selection", "second") and len(recommendations) > 1:
             return {
                 "type": "specific_selection",
                 "selected_caterer": recommendations[1],
                 "selection_index": 1
             }
-        elif re.search(r'\b(third one|third option)\b', message_lower) and len(recommendations) > 2:
+        elif matches.has("selection", "third") and len(recommendations) > 2:
             return {
                 "type": "specific_selection",
                 "selected_caterer": recommendations[2],
@@ -260,7 +920,7 @@ class VoiceAssistant:
             }
         
         # Contact/booking requests
-        elif re.search(r'\b(call them|contact|phone|order|book)\b', message_lower):
+        elif matches.has("continuation", "contact"):
             return {
                 "type": "contact_request",
                 "selected_caterer": recommendations[0] if recommendations else None
@@ -272,7 +932,6 @@ class VoiceAssistant:
     def generate_contextual_response(self, call_id: str, intent: Dict, original_message: str) -> str:
         """Generate response that considers conversation history and context"""
         context = self.conversation_context[call_id]
-        dialogue_count = len([msg for msg in context["dialogue_history"] if msg["speaker"] == "user"])
         
         # Handle different intent types with context awareness
         if intent["type"] == "booking_confirmation":
@@ -296,7 +955,7 @@ class VoiceAssistant:
         elif intent["type"] == "booking_inquiry":
             return self.handle_booking_inquiry_contextual(call_id, intent)
         elif intent["type"] == "general_inquiry":
-            if dialogue_count == 1:
+            if context.user_turns == 1:
                 return self.handle_first_interaction(call_id)
             else:
                 return self.handle_general_inquiry_contextual(call_id)
@@ -306,18 +965,18 @@ class VoiceAssistant:
     def handle_booking_confirmation(self, call_id: str, intent: Dict) -> str:
         """Handle when user confirms they want to book a specific caterer"""
         context = self.conversation_context[call_id]
-        selected = intent.get("selected_caterer")
+        selected = self.caterer(intent.get("selected_caterer"))
         
         if selected:
-            context["pending_actions"].append("booking_confirmed")
-            return f"Excellent choice! I'll help you place an order with {selected['name']}. You can reach them directly at {selected['phone']}. They're rated {selected['rating']} stars and their minimum order is ${selected['min_order']}. Would you like me to provide any other information before you call them?"
+            context.pending_actions.append("booking_confirmed")
+            return f"Excellent choice! I'll help you place an order with {selected.name}. You can reach them directly at {selected.phone}. They're rated {selected.rating} stars and their minimum order is ${selected.min_order}. Would you like me to provide any other information before you call them?"
         else:
             return "I'd be happy to help you place an order! Which caterer from our recommendations would you like to book?"
     
     def handle_search_refinement(self, call_id: str) -> str:
         """Handle when user wants different options"""
         context = self.conversation_context[call_id]
-        last_intent = context.get("last_intent", {})
+        last_intent = context.last_intent or {}
         
         if last_intent.get("type") == "cuisine_preference":
             return "No problem! What other type of cuisine would you prefer? We have Italian, Mexican, Chinese, Mediterranean, and American options available."
@@ -329,20 +988,20 @@ class VoiceAssistant:
     def handle_detail_request(self, call_id: str, intent: Dict) -> str:
         """Handle requests for more details about recommendations"""
         context = self.conversation_context[call_id]
-        target = intent.get("target")
-        recommendations = context.get("recommendations", [])
+        target = self.caterer(intent.get("target"))
+        recommendations = context.recommendations
         
         if target and recommendations:
             service = target
-            details = f"Here are more details about {service['name']}:\n\n"
-            details += f"• Cuisine: {service['cuisine']}\n"
-            details += f"• Location: {service['location']}\n"
-            details += f"• Rating: {service['rating']} stars\n"
-            details += f"• Price Range: {service['price_range']}\n"
-            details += f"• Minimum Order: ${service['min_order']}\n"
-            details += f"• Specialties: {', '.join(service['specialties'])}\n"
-            details += f"• Phone: {service['phone']}\n\n"
-            details += f"Description: {service['description']}\n\n"
+            details = f"Here are more details about {service.name}:\n\n"
+            details += f"• Cuisine: {service.cuisine}\n"
+            details += f"• Location: {service.location}\n"
+            details += f"• Rating: {service.rating} stars\n"
+            details += f"• Price Range: {service.price_range}\n"
+            details += f"• Minimum Order: ${service.min_order}\n"
+            details += f"• Specialties: {', '.join(service.specialties)}\n"
+            details += f"• Phone: {service.phone}\n\n"
+            details += f"Description: {service.description}\n\n"
             details += "Would you like to place an order with them, or would you like information about other caterers?"
             return details
         elif recommendations:
@@ -352,132 +1011,129 @@ class VoiceAssistant:
     
     def handle_specific_selection(self, call_id: str, intent: Dict) -> str:
         """Handle when user selects a specific option by number/position"""
-        selected = intent.get("selected_caterer")
+        selected_hit = intent.get("selected_caterer")
+        selected = self.caterer(selected_hit)
         index = intent.get("selection_index", 0)
         
         if selected:
             context = self.conversation_context[call_id]
-            context["preferences"]["selected_caterer"] = selected
+            context.selected_caterer = selected_hit
             
-            return f"Great choice! You've selected {selected['name']}. They specialize in {selected['cuisine']} cuisine and are rated {selected['rating']} stars. Their minimum order is ${selected['min_order']} and they're located in {selected['location']}. Would you like their contact information to place an order, or do you need more details?"
+            return f"Great choice! You've selected {selected.name}. They specialize in {selected.cuisine} cuisine and are rated {selected.rating} stars. Their minimum order is ${selected.min_order} and they're located in {selected.location}. Would you like their contact information to place an order, or do you need more details?"
         else:
             return "I'm not sure which option you're referring to. Could you tell me the name of the caterer you're interested in?"
     
     def handle_contact_request(self, call_id: str, intent: Dict) -> str:
         """Handle requests to contact or book a caterer"""
-        selected = intent.get("selected_caterer")
+        selected = self.caterer(intent.get("selected_caterer"))
         context = self.conversation_context[call_id]
-        recommendations = context.get("recommendations", [])
+        recommendations = self.caterers(context.recommendations)
         
         if selected:
-            context["pending_actions"].append("contact_requested")
-            return f"Perfect! Here's how to contact {selected['name']}:\n\nPhone: {selected['phone']}\nLocation: {selected['location']}\nMinimum Order: ${selected['min_order']}\n\nWhen you call, mention you found them through EZCaters. Is there anything else I can help you with for your catering needs?"
+            context.pending_actions.append("contact_requested")
+            return f"Perfect! Here's how to contact {selected.name}:\n\nPhone: {selected.phone}\nLocation: {selected.location}\nMinimum Order: ${selected.min_order}\n\nWhen you call, mention you found them through EZCaters. Is there anything else I can help you with for your catering needs?"
         elif recommendations:
             first_option = recommendations[0]
-            return f"I'll give you the contact information for {first_option['name']}, our top recommendation:\n\nPhone: {first_option['phone']}\nLocation: {first_option['location']}\nMinimum Order: ${first_option['min_order']}\n\nWould you like contact information for any of the other caterers I mentioned?"
+            return f"I'll give you the contact information for {first_option.name}, our top recommendation:\n\nPhone: {first_option.phone}\nLocation: {first_option.location}\nMinimum Order: ${first_option.min_order}\n\nWould you like contact information for any of the other caterers I mentioned?"
         else:
             return "I'd be happy to help you contact a caterer! First, let me find some options for you. What type of cuisine or location are you looking for?"
     
     def handle_general_affirmation(self, call_id: str) -> str:
         """Handle general positive responses"""
         context = self.conversation_context[call_id]
-        recommendations = context.get("recommendations", [])
+        recommendations = self.caterers(context.recommendations)
         
         if recommendations:
-            return f"Wonderful! Would you like me to provide contact information for {recommendations[0]['name']}, or would you like to hear about more options first?"
+            return f"Wonderful! Would you like me to provide contact information for {recommendations[0].name}, or would you like to hear about more options first?"
         else:
             return "Great! How can I help you find the perfect catering service today?"
 
-    def update_conversation_stage(self, context: Dict, intent: Dict) -> None:
+    def update_conversation_stage(self, context: CallSession, intent: Dict) -> None:
         """Update the conversation stage based on the current intent"""
         if intent["type"] in ["cuisine_preference", "location_inquiry", "menu_inquiry"]:
-            context["stage"] = "searching"
+            context.stage = "searching"
         elif intent["type"] in ["booking_confirmation", "contact_request"]:
-            context["stage"] = "booking"
+            context.stage = "booking"
         elif intent["type"] == "specific_selection":
-            context["stage"] = "selected"
+            context.stage = "selected"
         elif intent["type"] == "search_refinement":
-            context["stage"] = "refining"
+            context.stage = "refining"
+    
+    def resolve_context_coordinates(self, context: CallSession) -> Optional[Tuple[float, float]]:
+        """Resolve the call's location once and remember the coordinates for later turns
+        
+        Gives up when the turn's geocoding budget runs out; context.pending_location
+        then names the place still being looked up.
+        """
+        def resolve(place):
+            with tracer.span('geocode'):
+                return location_resolver.resolve(place, timeout=self.geocode_budget(context))
+        return context.resolved_coordinates(resolve)
+    
+    def geocode_budget(self, context: CallSession) -> float:
+        """Seconds left in this turn for waiting on the remote geocoder"""
+        return GEOCODE_DEADLINE - (time.monotonic() - context.turn_started)
+    
+    def caterer(self, hit: Optional[SearchHit]) -> Optional[Caterer]:
+        """Resolve a search hit to its catalog record"""
+        return catering_service.get_service(hit.id) if hit else None
     
-    def provide_detailed_recommendations(self, services: List[Dict]) -> str:
+    def caterers(self, hits: Iterable[SearchHit]) -> List[Caterer]:
+        """Resolve search hits to catalog records, skipping caterers no longer listed"""
+        return [caterer for caterer in map(self.caterer, hits) if caterer]
+    
+    def provide_detailed_recommendations(self, hits: List[SearchHit]) -> str:
         """Provide detailed information about multiple services"""
         response = "Here are the details for our top recommendations:\n\n"
         
-        for i, service in enumerate(services, 1):
-            response += f"{i}. **{service['name']}** ({service['cuisine']})\n"
-            response += f"   • Rating: {service['rating']} stars\n"
-            response += f"   • Location: {service['location']}\n"
-            response += f"   • Price: {service['price_range']}\n"
-            response += f"   • Min Order: ${service['min_order']}\n"
-            response += f"   • Phone: {service['phone']}\n\n"
+        for i, service in enumerate(self.caterers(hits), 1):
+            response += f"{i}. **{service.name}** ({service.cuisine})\n"
+            response += f"   • Rating: {service.rating} stars\n"
+            response += f"   • Location: {service.location}\n"
+            response += f"   • Price: {service.price_range}\n"
+            response += f"   • Min Order: ${service.min_order}\n"
+            response += f"   • Phone: {service.phone}\n\n"
         
         response += "Which one interests you most, or would you like me to help you narrow down the options?"
         return response
 
-    def analyze_intent(self, message: str) -> Dict:
+    def analyze_intent(self, message: str, matches: Optional[MatchSet] = None) -> Dict:
         """Analyze customer intent using rule-based pattern matching"""
-        message_lower = message.lower().strip()
-        
-        # Define cuisine keywords
-        cuisine_keywords = {
-            'italian': ['italian', 'pasta', 'pizza', 'spaghetti', 'lasagna', 'marinara'],
-            'mexican': ['mexican', 'tacos', 'burritos', 'nachos', 'fajitas', 'quesadilla', 'salsa'],
-            'chinese': ['chinese', 'lo mein', 'fried rice', 'dumplings', 'sweet and sour', 'chow mein'],
-            'mediterranean': ['mediterranean', 'hummus', 'falafel', 'kebabs', 'pita', 'greek'],
-            'american': ['american', 'bbq', 'barbecue', 'fried chicken', 'mac and cheese', 'burger', 'sandwich']
-        }
-        
-        # Define location keywords/patterns
-        location_patterns = [
-            r'\b(in|near|around|from)\s+([a-zA-Z\s]+(?:,\s*[A-Z]{2})?)\b',
-            r'\b([A-Z][a-zA-Z\s]+(?:,\s*[A-Z]{2})?)\s+area\b',
-            r'\b(boston|cambridge|somerville|newton|brookline)\b'
-        ]
-        
-        # Define menu item keywords
-        menu_items = ['pizza', 'pasta', 'tacos', 'burritos', 'sandwiches', 'salads', 'chicken', 'rice', 'noodles']
-        
-        # Define booking keywords
-        booking_keywords = ['order', 'book', 'place an order', 'want to order', 'schedule', 'reserve', 'buy']
+        if matches is None:
+            matches = self.intent_engine.match(message.lower().strip())
         
         # Check for specific menu items first (before cuisine)
-        found_menu_items = [item for item in menu_items if item in message_lower]
-        if found_menu_items:
+        menu_item = matches.best("menu")
+        if menu_item:
             return {
                 "type": "menu_inquiry",
                 "cuisine": None,
                 "location": None,
-                "menu_item": found_menu_items[0]
+                "menu_item": menu_item
             }
         
         # Check for cuisine preference
-        for cuisine, keywords in cuisine_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                return {
-                    "type": "cuisine_preference",
-                    "cuisine": cuisine,
-                    "location": None,
-                    "menu_item": None
-                }
+        cuisine = matches.best("cuisine")
+        if cuisine:
+            return {
+                "type": "cuisine_preference",
+                "cuisine": cuisine,
+                "location": None,
+                "menu_item": None
+            }
         
         # Check for location inquiry
-        for pattern in location_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                # Extract location based on which group matched
-                if len(match.groups()) >= 2 and match.group(2):
-                    location = match.group(2)
-                else:
-                    location = match.group(1)
-                return {
-                    "type": "location_inquiry",
-                    "cuisine": None,
-                    "location": location.strip(),
-                    "menu_item": None
-                }
+        location = self.intent_engine.extract_location(message)
+        if location is not None:
+            return {
+                "type": "location_inquiry",
+                "cuisine": None,
+                "location": location,
+                "menu_item": None
+            }
         
         # Check for booking intent
-        if any(keyword in message_lower for keyword in booking_keywords):
+        if matches.has("booking"):
             return {
                 "type": "booking_inquiry",
                 "cuisine": None,
@@ -504,32 +1160,59 @@ class VoiceAssistant:
         
         What would you like to know about our catering partners?"""
     
+    def recommend(self, context: CallSession, **criteria) -> Dict:
+        """Ranked search for a call: the best RECOMMENDATIONS_KEPT caterers, weighed by its stated budget and price"""
+        return catering_service.search(limit=RECOMMENDATIONS_KEPT, budget=context.preferences.get("budget"),
+                                       preferred_price=context.preferences.get("price_range"), **criteria)
+    
     def handle_cuisine_inquiry_contextual(self, call_id: str, cuisine: str) -> str:
         """Handle cuisine-specific inquiries with conversation context"""
         context = self.conversation_context[call_id]
-        context["preferences"]["cuisine"] = cuisine
-        
-        services = catering_service.search_by_cuisine(cuisine)
+        context.preferences["cuisine"] = cuisine
+        
+        # Narrow to the call's location when it has resolved, including one still being looked up last turn
+        location = context.location
+        coordinates = self.resolve_context_coordinates(context)
+        if coordinates:
+            nearby_page = self.recommend(context, cuisine=cuisine, near=coordinates)
+            nearby = nearby_page["results"]
+            if nearby:
+                context.recommendations = nearby
+                if nearby_page["total"] == 1:
+                    service = self.caterer(nearby[0])
+                    return f"Great choice! {service.name} serves {cuisine} cuisine near {location}, {nearby[0].distance:.1f} miles away, and is rated {service.rating} stars. Would you like their contact information?"
+                names = [f"{self.caterer(hit).name} ({hit.distance:.1f} miles)" for hit in nearby[:3]]
+                return f"Excellent! I found {nearby_page['total']} {cuisine} caterers near {location}. The top options are {', '.join(names)}. Which one interests you most?"
+        
+        page = self.recommend(context, cuisine=cuisine)
+        services = page["results"]
         
         if not services:
             return f"I don't currently have {cuisine} caterers in our network, but I can suggest some similar options. Would you like to hear about other cuisines we offer?"
         
-        context["recommendations"] = services
+        context.recommendations = services
+        
+        if coordinates:
+            names = [s.name for s in self.caterers(services[:3])]
+            return f"I don't see any {cuisine} caterers near {location}, but I found {page['total']} elsewhere in our network, including {', '.join(names)}. Would you like to hear about one of them, or try a different cuisine nearby?"
+        if location and context.pending_location == location:
+            names = [s.name for s in self.caterers(services[:3])]
+            return f"I found {page['total']} {cuisine} caterers, including {', '.join(names)}. I'm still checking which of them deliver to {location}; ask me again in a moment and I'll narrow it down."
         
         # Check if this is a follow-up to previous conversation
-        dialogue_count = len([msg for msg in context["dialogue_history"] if msg["speaker"] == "user"])
+        dialogue_count = context.user_turns
         
-        if len(services) == 1:
-            service = services[0]
-            response = f"Great choice! I found {service['name']} that specializes in {cuisine} cuisine. They're rated {service['rating']} stars and are located in {service['location']}. They specialize in {', '.join(service['specialties'])}."
+        if page["total"] == 1:
+            service = self.caterer(services[0])
+            response = f"Great choice! I found {service.name} that specializes in {cuisine} cuisine. They're rated {service.rating} stars and are located in {service.location}. They specialize in {', '.join(service.specialties)}."
             if dialogue_count > 1:
                 response += " This seems perfect based on what you've been looking for! Would you like their contact information?"
             else:
                 response += " Would you like their contact information or should I help you find more options?"
             return response
         else:
-            names = [s['name'] for s in services[:3]]  # Top 3
-            response = f"Excellent! I found {len(services)} {cuisine} caterers for you. The top options are {', '.join(names)}."
+            names = [s.name for s in self.caterers(services[:3])]  # Top 3
+            response = f"Excellent! I found {page['total']} {cuisine} caterers for you. The top options are {', '.join(names)}."
             if dialogue_count > 1:
                 response += " These should work well with your other preferences. Which one interests you most?"
             else:
@@ -539,40 +1222,48 @@ class VoiceAssistant:
     def handle_location_inquiry_contextual(self, call_id: str, location: str) -> str:
         """Handle location-based inquiries with conversation context"""
         context = self.conversation_context[call_id]
-        context["location"] = location
+        context.location = location
         
-        services = catering_service.search_by_location(location)
+        coordinates = self.resolve_context_coordinates(context)
+        page = self.recommend(context, near=coordinates) if coordinates else {"results": [], "total": 0}
+        services = page["results"]
         
         if not services:
+            if context.pending_location == location:
+                return f"Let me check which caterers deliver to {location}, that will just take a moment. Meanwhile, is there a particular dish or cuisine you have in mind?"
             return f"I couldn't find any caterers currently delivering to {location}. Could you try a nearby city or let me know if you'd like to expand the search radius?"
         
-        context["recommendations"] = services
+        context.recommendations = services
         
         # Consider previous preferences
-        cuisine_pref = context["preferences"].get("cuisine")
-        dialogue_count = len([msg for msg in context["dialogue_history"] if msg["speaker"] == "user"])
+        cuisine_pref = context.preferences.get("cuisine")
         
-        response = f"Perfect! I found {len(services)} caterers serving the {location} area. "
+        response = f"Perfect! I found {page['total']} caterers serving the {location} area. "
         
         if cuisine_pref:
             # Filter by previous cuisine preference
-            filtered = [s for s in services if cuisine_pref.lower() in s['cuisine'].lower()]
+            filtered_page = self.recommend(context, cuisine=cuisine_pref, near=coordinates)
+            filtered = filtered_page["results"]
             if filtered:
-                response += f"I see {len(filtered)} {cuisine_pref} caterers that match your previous preference: "
-                response += ", ".join([f"{s['name']}" for s in filtered[:2]])
+                response += f"I see {filtered_page['total']} {cuisine_pref} caterers that match your previous preference: "
+                response += ", ".join([f"{s.name}" for s in self.caterers(filtered[:2])])
                 response += ". "
-                context["recommendations"] = filtered + [s for s in services if s not in filtered]
+                filtered_ids = {hit.id for hit in filtered}
+                context.recommendations = (filtered + [hit for hit in services if hit.id not in filtered_ids]
+                                           )[:RECOMMENDATIONS_KEPT]
         
         if len(services) >= 3:
             top_services = services[:3]
             descriptions = []
-            for service in top_services:
-                descriptions.append(f"{service['name']} ({service['cuisine']}, {service['distance']} miles away)")
+            for hit in top_services:
+                service = self.caterer(hit)
+                descriptions.append(f"{service.name} ({service.cuisine}, {hit.distance:.1f} miles away)")
             
-            response += f"The closest options are: {', '.join(descriptions)}. "
+            response += f"The best options nearby are: {', '.join(descriptions)}. "
         else:
-            for service in services:
-                response += f"{service['name']} offers {service['cuisine']} cuisine and is {service['distance']} miles away. "
+            for hit in services:
+                service = self.caterer(hit)
+                response += f"{service.name} offers {service.cuisine} cuisine and is {hit.distance:.1f} miles away. "
         
         response += "Would you like to hear more details about any of these caterers?"
         
@@ -582,74 +1273,64 @@ class VoiceAssistant:
         """Handle menu item specific inquiries with conversation context"""
         context = self.conversation_context[call_id]
         
-        services = catering_service.search_by_menu_item(menu_item)
+        page = self.recommend(context, menu_item=menu_item)
+        services = page["results"]
         
         if not services:
             return f"I don't see any caterers currently offering {menu_item}, but let me suggest some similar options. What type of cuisine were you thinking?"
         
-        # Filter by location if previously specified
-        location = context.get("location")
-        if location:
-            location_filtered = []
-            for service in services:
-                try:
-                    service_coords = service['coordinates']
-                    user_location = geolocator.geocode(location)
-                    if user_location:
-                        user_coords = (user_location.latitude, user_location.longitude)
-                        distance = geodesic(user_coords, service_coords).miles
-                        if distance <= MAX_SEARCH_RADIUS:
-                            service_copy = service.copy()
-                            service_copy['distance'] = round(distance, 1)
-                            location_filtered.append(service_copy)
-                except:
-                    pass
+        # Filter by location if previously specified, reusing coordinates resolved earlier in the call
+        location = context.location
+        coordinates = self.resolve_context_coordinates(context)
+        if coordinates:
+            nearby_page = self.recommend(context, menu_item=menu_item, near=coordinates)
+            location_filtered = nearby_page["results"]
             
             if location_filtered:
-                services = sorted(location_filtered, key=lambda x: x.get('distance', 999))
-                context["recommendations"] = services
+                services = location_filtered
+                context.recommendations = services
                 
-                response = f"Great news! I found {len(services)} caterers near {location} that offer {menu_item}. "
-                if len(services) == 1:
-                    service = services[0]
-                    response += f"{service['name']} specializes in {service['cuisine']} cuisine and is {service['distance']} miles away. Would you like their contact information?"
+                response = f"Great news! I found {nearby_page['total']} caterers near {location} that offer {menu_item}. "
+                if nearby_page["total"] == 1:
+                    service = self.caterer(services[0])
+                    response += f"{service.name} specializes in {service.cuisine} cuisine and is {services[0].distance:.1f} miles away. Would you like their contact information?"
                 else:
-                    names = [f"{s['name']} ({s['distance']} miles)" for s in services[:3]]
-                    response += f"Your closest options are {', '.join(names)}. Which one interests you most?"
+                    names = [f"{self.caterer(hit).name} ({hit.distance:.1f} miles)" for hit in services[:3]]
+                    response += f"Your best options are {', '.join(names)}. Which one interests you most?"
                 return response
         
-        context["recommendations"] = services
+        context.recommendations = services
         
-        if len(services) == 1:
-            service = services[0]
-            return f"Great news! {service['name']} offers {menu_item}. They specialize in {service['cuisine']} cuisine and also offer {', '.join([s for s in service['specialties'] if s != menu_item.lower()])}. Would you like their contact information?"
+        if page["total"] == 1:
+            service = self.caterer(services[0])
+            return f"Great news! {service.name} offers {menu_item}. They specialize in {service.cuisine} cuisine and also offer {', '.join([s for s in service.specialties if s != menu_item.lower()])}. Would you like their contact information?"
         else:
-            names = [s['name'] for s in services[:3]]
-            return f"I found {len(services)} caterers that offer {menu_item}! Your top options are {', '.join(names)}. Would you like me to tell you more about any of these?"
+            names = [s.name for s in self.caterers(services[:3])]
+            return f"I found {page['total']} caterers that offer {menu_item}! Your top options are {', '.join(names)}. Would you like me to tell you more about any of these?"
     
     def handle_booking_inquiry_contextual(self, call_id: str, intent: Dict) -> str:
         """Handle booking and ordering inquiries with conversation context"""
         context = self.conversation_context[call_id]
-        recommendations = context.get("recommendations", [])
+        recommendations = context.recommendations
         
         if not recommendations:
             return "I'd be happy to help you place an order! First, let me know what type of cuisine you're interested in or your delivery location."
         
-        selected_caterer = context["preferences"].get("selected_caterer")
+        selected_caterer = self.caterer(context.selected_caterer)
         
         if selected_caterer:
-            return f"Perfect! I'll help you place an order with {selected_caterer['name']}. You can call them at {selected_caterer['phone']}. Their minimum order is ${selected_caterer['min_order']}. Would you like me to provide any other details before you call?"
+            return f"Perfect! I'll help you place an order with {selected_caterer.name}. You can call them at {selected_caterer.phone}. Their minimum order is ${selected_caterer.min_order}. Would you like me to provide any other details before you call?"
         elif len(recommendations) == 1:
-            service = recommendations[0]
-            return f"Excellent! To place an order with {service['name']}, you can call them directly at {service['phone']} or I can connect you. Their minimum order is ${service['min_order']} and they're rated {service['rating']} stars. Would you like me to connect you now?"
+            service = self.caterer(recommendations[0])
+            return f"Excellent! To place an order with {service.name}, you can call them directly at {service.phone} or I can connect you. Their minimum order is ${service.min_order} and they're rated {service.rating} stars. Would you like me to connect you now?"
         else:
             return f"I have {len(recommendations)} great options for you. Which caterer would you like to place an order with? You can say 'the first one' or mention the caterer's name specifically."
     
     def handle_general_inquiry_contextual(self, call_id: str) -> str:
         """Handle general inquiries with conversation context"""
         context = self.conversation_context[call_id]
-        recommendations = context.get("recommendations", [])
-        preferences = context.get("preferences", {})
+        recommendations = context.recommendations
+        preferences = context.preferences
         
         if recommendations:
             return "I can help you with more information about the caterers I found, help you make a selection, or search for different options. What would you like to do next?"
@@ -661,15 +1342,21 @@ class VoiceAssistant:
     def handle_unclear_intent(self, call_id: str, original_message: str) -> str:
         """Handle cases where the intent is unclear"""
         context = self.conversation_context[call_id]
-        recommendations = context.get("recommendations", [])
+        recommendations = context.recommendations
         
         if recommendations:
-            return f"I'm not sure I understood that completely. Were you asking about one of the caterers I mentioned ({', '.join([r['name'] for r in recommendations[:2]])}), or would you like me to search for something else?"
+            return f"I'm not sure I understood that completely. Were you asking about one of the caterers I mentioned ({', '.join([r.name for r in self.caterers(recommendations[:2])])}), or would you like me to search for something else?"
         else:
             return "I want to make sure I understand what you're looking for. Could you tell me what type of cuisine you'd like, your location, or any specific menu items you have in mind?"
 
-# Initialize voice assistant
-voice_assistant = VoiceAssistant()
+# Initialize voice assistant; abandoned calls expire in the background
+voice_assistant = VoiceAssistant(
+    state_backend=make_backend(STATE_BACKEND, STATE_BACKEND_URL) if STATE_BACKEND else None
+)
+voice_assistant.conversation_context.start_sweeper(CONTEXT_SWEEP_INTERVAL)
+if voice_assistant.state_sync is not None:
+    voice_assistant.state_sync.start_flusher()
+    atexit.register(voice_assistant.state_sync.stop)
 
 # Routes
 @app.route('/')
@@ -680,8 +1367,10 @@ def index():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Webhook endpoint for Retell AI"""
+    turn = tracer.start_turn()
     try:
-        data = request.get_json()
+        with tracer.span('parse'):
+            data = request.get_json()
         
         # Extract relevant information from Retell webhook
         call_id = data.get('call_id')
@@ -692,8 +1381,7 @@ def webhook():
         
         elif event_type == 'call_ended':
             # Clean up conversation context
-            if call_id in voice_assistant.conversation_context:
-                del voice_assistant.conversation_context[call_id]
+            voice_assistant.end_call(call_id)
             return jsonify({"message": "Call ended"})
         
         elif event_type == 'speech_recognition':
@@ -704,49 +1392,414 @@ def webhook():
             response = voice_assistant.process_inquiry(call_id, transcript)
             
             # Return response for Retell to speak
-            return jsonify({
+            payload = {
                 "response": response,
                 "end_call": False
-            })
+            }
+            if WEBHOOK_TIMING:
+                payload["timing"] = tracer.end_turn(turn)
+                turn = None
+            with tracer.span('encode'):
+                return jsonify(payload)
         
         return jsonify({"message": "Event processed"})
         
     except Exception as e:
         print(f"Webhook error: {e}")
         return jsonify({"error": "Internal server error"}), 500
+    finally:
+        tracer.end_turn(turn)
+
+def _search_number(value, field: str, minimum: Optional[float] = None) -> float:
+    """A finite numeric /search field, at least ``minimum``; raises ValueError naming the field"""
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field}")
+    if number != number or number in (float('inf'), float('-inf')) or (minimum is not None and number < minimum):
+        raise ValueError(f"Invalid {field}")
+    return number
+
+def _search_count(value, field: str) -> int:
+    """A non-negative whole-number /search field; raises ValueError naming the field"""
+    number = _search_number(value, field, minimum=0)
+    if not number.is_integer():
+        raise ValueError(f"Invalid {field}")
+    return int(number)
+
+def _search_location(value) -> Union[str, Tuple[float, float]]:
+    """A place name, or a [latitude, longitude] pair as a tuple"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        lat, lon = (_search_number(part, 'location') for part in value)
+        if -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0:
+            return (lat, lon)
+    raise ValueError("Invalid location")
+
+def parse_search_criteria(data: Dict) -> Dict:
+    """Turn a /search request body into CateringService.search keyword arguments
+    
+    Accepts either the legacy {"type": "cuisine|location|menu", "query": ...}
+    form or any combination of the composite criteria. Every field is type and
+    range checked here; raises ValueError with the message to return to the client.
+    """
+    criteria = {}
+    
+    search_type = data.get('type')
+    if search_type:
+        legacy_fields = {'cuisine': 'cuisine', 'location': 'location', 'menu': 'menu_item'}
+        if search_type not in legacy_fields:
+            raise ValueError("Invalid search type")
+        field = legacy_fields[search_type]
+        if not data.get(field):
+            data = dict(data, **{field: data.get('query')})
+    
+    for field in ('cuisine', 'menu_item', 'preferred_price'):
+        if data.get(field):
+            if not isinstance(data[field], str):
+                raise ValueError(f"Invalid {field}")
+            criteria[field] = data[field]
+    price_range = data.get('price_range')
+    if price_range:
+        if isinstance(price_range, list) and all(isinstance(value, str) for value in price_range):
+            criteria['price_range'] = price_range
+        elif isinstance(price_range, str):
+            criteria['price_range'] = price_range
+        else:
+            raise ValueError("Invalid price_range")
+    if data.get('location'):
+        criteria['near'] = _search_location(data['location'])
+    for field, minimum in (('radius', 0), ('min_rating', None), ('max_min_order', None), ('budget', 0)):
+        if data.get(field) is not None:
+            criteria[field] = _search_number(data[field], field, minimum)
+    if data.get('limit') is not None:
+        criteria['limit'] = _search_count(data['limit'], 'limit')
+    criteria['offset'] = _search_count(data['offset'], 'offset') if data.get('offset') is not None else 0
+    
+    filters = ('cuisine', 'menu_item', 'near', 'price_range', 'min_rating', 'max_min_order')
+    if not search_type and not any(field in criteria for field in filters):
+        raise ValueError("Invalid search type")
+    return criteria
+
+def search_cache_key(service: CateringService, criteria: Dict) -> Tuple:
+    """Response cache key for a search: the criteria, normalized, plus the catalog version"""
+    normalized = []
+    for field, value in sorted(criteria.items()):
+        if field == 'near':
+            value = normalize_query(value) if isinstance(value, str) else tuple(value)
+        elif field in ('cuisine', 'menu_item') and isinstance(value, str):
+            value = normalize_term(value)
+        elif isinstance(value, list):
+            value = tuple(sorted(value, key=repr))
+        normalized.append((field, value))
+    return ('search', service.version, tuple(normalized))
+
+def search_response(service: CateringService, criteria: Dict, page: Dict, key: Tuple) -> CachedResponse:
+    """Encode a search page, caching it unless a location search came back empty (the geocoder may have failed)"""
+    page["results"] = service.serialize(page["results"])
+    if criteria.get('near') and not page["total"]:
+        return make_response(page)
+    return response_cache.put(key, page)
+
+def parse_search_batch(data) -> List:
+    """The queries of a /search/batch request body; raises ValueError with the message for the client"""
+    queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValueError('Expected a non-empty "queries" list')
+    if len(queries) > SEARCH_BATCH_MAX:
+        raise ValueError(f"At most {SEARCH_BATCH_MAX} queries per batch")
+    return queries
+
+def batch_line(position: int, cached: Optional[CachedResponse] = None, error: Optional[str] = None) -> bytes:
+    """One NDJSON line of a /search/batch response; an encoded search page is embedded as is"""
+    if cached is None:
+        return encode_json({"index": position, "error": error}) + b"\n"
+    return b'{"index":%d,"result":%s}\n' % (position, cached.body)
+
+class SearchBatch:
+    """The searches of one /search/batch request, grouped so shared work is done once
+    
+    Each query is answered from the response cache when possible. The rest are
+    grouped by normalized location, so every distinct place is geocoded once
+    and searched once (see CateringService.search_many); queries without a
+    location form one more group. Lines are produced group by group, as each
+    location resolves, and carry the query's ``index`` in the request.
+    """
+    
+    def __init__(self, service: CateringService, queries: List):
+        self.service = service
+        self.ready: List[bytes] = []
+        self.unlocated: List[Tuple[int, Dict, Tuple]] = []
+        # Groups are keyed by the first spelling of each place, which is what gets resolved
+        self.by_place: Dict[str, List[Tuple[int, Dict, Tuple]]] = {}
+        spellings: Dict[str, str] = {}
+        for position, query in enumerate(queries):
+            try:
+                criteria = parse_search_criteria(query if isinstance(query, dict) else {})
+                key = search_cache_key(service, criteria)
+                cached = response_cache.get(key)
+            except ValueError as e:
+                self.ready.append(batch_line(position, error=str(e)))
+                continue
+            except Exception as e:
+                # One bad query must not take the rest of the batch down with it
+                print(f"Search error: {e}")
+                self.ready.append(batch_line(position, error="Search failed"))
+                continue
+            if cached is not None:
+                self.ready.append(batch_line(position, cached))
+            elif isinstance(criteria.get('near'), str):
+                spelling = spellings.setdefault(normalize_query(criteria['near']), criteria['near'])
+                self.by_place.setdefault(spelling, []).append((position, criteria, key))
+            else:
+                self.unlocated.append((position, criteria, key))
+    
+    def evaluate(self, group: List[Tuple[int, Dict, Tuple]],
+                 coordinates: Optional[Tuple[float, float]] = None) -> List[bytes]:
+        """Lines for one group of searches sharing a location (or having none)"""
+        if not group:
+            return []
+        try:
+            criteria_by_position = {position: (criteria, key) for position, criteria, key in group}
+            pages = self.service.search_many([(position, criteria) for position, criteria, _ in group], coordinates)
+            lines = []
+            for position, page in pages:
+                criteria, key = criteria_by_position[position]
+                lines.append(batch_line(position, search_response(self.service, criteria, page, key)))
+            return lines
+        except Exception as e:
+            print(f"Search error: {e}")
+            return [batch_line(position, error="Search failed") for position, _, _ in group]
+    
+    def lines(self) -> Iterator[bytes]:
+        """Every line: cached answers first, then the unlocated group while places resolve, then each place"""
+        resolving = location_resolver.resolve_many(self.by_place, timeout=GEOCODER_TIMEOUT)
+        yield from self.ready
+        yield from self.evaluate(self.unlocated)
+        for place, resolution in resolving:
+            yield from self.evaluate(self.by_place[place], resolution.coordinates)
+
+def encode_cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(str(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+def parse_listing_params(args, accept: str = '') -> Dict:
+    """Turn /services query parameters into listing options; raises ValueError with the message for the client
+    
+    ``fields`` is a comma-separated projection, ``limit`` and ``cursor`` page
+    through the catalog, and ``format=ndjson`` (or an NDJSON Accept header)
+    streams one caterer per line.
+    """
+    fields = None
+    if args.get('fields'):
+        fields = tuple(field.strip() for field in args['fields'].split(',') if field.strip())
+        unknown = [field for field in fields if field not in CATERER_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields requested")
+    
+    cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+    limit = None
+    if args.get('limit') is not None:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError("Invalid limit")
+        if limit < 1:
+            raise ValueError("Invalid limit")
+    
+    stream = args.get('format') == 'ndjson' or 'application/x-ndjson' in (accept or '')
+    if not stream and (limit is not None or cursor is not None):
+        limit = min(limit or SERVICES_PAGE_SIZE, SERVICES_MAX_PAGE_SIZE)
+    return {"fields": fields, "cursor": cursor, "limit": limit, "stream": stream}
+
+def _listed(caterer: Caterer, fields: Optional[Tuple[str, ...]]) -> Dict:
+    return caterer.to_dict() if fields is None else caterer.project(fields)
+
+def services_response(listing: Optional[Dict] = None) -> CachedResponse:
+    """The encoded listing (whole catalog, or one page when paging) for the current catalog version"""
+    listing = listing or {"fields": None, "cursor": None, "limit": None}
+    service = catering_service
+    fields, cursor, limit = listing["fields"], listing["cursor"], listing["limit"]
+    key = ('services', service.version, fields, cursor, limit)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    if limit is None:
+        return response_cache.put(key, {"services": [_listed(caterer, fields) for caterer in service.services]})
+    caterers, next_position = service.page_after(cursor, limit)
+    return response_cache.put(key, {
+        "services": [_listed(caterer, fields) for caterer in caterers],
+        "next_cursor": encode_cursor(next_position) if next_position is not None else None
+    })
+
+def stream_services(listing: Dict) -> Iterator[bytes]:
+    """NDJSON lines for the listing, read in small batches so memory stays flat however big the catalog is"""
+    service = catering_service
+    fields, cursor = listing["fields"], listing["cursor"]
+    remaining = listing["limit"] if listing["limit"] is not None else float('inf')
+    while remaining > 0:
+        caterers, cursor = service.page_after(cursor, int(min(SERVICES_STREAM_BATCH, remaining)))
+        for caterer in caterers:
+            yield encode_json(_listed(caterer, fields)) + b"\n"
+        remaining -= len(caterers)
+        if cursor is None:
+            return
+
+def json_response(cached: CachedResponse):
+    """Flask response for an encoded body, or 304 when the client already has it"""
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if cached.matches(request.headers.get('If-None-Match')):
+        return app.response_class(status=304, headers=headers)
+    return app.response_class(cached.body, mimetype='application/json', headers=headers)
 
 @app.route('/search', methods=['POST'])
 def search():
     """API endpoint for searching catering services"""
     try:
-        data = request.get_json()
-        search_type = data.get('type')
-        query = data.get('query')
-        
-        if search_type == 'cuisine':
-            results = catering_service.search_by_cuisine(query)
-        elif search_type == 'location':
-            results = catering_service.search_by_location(query)
-        elif search_type == 'menu':
-            results = catering_service.search_by_menu_item(query)
-        else:
-            return jsonify({"error": "Invalid search type"}), 400
+        try:
+            criteria = parse_search_criteria(request.get_json() or {})
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify({"results": results})
+        service = catering_service
+        key = search_cache_key(service, criteria)
+        cached = response_cache.get(key)
+        if cached is None:
+            cached = search_response(service, criteria, service.search(**criteria), key)
+        return json_response(cached)
         
     except Exception as e:
         print(f"Search error: {e}")
         return jsonify({"error": "Search failed"}), 500
 
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """API endpoint running many searches at once, streamed back as NDJSON as they finish"""
+    try:
+        queries = parse_search_batch(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    batch = SearchBatch(catering_service, queries)
+    return app.response_class(batch.lines(), mimetype='application/x-ndjson')
+
 @app.route('/services')
 def list_services():
-    """API endpoint to list all catering services"""
-    return jsonify({"services": catering_service.services})
+    """API endpoint to list catering services, whole, paged or streamed"""
+    try:
+        listing = parse_listing_params(request.args, request.headers.get('Accept', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if listing["stream"]:
+        return app.response_class(stream_services(listing), mimetype='application/x-ndjson')
+    return json_response(services_response(listing))
+
+def admin_authorized(admin_token: Optional[str]) -> bool:
+    """Whether a request's admin token matches ADMIN_TOKEN, compared in constant time"""
+    if not ADMIN_TOKEN or not admin_token:
+        return False
+    return hmac.compare_digest(admin_token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+def start_catalog_reload(admin_token: Optional[str], data: Optional[Dict]) -> Tuple[Dict, int]:
+    """Authorize and start a background catalog reload; returns (payload, status code)"""
+    if not admin_authorized(admin_token):
+        return {"error": "Unauthorized"}, 401
+    
+    source = (data or {}).get('source') or CATALOG_PATH
+    if not source or not os.path.exists(source):
+        return {"error": "Catalog file not found"}, 400
+    
+    if catalog_loader.reload(source) is None:
+        return {"error": "A catalog load is already running", "catalog": catalog_loader.status()}, 409
+    return {"message": "Catalog reload started", "catalog": catalog_loader.status()}, 202
+
+@app.route('/catalog/reload', methods=['POST'])
+def reload_catalog():
+    """Rebuild the catalog from a file in the background and swap it in when ready"""
+    payload, status = start_catalog_reload(request.headers.get('X-Admin-Token'), request.get_json(silent=True))
+    return jsonify(payload), status
+
+def health_status() -> Dict:
+    """Health check payload shared by the Flask and ASGI servers"""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "geocode_cache": geocode_cache.stats(),
+        "location_resolver": location_resolver.stats(),
+        "conversations": voice_assistant.conversation_context.stats(),
+        "conversation_state": voice_assistant.state_sync.stats() if voice_assistant.state_sync else None,
+        "catalog": dict(catalog_loader.status(), caterers=len(catering_service), snapshot=catering_service.snapshot),
+        "area_matrix": catering_service.area_matrix.stats() if catering_service.area_matrix else None,
+        "response_cache": response_cache.stats()
+    }
+
+def run_profile(admin_token: Optional[str], args) -> Tuple[Union[Dict, str], int]:
+    """Authorize and run a sampling profile; returns (report, or collapsed stacks as text, status code)
+    
+    Blocks the calling thread for the requested ``seconds``.
+    """
+    if not PROFILER_ENABLED:
+        return {"error": "Profiler disabled"}, 404
+    if not admin_authorized(admin_token):
+        return {"error": "Unauthorized"}, 401
+    try:
+        seconds = float(args.get('seconds', 5))
+        rate = float(args.get('rate', 100))
+    except ValueError:
+        return {"error": "Invalid profile parameters"}, 400
+    
+    report = profiler.profile(seconds, rate, include_idle=args.get('idle') == 'true')
+    if report is None:
+        return {"error": "A profile is already running"}, 409
+    if args.get('format') == 'collapsed':
+        return report["collapsed"] + "\n", 200
+    return report, 200
+
+@app.route('/admin/profile', methods=['POST'])
+def profile():
+    """Sample every thread's stack for a few seconds and report where the time goes"""
+    report, status = run_profile(request.headers.get('X-Admin-Token'), request.args)
+    if isinstance(report, str):
+        return app.response_class(report, status=status, mimetype='text/plain')
+    return jsonify(report), status
+
+def metrics_text() -> str:
+    """Prometheus text exposition of stage, turn and geocoding latencies plus a few counters"""
+    lines = []
+    lines += prometheus_histograms("ezcaters_stage_seconds", "Time spent in each hot-path stage (nested stages included)",
+                                   "stage", tracer.stages)
+    lines += prometheus_histograms("ezcaters_turn_seconds", "Whole voice turns by detected intent",
+                                   "intent", tracer.turns)
+    lines += prometheus_histograms("ezcaters_location_stage_seconds", "Location resolution stages",
+                                   "stage", location_resolver.timings.histograms)
+    lines += prometheus_values("ezcaters_location_resolutions_total", "Location lookups by answering source", "counter",
+                               (({"source": source}, count) for source, count in location_resolver.sources.items()))
+    cache = response_cache.stats()
+    lines += prometheus_values("ezcaters_response_cache_requests_total", "Response cache lookups", "counter",
+                               [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+    lines += prometheus_values("ezcaters_conversations", "Conversations held in memory", "gauge",
+                               [({}, len(voice_assistant.conversation_context))])
+    lines += prometheus_values("ezcaters_caterers", "Caterers in the published catalog", "gauge",
+                               [({}, len(catering_service))])
+    return "\n".join(lines) + "\n"
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return app.response_class(metrics_text(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return jsonify(health_status())
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
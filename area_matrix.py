@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geo_index import haversine_miles
+
+Coordinates = Tuple[float, float]
+
+
+# One saved column map entry per caterer
+COLUMN_DTYPE = np.dtype([('id', '<i8'), ('column', '<i8'), ('lat', '<f8'), ('lon', '<f8')])
+
+
+class AreaDistanceMatrix:
+    """Precomputed distances from known service areas to every caterer
+
+    One float32 row per area centroid and one column per caterer. Adding or
+    moving a caterer computes only its own column. Each area's caterers
+    sorted by distance are built on the first query from that area; later
+    changes are merged into the sorted rows already built (one binary search
+    and insert per row) instead of re-sorting them, so a radius search from
+    a known area is a binary search and a slice.
+
+    ``open`` maps a saved matrix and its column map copy-on-write: workers
+    share their pages. ``adopt`` takes the saved columns over wholesale when
+    they still describe the catalog, without touching each caterer; the
+    per-caterer dicts are only built when the catalog first changes.
+    Otherwise caterers whose coordinates haven't changed since the save
+    reuse their column instead of recomputing it. A save writes a new
+    generation of the matrix and column map under their own names and then
+    replaces ``path + '.json'``, which names them, so a reader never pairs a
+    matrix with another save's columns.
+    """
+
+    def __init__(self, areas: Sequence[Tuple[str, Coordinates]], capacity: int = 1024, path: Optional[str] = None):
+        self.areas = [(name, (float(lat), float(lon))) for name, (lat, lon) in areas]
+        self.path = path
+        self._rows: Dict[Coordinates, int] = {}
+        for row, (_, coordinates) in enumerate(self.areas):
+            self._rows.setdefault(coordinates, row)
+        self._area_lats = np.array([coordinates[0] for _, coordinates in self.areas], dtype=np.float64)
+        self._area_lons = np.array([coordinates[1] for _, coordinates in self.areas], dtype=np.float64)
+        self.matrix = np.zeros((len(self.areas), capacity), dtype=np.float32)
+        self._columns: Dict[Hashable, int] = {}
+        self._ids: List[Optional[Hashable]] = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self._coordinates: Dict[Hashable, Coordinates] = {}
+        # Column map read from disk (COLUMN_DTYPE), until set claims it or adopt takes it over
+        self._saved: Optional[np.ndarray] = None
+        # Adopted column map, and the id in each column, until the first change builds the dicts
+        self._adopted: Optional[np.ndarray] = None
+        self._id_of_column: Optional[np.ndarray] = None
+        # Columns restored from disk that no caterer has claimed yet: id -> (column, coordinates)
+        self._reusable: Dict[Hashable, Tuple[int, Coordinates]] = {}
+        self._sorted: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self.computed = 0
+        self.reused = 0
+        self.slices = 0
+
+    @classmethod
+    def open(cls, path: str, areas: Sequence[Tuple[str, Coordinates]]) -> "AreaDistanceMatrix":
+        """Map a matrix saved for the same areas, or start an empty one that will save to path"""
+        matrix = cls(areas, path=path)
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            with open(path + '.json', encoding='utf-8') as handle:
+                meta = json.load(handle)
+            if [[name, list(coordinates)] for name, coordinates in matrix.areas] != meta['areas']:
+                return matrix
+            stored = np.load(os.path.join(directory, os.path.basename(meta['matrix'])), mmap_mode='c')
+            saved = np.load(os.path.join(directory, os.path.basename(meta['columns'])), mmap_mode='r')
+        except (OSError, ValueError, KeyError, TypeError):
+            return matrix
+        if stored.shape[0] != len(matrix.areas) or saved.dtype != COLUMN_DTYPE:
+            return matrix
+
+        matrix.matrix = stored
+        matrix._ids = None
+        matrix._free = None
+        matrix._saved = saved
+        return matrix
+
+    def adopt(self, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray) -> bool:
+        """Take over the saved column map if it covers exactly these caterers at these coordinates
+
+        Returns False, changing nothing, when there is no saved map, caterers
+        were already added, or the catalog differs from what was saved.
+        """
+        saved = self._saved
+        if saved is None or self._columns or len(saved) != len(ids):
+            return False
+        ids = np.asarray(ids, dtype=np.int64)
+        saved_order, order = np.argsort(saved['id'], kind='stable'), np.argsort(ids, kind='stable')
+        if not (np.array_equal(saved['id'][saved_order], ids[order])
+                and np.array_equal(saved['lat'][saved_order], np.asarray(lats, dtype=np.float64)[order])
+                and np.array_equal(saved['lon'][saved_order], np.asarray(lons, dtype=np.float64)[order])):
+            return False
+        self._id_of_column = np.full(self.matrix.shape[1], -1, dtype=np.int64)
+        self._id_of_column[saved['column']] = saved['id']
+        self._adopted = saved
+        self._saved = None
+        self.reused += len(saved)
+        return True
+
+    def _materialize(self) -> None:
+        """Build the per-caterer dicts for an adopted or opened column map, before the first change"""
+        adopted, saved = self._adopted, self._saved
+        if adopted is None and saved is None:
+            return
+        self._adopted = self._saved = self._id_of_column = None
+        capacity = self.matrix.shape[1]
+        self._ids = [None] * capacity
+        claimed = set()
+        for service_id, column, lat, lon in (adopted if adopted is not None else saved).tolist():
+            if adopted is not None:
+                self._columns[service_id] = column
+                self._ids[column] = service_id
+                self._coordinates[service_id] = (lat, lon)
+            else:
+                self._reusable[service_id] = (column, (lat, lon))
+            claimed.add(column)
+        self._free = [column for column in range(capacity - 1, -1, -1) if column not in claimed]
+
+    def export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """A copy of the column map and matrix for save; take it under the lock guarding updates, save without it"""
+        if self._adopted is not None:
+            return np.array(self._adopted, copy=True), np.array(self.matrix, copy=True)
+        columns = np.zeros(len(self._columns), dtype=COLUMN_DTYPE)
+        for row, (service_id, column) in enumerate(self._columns.items()):
+            columns[row] = (service_id, column, *self._coordinates[service_id])
+        return columns, np.array(self.matrix, copy=True)
+
+    def save(self, path: Optional[str] = None, exported: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> None:
+        """Write a new matrix generation (``exported``, or the current state), then switch the column map to it atomically
+
+        Temporary and generation names are unique, so workers saving at the
+        same time never write into each other's files; the last map wins.
+        """
+        path = path or self.path
+        if not path:
+            return
+        directory, base = os.path.split(os.path.abspath(path))
+        columns, data = exported if exported is not None else self.export()
+        try:
+            with open(path + '.json', encoding='utf-8') as handle:
+                meta = json.load(handle)
+            previous = [meta.get('matrix'), meta.get('columns')]
+        except (OSError, ValueError, AttributeError):
+            previous = []
+
+        written = []
+        try:
+            for suffix, array in (('.npy', data), ('.columns.npy', columns)):
+                fd, generation = tempfile.mkstemp(prefix=base + '.', suffix=suffix, dir=directory)
+                written.append(generation)
+                with os.fdopen(fd, 'wb') as handle:
+                    np.save(handle, np.ascontiguousarray(array))
+            meta = {"areas": [[name, list(coordinates)] for name, coordinates in self.areas],
+                    "matrix": os.path.basename(written[0]), "columns": os.path.basename(written[1])}
+            fd, meta_path = tempfile.mkstemp(prefix=base + '.', suffix='.json.tmp', dir=directory)
+            written.append(meta_path)
+            with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                json.dump(meta, handle)
+            os.replace(meta_path, path + '.json')
+        except BaseException:
+            for leftover in written:
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+
+        # Workers that mapped the previous generation keep their mapping after it is unlinked
+        current = {os.path.basename(name) for name in written}
+        for name in previous:
+            if isinstance(name, str) and name not in current:
+                try:
+                    os.remove(os.path.join(directory, os.path.basename(name)))
+                except OSError:
+                    pass
+
+    def __len__(self) -> int:
+        return len(self._adopted) if self._adopted is not None else len(self._columns)
+
+    def area_row(self, coordinates: Coordinates) -> Optional[int]:
+        """Row of the area centred exactly on coordinates, if it is a known area"""
+        return self._rows.get((float(coordinates[0]), float(coordinates[1])))
+
+    def set(self, service_id: Hashable, lat: float, lon: float) -> None:
+        """Add or move a caterer, computing its column unless a saved one still matches"""
+        self._materialize()
+        coordinates = (float(lat), float(lon))
+        if self._coordinates.get(service_id) == coordinates:
+            return
+        self.remove(service_id)
+        reusable = self._reusable.pop(service_id, None)
+        if reusable is not None and reusable[1] == coordinates:
+            column = reusable[0]
+            self.reused += 1
+        else:
+            if reusable is not None:
+                self._free.append(reusable[0])
+            column = self._allocate()
+            self.matrix[:, column] = haversine_miles(lat, lon, self._area_lats, self._area_lons)
+            self.computed += 1
+        self._columns[service_id] = column
+        self._ids[column] = service_id
+        self._coordinates[service_id] = coordinates
+        for row, (columns, distances) in self._sorted.items():
+            distance = self.matrix[row, column]
+            at = int(np.searchsorted(distances, distance, side='right'))
+            self._sorted[row] = (np.insert(columns, at, column), np.insert(distances, at, distance))
+
+    def remove(self, service_id: Hashable) -> None:
+        """Drop a caterer; unknown ids are ignored"""
+        self._materialize()
+        column = self._columns.pop(service_id, None)
+        if column is None:
+            return
+        del self._coordinates[service_id]
+        self._ids[column] = None
+        self._free.append(column)
+        for row, (columns, distances) in self._sorted.items():
+            keep = columns != column
+            self._sorted[row] = (columns[keep], distances[keep])
+
+    def _allocate(self) -> int:
+        if not self._free and self._reusable:
+            # Saved columns nobody claimed belong to caterers that are gone
+            self._free = [column for column, _ in self._reusable.values()]
+            self._reusable.clear()
+        if not self._free:
+            self._grow()
+        return self._free.pop()
+
+    def _grow(self) -> None:
+        capacity = self.matrix.shape[1]
+        grown = np.zeros((len(self.areas), max(2 * capacity, 16)), dtype=np.float32)
+        grown[:, :capacity] = self.matrix
+        self.matrix = grown
+        self._ids.extend([None] * (grown.shape[1] - capacity))
+        self._free = list(range(grown.shape[1] - 1, capacity - 1, -1))
+
+    def _nearest_first(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(columns, distances) of every caterer sorted by distance from an area"""
+        ordered = self._sorted.get(row)
+        if ordered is None:
+            if self._adopted is not None:
+                columns = self._adopted['column'].astype(np.intp)
+            else:
+                columns = np.fromiter(self._columns.values(), dtype=np.intp, count=len(self._columns))
+            distances = self.matrix[row, columns]
+            order = np.argsort(distances, kind='stable')
+            ordered = self._sorted[row] = (columns[order], distances[order])
+        return ordered
+
+    def within_radius(self, row: int, radius_miles: float,
+                      k: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """(id, haversine miles) pairs within radius of an area, closest first, at most k"""
+        columns, distances = self._nearest_first(row)
+        end = int(np.searchsorted(distances, radius_miles, side='right'))
+        if k is not None:
+            end = min(end, k)
+        self.slices += 1
+        if self._adopted is not None:
+            ids = self._id_of_column[columns[:end]].tolist()
+            return list(zip(ids, distances[:end].tolist()))
+        ids = self._ids
+        return [(ids[column], distance) for column, distance in zip(columns[:end].tolist(), distances[:end].tolist())]
+
+    def stats(self) -> Dict:
+        return {
+            "areas": len(self.areas),
+            "caterers": len(self),
+            "bytes": int(self.matrix.nbytes),
+            "computed_columns": self.computed,
+            "reused_columns": self.reused,
+            "slices": self.slices,
+            "path": self.path
+        }
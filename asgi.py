@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""ASGI entry point serving the same API as the Flask app without blocking on geocoding
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+One process handles many concurrent calls: location lookups are awaited on
+a pooled async HTTP client with timeouts instead of holding a worker.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+import app as service
+
+
+@asynccontextmanager
+async def lifespan(_):
+    yield
+    await service.async_geolocator.aclose()
+
+
+app = FastAPI(title="EZCaters Voice Agent", lifespan=lifespan)
+
+
+def _json_response(cached, request: Request) -> Response:
+    """Response for an encoded body, or 304 when the client already has it"""
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if cached.matches(request.headers.get('If-None-Match')):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
+async def _in_thread(function, *args):
+    """Run blocking state-backend I/O off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+@app.post('/webhook')
+async def webhook(request: Request):
+    """Webhook endpoint for Retell AI"""
+    tracer = service.tracer
+    turn = tracer.start_turn()
+    try:
+        with tracer.span('parse'):
+            data = await request.json()
+
+        call_id = data.get('call_id')
+        event_type = data.get('event_type')
+        voice_assistant = service.voice_assistant
+
+        if event_type == 'call_started':
+            return {"message": "Call started"}
+
+        elif event_type == 'call_ended':
+            if voice_assistant.state_sync is not None:
+                await _in_thread(voice_assistant.end_call, call_id)
+            else:
+                voice_assistant.end_call(call_id)
+            return {"message": "Call ended"}
+
+        elif event_type == 'speech_recognition':
+            transcript = data.get('transcript', '')
+            response = await voice_assistant.process_inquiry_async(call_id, transcript)
+            payload = {
+                "response": response,
+                "end_call": False
+            }
+            if service.WEBHOOK_TIMING:
+                payload["timing"] = tracer.end_turn(turn)
+                turn = None
+            with tracer.span('encode'):
+                return Response(service.encode_json(payload), media_type="application/json")
+
+        return {"message": "Event processed"}
+
+    except Exception as e:
+        print(f"Webhook error: {e}")
+        return JSONResponse({"error": "Internal server error"}, status_code=500)
+    finally:
+        tracer.end_turn(turn)
+
+
+@app.post('/search')
+async def search(request: Request):
+    """API endpoint for searching catering services"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        try:
+            criteria = service.parse_search_criteria(data or {})
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+        catering_service = service.catering_service
+        key = service.search_cache_key(catering_service, criteria)
+        cached = service.response_cache.get(key)
+        if cached is None:
+            page = await catering_service.search_async(**criteria)
+            cached = service.search_response(catering_service, criteria, page, key)
+        return _json_response(cached, request)
+
+    except Exception as e:
+        print(f"Search error: {e}")
+        return JSONResponse({"error": "Search failed"}, status_code=500)
+
+
+@app.post('/search/batch')
+async def search_batch(request: Request):
+    """API endpoint running many searches at once, streamed back as NDJSON as they finish"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        queries = service.parse_search_batch(data)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    batch = service.SearchBatch(service.catering_service, queries)
+    resolving = service.location_resolver.resolve_many_async(batch.by_place, timeout=service.GEOCODER_TIMEOUT)
+
+    async def lines():
+        for line in batch.ready:
+            yield line
+        # Searching is CPU work under the catalog lock; keep it off the event loop
+        for line in await _in_thread(batch.evaluate, batch.unlocated):
+            yield line
+        async for place, resolution in resolving:
+            for line in await _in_thread(batch.evaluate, batch.by_place[place], resolution.coordinates):
+                yield line
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get('/services')
+async def list_services(request: Request):
+    """API endpoint to list catering services, whole, paged or streamed"""
+    try:
+        listing = service.parse_listing_params(request.query_params, request.headers.get('Accept', ''))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if listing["stream"]:
+        # A sync generator: Starlette iterates it on a worker thread
+        return StreamingResponse(service.stream_services(listing), media_type="application/x-ndjson")
+    return _json_response(service.services_response(listing), request)
+
+
+@app.post('/catalog/reload')
+async def reload_catalog(request: Request):
+    """Rebuild the catalog from a file in the background and swap it in when ready"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    payload, status = service.start_catalog_reload(request.headers.get('X-Admin-Token'), data)
+    return JSONResponse(payload, status_code=status)
+
+
+@app.post('/admin/profile')
+async def profile(request: Request):
+    """Sample every thread's stack for a few seconds and report where the time goes"""
+    # Sampling sleeps between samples, so it runs on a worker thread while the loop keeps serving
+    report, status = await _in_thread(service.run_profile, request.headers.get('X-Admin-Token'),
+                                      dict(request.query_params))
+    if isinstance(report, str):
+        return PlainTextResponse(report, status_code=status)
+    return JSONResponse(report, status_code=status)
+
+
+@app.get('/metrics')
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(service.metrics_text(), media_type="text/plain; version=0.0.4")
+
+
+@app.get('/health')
+async def health_check():
+    """Health check endpoint"""
+    return service.health_status()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Intent classification benchmark and regression corpus
+
+Runs the labeled utterances in intent_corpus.jsonl through
+VoiceAssistant.analyze_intent_with_context and process_inquiry, with
+geocoding stubbed so nothing touches the network, and reports:
+
+- intent and slot accuracy, overall, per intent type and for ASR-style transcripts
+- p50/p95/p99 latency for intent analysis and for a full turn
+- turns/sec single-threaded and with a thread pool
+
+Usage:
+    python benchmarks/bench_intent.py [--output report.json] [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app  # noqa: E402
+from call_session import CallSession  # noqa: E402
+from caterers import SearchHit  # noqa: E402
+from geocoding import GeocodeCache  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_corpus.jsonl')
+
+# Service-area centroids served by the stub geocoder
+STUB_LOCATIONS = {
+    'boston': (42.3601, -71.0589),
+    'cambridge': (42.3736, -71.1097),
+    'somerville': (42.3876, -71.0995),
+    'newton': (42.3370, -71.2092),
+    'brookline': (42.3318, -71.1212),
+    'quincy': (42.2529, -71.0023),
+}
+
+SLOTS = ('cuisine', 'menu_item', 'location')
+
+
+class StubGeocoder:
+    """Offline stand-in for Nominatim that knows a few service-area towns"""
+
+    def geocode(self, query):
+        for name, (latitude, longitude) in STUB_LOCATIONS.items():
+            if name in query.lower():
+                return SimpleNamespace(latitude=latitude, longitude=longitude)
+        return None
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def make_context(sample):
+    """Session for intent analysis, with as many prior recommendations as the sample expects"""
+    session = CallSession()
+    session.recommendations = [SearchHit(i + 1) for i in range(sample.get('recommendations', 0))]
+    return session
+
+
+def percentiles(samples_us):
+    ordered = sorted(samples_us)
+    if not ordered:
+        return {}
+
+    def pick(fraction):
+        return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)], 2)
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def measure_accuracy(assistant, corpus):
+    per_intent = defaultdict(lambda: {"correct": 0, "total": 0})
+    per_group = defaultdict(lambda: {"correct": 0, "total": 0})
+    slots = {"correct": 0, "total": 0}
+    misclassified = []
+
+    for sample in corpus:
+        intent = assistant.analyze_intent_with_context(sample['utterance'], make_context(sample))
+        correct = intent['type'] == sample['intent']
+        group = "asr" if sample.get('asr') else "clean"
+        for bucket in (per_intent[sample['intent']], per_group[group]):
+            bucket["total"] += 1
+            bucket["correct"] += correct
+
+        for slot in SLOTS:
+            if slot in sample:
+                slots["total"] += 1
+                slots["correct"] += correct and str(intent.get(slot) or '').lower() == sample[slot].lower()
+
+        if not correct:
+            misclassified.append({"id": sample['id'], "utterance": sample['utterance'],
+                                  "expected": sample['intent'], "got": intent['type']})
+
+    def summarize(bucket):
+        return dict(bucket, accuracy=round(bucket["correct"] / bucket["total"], 4) if bucket["total"] else None)
+
+    total = {"correct": sum(b["correct"] for b in per_intent.values()),
+             "total": sum(b["total"] for b in per_intent.values())}
+    return {
+        "overall": summarize(total),
+        "per_intent": {name: summarize(bucket) for name, bucket in sorted(per_intent.items())},
+        "per_group": {name: summarize(bucket) for name, bucket in sorted(per_group.items())},
+        "slots": summarize(slots),
+    }, misclassified
+
+
+def start_call(assistant, call_id, sample):
+    """Open a call and seed it with the recommendations the sample refers to"""
+    assistant.process_inquiry(call_id, "hi")
+    assistant.conversation_context[call_id].recommendations = [
+        SearchHit(i + 1) for i in range(sample.get('recommendations', 0))]
+
+
+def time_intents(assistant, corpus, repeat):
+    timings = []
+    contexts = [make_context(sample) for sample in corpus]
+    for _ in range(repeat):
+        for sample, context in zip(corpus, contexts):
+            start = time.perf_counter()
+            assistant.analyze_intent_with_context(sample['utterance'], context)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def time_turns(assistant, corpus, repeat, prefix="turn"):
+    """Full process_inquiry turns, each in its own call; returns (timings_us, wall_seconds)"""
+    timings = []
+    wall = 0.0
+    for round_number in range(repeat):
+        for sample in corpus:
+            call_id = f"{prefix}-{round_number}-{sample['id']}"
+            start_call(assistant, call_id, sample)
+            start = time.perf_counter()
+            assistant.process_inquiry(call_id, sample['utterance'])
+            elapsed = time.perf_counter() - start
+            timings.append(elapsed * 1e6)
+            wall += elapsed
+            assistant.conversation_context.pop(call_id, None)
+    return timings, wall
+
+
+def concurrent_throughput(assistant, corpus, repeat, workers):
+    chunks = [corpus[i::workers] for i in range(workers)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda args: time_turns(assistant, args[1], repeat, f"worker{args[0]}"),
+                                enumerate(chunks)))
+    wall = time.perf_counter() - start
+    # Wall time here also covers the opening turn of each call
+    turns = 2 * sum(len(timings) for timings, _ in results)
+    return round(turns / wall, 1)
+
+
+def run(args):
+    app.geocode_cache = app.location_resolver.cache = GeocodeCache(StubGeocoder())
+    assistant = app.VoiceAssistant()
+    corpus = load_corpus(args.corpus)
+
+    accuracy, misclassified = measure_accuracy(assistant, corpus)
+
+    # Warm up caches (geocoder, allocator) before timing
+    time_turns(assistant, corpus, 1, "warmup")
+
+    intent_timings = time_intents(assistant, corpus, args.repeat)
+    turn_timings, turn_wall = time_turns(assistant, corpus, args.repeat)
+
+    return {
+        "corpus": {"path": os.path.relpath(args.corpus), "utterances": len(corpus)},
+        "accuracy": accuracy,
+        "latency_us": {
+            "intent": percentiles(intent_timings),
+            "turn": percentiles(turn_timings),
+        },
+        "throughput": {
+            "single_thread_turns_per_sec": round(len(turn_timings) / turn_wall, 1),
+            "concurrent_turns_per_sec": concurrent_throughput(assistant, corpus, args.repeat, args.workers),
+            "workers": args.workers,
+        },
+        "misclassified": misclassified,
+    }
+
+
+def compare(report, baseline):
+    """Print metric deltas against a previous report"""
+    rows = [("intent accuracy", ("accuracy", "overall", "accuracy"), True)]
+    rows += [(f"  {name}", ("accuracy", "per_intent", name, "accuracy"), True)
+             for name in report["accuracy"]["per_intent"]]
+    rows += [("asr accuracy", ("accuracy", "per_group", "asr", "accuracy"), True),
+             ("slot accuracy", ("accuracy", "slots", "accuracy"), True)]
+    for stage in ("intent", "turn"):
+        rows += [(f"{stage} {p} (us)", ("latency_us", stage, p), False) for p in ("p50", "p95", "p99")]
+    rows += [("turns/sec", ("throughput", "single_thread_turns_per_sec"), True),
+             ("turns/sec concurrent", ("throughput", "concurrent_turns_per_sec"), True)]
+
+    def lookup(data, path):
+        for key in path:
+            if not isinstance(data, dict) or key not in data:
+                return None
+            data = data[key]
+        return data
+
+    print(f"{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+    for label, path, higher_is_better in rows:
+        old, new = lookup(baseline, path), lookup(report, path)
+        if old is None or new is None:
+            print(f"{label:<32}{str(old):>12}{str(new):>12}")
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        flag = " !" if worse and abs(change) >= 5 else ""
+        print(f"{label:<32}{old:>12}{new:>12}{change:>+9.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent classification benchmark")
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--repeat', type=int, default=20, help="passes over the corpus when timing")
+    parser.add_argument('--workers', type=int, default=8, help="threads for the concurrent run")
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--baseline', help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            compare(report, json.load(handle))
+    else:
+        summary = {key: report[key] for key in ("accuracy", "latency_us", "throughput")}
+        print(json.dumps(summary, indent=2))
+        print(f"{len(report['misclassified'])} misclassified utterances (see --output for details)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Compare the grid spatial index against a linear geodesic scan
+
+Timings are reported for the original per-pair geodesic scan, a vectorized
+haversine scan over the whole coordinate column, and the grid index in both
+haversine and geodesic-refined precision modes.
+
+Usage:
+    python benchmarks/bench_spatial.py [--sizes 10000 100000 1000000] [--queries 20]
+
+The linear scan costs tens of seconds per query at 1M caterers, so it only
+runs for the first --scan-queries points, which double as a correctness check.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import CateringService, distance_miles  # noqa: E402
+
+# Synthetic caterers are spread over a box roughly the size of the continental US
+LAT_RANGE = (25.0, 49.0)
+LON_RANGE = (-124.0, -67.0)
+
+
+def synthetic_services(count: int, seed: int = 42):
+    """Generate caterer records with random coordinates"""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "id": i + 1,
+            "name": f"Caterer {i + 1}",
+            "cuisine": "American",
+            "location": "Somewhere, US",
+            "coordinates": (rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)),
+            "rating": 4.5,
+            "price_range": "$$",
+            "min_order": 25,
+            "specialties": [],
+            "phone": "+1-555-0100",
+            "description": ""
+        }
+
+
+def linear_scan(services, coords, radius):
+    """The pre-index search: geodesic distance to every caterer"""
+    hits = []
+    for caterer in services:
+        distance = distance_miles(coords, caterer.coordinates)
+        if distance <= radius:
+            hits.append((caterer.id, distance))
+    return sorted(hits, key=lambda hit: hit[1])
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(size: int, queries: int, scan_queries: int, radius: float, k: int) -> None:
+    build_start = time.perf_counter()
+    catalog = CateringService(services=list(synthetic_services(size)))
+    build_time = time.perf_counter() - build_start
+
+    rng = random.Random(7)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(queries)]
+
+    scan_total = 0.0
+    catalog.precision = 'geodesic'
+    for coords in points[:scan_queries]:
+        expected, scan_time = timed(linear_scan, catalog.services, coords, radius)
+        found = catalog.search_by_location(None, radius, coords)
+        nearest = catalog.nearest(coords, k, radius)
+        assert [hit.id for hit in found] == [hit[0] for hit in expected], "index and scan disagree"
+        assert [hit.id for hit in nearest] == [hit[0] for hit in expected[:k]], "nearest and scan disagree"
+        scan_total += scan_time
+
+    columns = catalog.spatial_index.columns
+    vector_total = geodesic_total = index_total = knn_total = 0.0
+    for coords in points:
+        vector_total += timed(columns.distances, *coords)[1]
+        geodesic_total += timed(catalog.search_by_location, None, radius, coords)[1]
+    catalog.precision = 'haversine'
+    for coords in points:
+        index_total += timed(catalog.search_by_location, None, radius, coords)[1]
+        knn_total += timed(catalog.nearest, coords, k, radius)[1]
+
+    def per_query(total, count=queries):
+        return total / max(count, 1) * 1000
+
+    scan_ms = per_query(scan_total, scan_queries)
+    index_ms = per_query(index_total)
+    print(f"{size:>9,} caterers | build {build_time:6.2f}s | "
+          f"geodesic scan {scan_ms:9.2f}ms | "
+          f"numpy scan {per_query(vector_total):7.2f}ms | "
+          f"index {index_ms:6.2f}ms | "
+          f"index+geodesic {per_query(geodesic_total):6.2f}ms | "
+          f"{k}-nearest {per_query(knn_total):6.2f}ms | "
+          f"speedup {scan_ms / max(index_ms, 1e-9):7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--scan-queries', type=int, default=2)
+    parser.add_argument('--radius', type=float, default=25.0)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.queries, min(args.scan_queries, args.queries), args.radius, args.k)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Conversation-state backend conformance check and flush benchmark
+
+Runs the same checks against every StateBackend, then times batched
+write-behind flushes:
+
+- compare-and-set: a stale version conflicts, and conflicts in a batch don't block the other writes
+- TTL: an expired call reads as unknown and can be started again from version 0
+- write-behind: ContextSync coalesces a call's turns into one queued write, nothing is stored
+  before the flush, and when two workers race on a call the loser drops its local copy
+
+The Redis backend runs against fakeredis when it is installed (which also
+runs the Lua compare-and-set script), otherwise against LocalRedis below,
+or against a real server with --redis-url.
+
+Usage:
+    python benchmarks/bench_state.py [--calls 2000] [--turns 5] [--redis-url redis://localhost:6379/15]
+
+Exits with status 1 if any check fails.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from call_session import CallSession  # noqa: E402
+from context_store import ContextStore  # noqa: E402
+from state_backends import (_REDIS_CAS_SCRIPT, ContextSync, MemoryBackend, RedisBackend,  # noqa: E402
+                            SQLiteBackend)
+
+# Shortest TTL every backend honours (Redis expiry has whole-second resolution)
+TTL_SECONDS = 1
+
+
+class LocalRedis:
+    """In-process stand-in for the redis-py calls RedisBackend makes
+
+    Hashes expire like Redis keys, values come back as bytes, and the
+    registered compare-and-set script is emulated in Python with the same
+    arguments and result.
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.time():
+            self._hashes.pop(key, None)
+            self._expires.pop(key, None)
+        return self._hashes.get(key)
+
+    def hmget(self, key, *fields):
+        with self._lock:
+            fields_by_name = self._live(key) or {}
+            return [fields_by_name.get(field) for field in fields]
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                removed += self._live(key) is not None
+                self._hashes.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def register_script(self, script):
+        if script != _REDIS_CAS_SCRIPT:
+            raise ValueError("LocalRedis only emulates the compare-and-set script")
+        return self._compare_and_set
+
+    def _compare_and_set(self, keys, args):
+        ttl = int(args[-1])
+        conflicts = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                expected, version, blob = args[3 * i:3 * i + 3]
+                current = self._live(key)
+                if (int(current['v']) if current else 0) != int(expected):
+                    conflicts.append(i + 1)
+                    continue
+                self._hashes[key] = {'v': str(version).encode(), 'd': bytes(blob)}
+                self._expires[key] = time.time() + ttl
+        return conflicts
+
+    def close(self):
+        pass
+
+
+def redis_client(url=None):
+    """(client, description) for the Redis backend checks"""
+    if url:
+        import redis
+        return redis.Redis.from_url(url), url
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis(), "fakeredis"
+    except ImportError:
+        return LocalRedis(), "LocalRedis stand-in"
+
+
+def backends(redis_url=None):
+    """(name, factory) pairs; each factory returns a fresh, empty backend"""
+    directory = tempfile.mkdtemp(prefix="bench_state_")
+    counter = iter(range(1_000_000))
+    client, description = redis_client(redis_url)
+
+    def redis_backend():
+        # A fresh key prefix per backend keeps runs independent on a shared server
+        return RedisBackend(client=client, prefix=f"bench_state:{os.getpid()}:{next(counter)}:")
+
+    return [
+        ("memory", MemoryBackend),
+        ("sqlite", lambda: SQLiteBackend(os.path.join(directory, f"state{next(counter)}.db"))),
+        (f"redis ({description})", redis_backend),
+    ]
+
+
+class Checks:
+    def __init__(self):
+        self.failures = []
+
+    def expect(self, backend_name, label, condition):
+        if not condition:
+            self.failures.append(f"{backend_name}: {label}")
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}")
+
+
+def check_compare_and_set(checks, name, backend):
+    checks.expect(name, "new call stored from version 0", backend.put_many([("a", 0, 1, b"j1")], 60) == [])
+    checks.expect(name, "stale version conflicts", backend.put_many([("a", 0, 1, b"j2")], 60) == ["a"])
+    checks.expect(name, "conflicting write leaves the stored one", backend.get("a") == (1, b"j1"))
+    conflicts = backend.put_many([("a", 5, 6, b"j3"), ("b", 0, 1, b"j4"), ("a", 1, 2, b"j5")], 60)
+    checks.expect(name, "conflict in a batch only rejects that write", conflicts == ["a"])
+    checks.expect(name, "rest of the batch applied", backend.get("b") == (1, b"j4") and backend.get("a") == (2, b"j5"))
+    backend.delete("a")
+    checks.expect(name, "deleted call reads as unknown", backend.get("a") is None)
+
+
+def check_write_behind(checks, name, backend):
+    worker_a = ContextSync(backend, ContextStore(), flush_interval=60)
+    worker_b = ContextSync(backend, ContextStore(), flush_interval=60)
+
+    session = CallSession(location="Boston")
+    worker_a.contexts["call"] = session
+    for message in ("hello", "italian please"):
+        session.record_user_turn(message)
+        worker_a.commit("call", session)
+    checks.expect(name, "nothing stored before the flush", backend.get("call") is None)
+    checks.expect(name, "two turns flushed as one write", worker_a.flush() == 1 and worker_a.batches == 1)
+    stored = backend.get("call")
+    checks.expect(name, "flushed version is the latest turn", stored is not None and stored[0] == 2)
+
+    other = worker_b.checkout("call")
+    checks.expect(name, "another worker decodes the flushed turn",
+                  other is not None and other.version == 2 and other.user_turns == 2)
+
+    # Both workers take a turn on version 2; the first flush wins
+    mine = worker_a.checkout("call")
+    mine.record_user_turn("for 20 people")
+    worker_a.commit("call", mine)
+    other.record_user_turn("in cambridge")
+    worker_b.commit("call", other)
+    worker_a.flush()
+    checks.expect(name, "losing worker's flush conflicts", worker_b.flush() == 0 and worker_b.conflicts == 1)
+    checks.expect(name, "loser dropped its local copy", "call" not in worker_b.contexts)
+    reloaded = worker_b.checkout("call")
+    checks.expect(name, "loser reloads the winning turn",
+                  reloaded is not None and reloaded.version == 3 and reloaded.dialogue_history[-1]["message"] == "for 20 people")
+
+
+def run_checks(factories):
+    checks = Checks()
+    expiring = []
+    for name, factory in factories:
+        print(name)
+        check_compare_and_set(checks, name, factory())
+        check_write_behind(checks, name, factory())
+        backend = factory()
+        backend.put_many([("short", 0, 1, b"j1")], TTL_SECONDS)
+        expiring.append((name, backend))
+
+    # One wait covers every backend's expiry
+    time.sleep(TTL_SECONDS + 0.2)
+    for name, backend in expiring:
+        print(f"{name} ttl")
+        checks.expect(name, "expired call reads as unknown", backend.get("short") is None)
+        checks.expect(name, "expired call restarts from version 0",
+                      backend.put_many([("short", 0, 1, b"j2")], 60) == [])
+    return checks.failures
+
+
+def bench_flush(name, backend, calls, turns):
+    """Commits per second through ContextSync with one write-behind flush per round of turns"""
+    sync = ContextSync(backend, ContextStore(max_entries=calls + 1), flush_interval=60)
+    sessions = {f"call-{i}": CallSession(location="Boston") for i in range(calls)}
+    for call_id, session in sessions.items():
+        sync.contexts[call_id] = session
+    started = time.perf_counter()
+    for turn in range(turns):
+        for call_id, session in sessions.items():
+            session.record_user_turn(f"turn {turn}")
+            sync.commit(call_id, session)
+        sync.flush()
+    elapsed = time.perf_counter() - started
+    print(f"{name:32} {calls * turns / elapsed:10.0f} commits/s  "
+          f"{sync.bytes_written / max(sync.writes, 1):6.0f} bytes/write  {sync.conflicts} conflicts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversation-state backend checks and flush benchmark")
+    parser.add_argument('--calls', type=int, default=2000, help="concurrent calls in the flush benchmark")
+    parser.add_argument('--turns', type=int, default=5, help="turns per call in the flush benchmark")
+    parser.add_argument('--redis-url', help="run the Redis checks against this server instead of a stand-in")
+    args = parser.parse_args()
+
+    factories = backends(args.redis_url)
+    failures = run_checks(factories)
+    print()
+    for name, factory in factories:
+        bench_flush(name, factory(), args.calls, args.turns)
+    if failures:
+        print(f"\n{len(failures)} check(s) failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
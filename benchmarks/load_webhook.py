@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""Load generator replaying concurrent Retell calls against /webhook
+
+Each simulated call is a scripted conversation: ``call_started``, a few
+``speech_recognition`` turns and ``call_ended``. Calls arrive as a Poisson
+process at --rate calls/sec (0 starts a new call as soon as one finishes)
+with at most --concurrency calls in flight, and the report covers:
+
+- throughput in calls/sec and requests/sec
+- p50/p95/p99 latency per event type, plus how long calls waited for a free slot
+- error rate per event type (non-2xx, error payloads, connection failures)
+- server memory growth and conversation contexts left live after every call
+  ended, which should be zero (anything else is a context leak)
+
+By default the server runs in this process (the Flask app, or the ASGI app
+with --server asgi) with a stub geocoder whose latency is set by
+--geocode-latency, so nothing touches the network. --url targets a server
+that is already running instead; pass --pid to track its memory.
+
+Usage:
+    python benchmarks/load_webhook.py [--calls 500] [--concurrency 20] [--rate 50] [--output run.json]
+    python benchmarks/load_webhook.py --baseline run.json
+    python benchmarks/load_webhook.py --url http://localhost:5000 --pid 12345
+
+The client shares the interpreter with an in-process server, so absolute
+numbers are pessimistic; compare runs made the same way.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Conversations replayed by simulated callers; "{address}" becomes a street corner the
+# gazetteer doesn't know, so those turns go through the (stub) geocoder
+SCRIPTS = [
+    ["Hi there", "I need Italian food in Boston", "Tell me more about the first one",
+     "What's their phone number"],
+    ["Do you have anyone who does pizza for a party", "Anyone near {address}",
+     "Tell me about the second one", "Great, let's book it"],
+    ["I'm looking for tacos for about thirty people", "We're in Cambridge",
+     "What else do you have", "How much is the minimum order"],
+    ["um hi yeah we need catering", "uh mexican food maybe", "near {address}",
+     "can you give me their number"],
+    ["Who caters Chinese food in Somerville", "Tell me more about the first one",
+     "Any other options", "Thanks, that's all"],
+    ["We need lunch for a meeting", "The office is near {address}", "The first one sounds good",
+     "Yes please book that"],
+]
+
+STREETS = ("Main", "Elm", "Washington", "Moody", "Beacon", "Harvard", "Center", "Highland")
+TOWNS = ("Waltham", "Medford", "Arlington", "Watertown", "Needham", "Dedham", "Malden", "Belmont")
+
+# Stub geocoder answers land within ~10 miles of downtown Boston
+STUB_CENTER = (42.3601, -71.0589)
+STUB_SPREAD = 0.15
+
+
+def stub_coordinates(query: str):
+    """Deterministic coordinates for any query, so repeated runs geocode identically"""
+    digest = hashlib.blake2b(query.lower().encode('utf-8'), digest_size=4).digest()
+    return (STUB_CENTER[0] + (digest[0] / 255.0 - 0.5) * 2 * STUB_SPREAD,
+            STUB_CENTER[1] + (digest[1] / 255.0 - 0.5) * 2 * STUB_SPREAD)
+
+
+class StubGeocoder:
+    """Offline stand-in for Nominatim that takes ``latency`` (+/- ``jitter``) seconds per lookup"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.lookups = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.lookups += 1
+            return max(self.latency + self._rng.uniform(-self.jitter, self.jitter), 0.0)
+
+    def geocode(self, query):
+        time.sleep(self._delay())
+        latitude, longitude = stub_coordinates(query)
+        return SimpleNamespace(latitude=latitude, longitude=longitude)
+
+
+class AsyncStubGeocoder:
+    """The same stub for the ASGI server's non-blocking geocoding path"""
+
+    def __init__(self, stub: StubGeocoder):
+        self.stub = stub
+
+    async def geocode(self, query):
+        await asyncio.sleep(self.stub._delay())
+        return stub_coordinates(query)
+
+    async def aclose(self):
+        pass
+
+
+def install_stub_geocoder(service, stub: StubGeocoder) -> None:
+    """Route the app's geocoding (both the blocking and async paths) through the stub"""
+    from geocoding import GeocodeCache
+    service.async_geolocator = AsyncStubGeocoder(stub)
+    service.geocode_cache = service.location_resolver.cache = GeocodeCache(
+        stub, async_geocoder=service.async_geolocator)
+
+
+def start_server(kind: str):
+    """Serve the app on an ephemeral localhost port from a background thread; returns (url, stop)"""
+    import app as service
+    if kind == 'flask':
+        import logging
+        from werkzeug.serving import WSGIRequestHandler, make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        class Handler(WSGIRequestHandler):
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms a request
+            disable_nagle_algorithm = True
+        server = make_server('127.0.0.1', 0, service.app, threaded=True, request_handler=Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+    import socket
+    import uvicorn
+    import asgi
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(asgi.app, log_level='warning', lifespan='on'))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [listener]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return f"http://127.0.0.1:{listener.getsockname()[1]}", stop
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of a process (Linux /proc), or None where that isn't available"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding='ascii') as handle:
+            for line in handle:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def live_contexts(session: requests.Session, url: str) -> Dict:
+    """The server's conversation counters from /health"""
+    try:
+        return session.get(f"{url}/health", timeout=10).json()["conversations"]
+    except (requests.RequestException, ValueError, KeyError):
+        return {}
+
+
+def percentiles(samples_ms: List[float]) -> Dict:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {}
+
+    def pick(fraction):
+        return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class LoadRun:
+    """Replays scripted calls and records per-event latency and errors"""
+
+    def __init__(self, url: str, turns: Optional[int], seed: int, timeout: float):
+        self.url = url.rstrip('/')
+        self.turns = turns
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.waits: List[float] = []
+        self.requests = 0
+        self.calls_started = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def conversation(self) -> List[str]:
+        """The transcripts of one call: a script, cycled or cut to --turns"""
+        script = self.rng.choice(SCRIPTS)
+        turns = self.turns or len(script)
+        first, second = self.rng.sample(STREETS, 2)
+        address = f"{first} Street and {second} Avenue in {self.rng.choice(TOWNS)}"
+        return [script[i % len(script)].format(address=address) for i in range(turns)]
+
+    def _post(self, session: requests.Session, event: Dict) -> None:
+        event_type = event["event_type"]
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{self.url}/webhook", json=event, timeout=self.timeout)
+            failed = response.status_code >= 400 or "error" in response.json()
+        except (requests.RequestException, ValueError):
+            failed = True
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.requests += 1
+            self.latencies[event_type].append(elapsed)
+            if failed:
+                self.errors[event_type] += 1
+
+    def call(self, number: int, transcripts: List[str], scheduled: float) -> None:
+        with self._lock:
+            self.waits.append((time.perf_counter() - scheduled) * 1000)
+        session = self._session()
+        call_id = f"load-{number}"
+        self._post(session, {"call_id": call_id, "event_type": "call_started"})
+        for transcript in transcripts:
+            self._post(session, {"call_id": call_id, "event_type": "speech_recognition",
+                                 "transcript": transcript})
+        self._post(session, {"call_id": call_id, "event_type": "call_ended"})
+
+    def run(self, calls: int, concurrency: int, rate: float) -> float:
+        """Replay ``calls`` calls; returns the wall time in seconds"""
+        first = self.calls_started
+        self.calls_started += calls
+        conversations = [self.conversation() for _ in range(calls)]
+        started = time.perf_counter()
+        scheduled = started
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            if rate <= 0:
+                # Closed loop: every worker starts its next call as soon as the last one ends
+                list(pool.map(lambda number: self.call(first + number, conversations[number], time.perf_counter()),
+                              range(calls)))
+            else:
+                futures = []
+                for number in range(calls):
+                    scheduled += self.rng.expovariate(rate)
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    futures.append(pool.submit(self.call, first + number, conversations[number], scheduled))
+                for future in futures:
+                    future.result()
+        return time.perf_counter() - started
+
+
+def run(args) -> Dict:
+    stub = StubGeocoder(args.geocode_latency, args.geocode_jitter, args.seed)
+    stop = None
+    pid = args.pid
+    if args.url:
+        url = args.url
+    else:
+        import app as service
+        install_stub_geocoder(service, stub)
+        url, stop = start_server(args.server)
+        pid = os.getpid()
+
+    load = LoadRun(url, args.turns, args.seed, args.timeout)
+    probe = requests.Session()
+    try:
+        # Warm up imports, caches and connections before measuring memory
+        load.run(min(args.concurrency, args.calls), args.concurrency, 0)
+        load.latencies.clear()
+        load.errors.clear()
+        load.waits.clear()
+        load.requests = 0
+        contexts_before = live_contexts(probe, url)
+        rss_before = rss_bytes(pid)
+
+        wall = load.run(args.calls, args.concurrency, args.rate)
+
+        rss_after = rss_bytes(pid)
+        contexts_after = live_contexts(probe, url)
+    finally:
+        if stop is not None:
+            stop()
+
+    total_errors = sum(load.errors.values())
+    return {
+        "config": {
+            "server": args.url or args.server,
+            "calls": args.calls,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "turns": args.turns,
+            "geocode_latency_ms": args.geocode_latency * 1000,
+            "geocode_jitter_ms": args.geocode_jitter * 1000,
+            "seed": args.seed,
+        },
+        "throughput": {
+            "wall_seconds": round(wall, 3),
+            "calls_per_sec": round(args.calls / wall, 1),
+            "requests_per_sec": round(load.requests / wall, 1),
+        },
+        "latency_ms": {event_type: percentiles(samples) for event_type, samples in sorted(load.latencies.items())},
+        "call_wait_ms": percentiles(load.waits),
+        "errors": {
+            "total": total_errors,
+            "rate": round(total_errors / load.requests, 4) if load.requests else None,
+            "by_event": dict(load.errors),
+        },
+        "memory": {
+            "rss_before": rss_before,
+            "rss_after": rss_after,
+            "rss_growth": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "live_contexts_before": contexts_before.get("live"),
+            "live_contexts_after": contexts_after.get("live"),
+            "context_bytes_after": contexts_after.get("memory_bytes"),
+        },
+        "geocoder_lookups": stub.lookups if not args.url else None,
+    }
+
+
+def compare(report, baseline):
+    """Print metric deltas against a previous report"""
+    rows = [("calls/sec", ("throughput", "calls_per_sec"), True),
+            ("requests/sec", ("throughput", "requests_per_sec"), True)]
+    for event_type in report["latency_ms"]:
+        rows += [(f"{event_type} {p} (ms)", ("latency_ms", event_type, p), False) for p in ("p50", "p95", "p99")]
+    rows += [("call wait p99 (ms)", ("call_wait_ms", "p99"), False),
+             ("error rate", ("errors", "rate"), False),
+             ("rss growth (bytes)", ("memory", "rss_growth"), False),
+             ("live contexts after", ("memory", "live_contexts_after"), False)]
+
+    def lookup(data, path):
+        for key in path:
+            if not isinstance(data, dict) or key not in data:
+                return None
+            data = data[key]
+        return data
+
+    print(f"{'metric':<36}{'baseline':>14}{'current':>14}{'change':>10}")
+    for label, path, higher_is_better in rows:
+        old, new = lookup(baseline, path), lookup(report, path)
+        if old is None or new is None:
+            print(f"{label:<36}{str(old):>14}{str(new):>14}")
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        flag = " !" if worse and abs(change) >= 5 else ""
+        print(f"{label:<36}{old:>14}{new:>14}{change:>+9.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent Retell call load generator for /webhook")
+    parser.add_argument('--calls', type=int, default=500, help="calls to replay")
+    parser.add_argument('--concurrency', type=int, default=20, help="most calls in flight at once")
+    parser.add_argument('--rate', type=float, default=0, help="call arrivals per second (0: closed loop)")
+    parser.add_argument('--turns', type=int, help="speech turns per call (default: the script's length)")
+    parser.add_argument('--geocode-latency', type=float, default=0.05, help="stub geocoder seconds per lookup")
+    parser.add_argument('--geocode-jitter', type=float, default=0.0, help="+/- seconds added to each lookup")
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask', help="in-process server")
+    parser.add_argument('--url', help="target a running server instead (the stub geocoder isn't used)")
+    parser.add_argument('--pid', type=int, help="process id of the --url server, for memory growth")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds per request")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--baseline', help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            compare(report, json.load(handle))
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from caterers import SearchHit
+
+# Intent types remembered per call for follow-up handling
+RECENT_INTENTS = 5
+
+
+class CallSession:
+    """Conversation state for one call
+
+    Derived values that handlers need on every turn (user turn count, recent
+    intents, selected caterer, resolved coordinates) are kept up to date as
+    turns are recorded instead of being recomputed from the dialogue history,
+    so a turn costs the same however long the call has been running.
+    """
+
+    __slots__ = ('stage', 'preferences', 'location', 'resolved_query', 'coordinates', 'pending_location',
+                 'recommendations', 'dialogue_history', 'last_intent', 'recent_intents', 'selected_caterer',
+                 'pending_actions', 'user_turns', 'turn_started', 'version')
+
+    def __init__(self, location: Optional[str] = None, history_limit: Optional[int] = None):
+        self.stage = "greeting"
+        self.preferences: Dict[str, Union[str, float]] = {}
+        self.location = location
+        self.resolved_query: Optional[str] = None
+        self.coordinates: Optional[Tuple[float, float]] = None
+        self.pending_location: Optional[str] = None
+        self.recommendations: List[SearchHit] = []
+        self.dialogue_history: deque = deque(maxlen=history_limit)
+        self.last_intent: Optional[Dict] = None
+        self.recent_intents: deque = deque(maxlen=RECENT_INTENTS)
+        self.selected_caterer: Optional[SearchHit] = None
+        self.pending_actions: List[str] = []
+        self.user_turns = 0
+        self.turn_started = 0.0
+        self.version = 0
+
+    def record_user_turn(self, message: str) -> None:
+        self.user_turns += 1
+        self.turn_started = time.monotonic()
+        self.pending_location = None
+        self.dialogue_history.append({
+            "speaker": "user",
+            "message": message,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def record_assistant_turn(self, message: str) -> None:
+        self.dialogue_history.append({
+            "speaker": "assistant",
+            "message": message,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def record_intent(self, intent: Dict) -> None:
+        self.last_intent = intent
+        self.recent_intents.append(intent["type"])
+
+    def resolved_coordinates(self, resolve) -> Optional[Tuple[float, float]]:
+        """Coordinates for the current location, calling resolve(location) only when it changed
+
+        resolve returns a location_resolver.Resolution. A pending one (the
+        geocoder missed the turn's deadline) or a failed one isn't
+        remembered, so the next turn asks again and picks up the answer from
+        the cache, or retries the geocoder.
+        """
+        if not self.location or self.pending_location == self.location:
+            return None
+        if self.resolved_query != self.location:
+            self._remember(self.location, resolve(self.location))
+        return self.coordinates
+
+    async def resolved_coordinates_async(self, resolve_async, location: Optional[str] = None
+                                         ) -> Optional[Tuple[float, float]]:
+        """Async counterpart of resolved_coordinates, for location (default: the current one)"""
+        location = location or self.location
+        if not location or self.pending_location == location:
+            return None
+        if self.resolved_query != location:
+            self._remember(location, await resolve_async(location))
+        return self.coordinates
+
+    def _remember(self, location: str, resolution) -> None:
+        if resolution.pending:
+            self.pending_location = location
+            self.coordinates = None
+            self.resolved_query = None
+        elif resolution.failed:
+            self.pending_location = None
+            self.coordinates = None
+            self.resolved_query = None
+        else:
+            self.pending_location = None
+            self.coordinates = resolution.coordinates
+            self.resolved_query = location
+
+    def to_state(self) -> Dict:
+        """Plain data (lists, dicts, scalars) for serialization"""
+        state = {field: getattr(self, field) for field in self.__slots__}
+        state["recommendations"] = [list(hit) for hit in self.recommendations]
+        state["selected_caterer"] = list(self.selected_caterer) if self.selected_caterer else None
+        state["dialogue_history"] = list(self.dialogue_history)
+        state["recent_intents"] = list(self.recent_intents)
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict, history_limit: Optional[int] = None) -> "CallSession":
+        session = cls(history_limit=history_limit)
+        for field in cls.__slots__:
+            if field in state:
+                setattr(session, field, state[field])
+        session.recommendations = [SearchHit(*hit) for hit in session.recommendations]
+        session.selected_caterer = SearchHit(*session.selected_caterer) if session.selected_caterer else None
+        session.coordinates = tuple(session.coordinates) if session.coordinates else None
+        session.dialogue_history = deque(session.dialogue_history, maxlen=history_limit)
+        session.recent_intents = deque(session.recent_intents, maxlen=RECENT_INTENTS)
+        return session
+
+    def __repr__(self) -> str:
+        return f"CallSession(stage={self.stage!r}, user_turns={self.user_turns}, version={self.version})"
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+
+from caterers import Caterer
+
+REQUIRED_FIELDS = ('id', 'name', 'cuisine', 'location', 'rating', 'price_range', 'min_order', 'phone')
+
+
+def read_jsonl(path: str) -> Iterator[Dict]:
+    """Stream one JSON object per line"""
+    with open(path, encoding='utf-8') as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Catalog line {line_number} is not valid JSON: {e}")
+
+
+def read_csv(path: str) -> Iterator[Dict]:
+    """Stream rows of a CSV file with a header line"""
+    with open(path, encoding='utf-8', newline='') as handle:
+        yield from csv.DictReader(handle)
+
+
+def read_sqlite(path: str, table: str = 'caterers') -> Iterator[Dict]:
+    """Stream rows of a SQLite table without loading it into memory"""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        connection.row_factory = sqlite3.Row
+        for row in connection.execute(f'SELECT * FROM "{table}"'):
+            yield dict(row)
+    finally:
+        connection.close()
+
+
+READERS = {
+    '.jsonl': read_jsonl,
+    '.ndjson': read_jsonl,
+    '.csv': read_csv,
+    '.db': read_sqlite,
+    '.sqlite': read_sqlite,
+    '.sqlite3': read_sqlite,
+}
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    """Pick a reader from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported catalog format: {extension or path}")
+    return READERS[extension](path)
+
+
+def _number(value):
+    """Parse a number, keeping whole values as ints so "$25" doesn't become "$25.0" """
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _text(value) -> str:
+    return ' '.join(str(value).split())
+
+
+def _specialties(value) -> List[str]:
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('['):
+            value = json.loads(value)
+        else:
+            value = value.replace(';', '|').split('|')
+    return [_text(item).lower() for item in value if _text(item)]
+
+
+def normalize_record(row: Dict) -> Caterer:
+    """Validate a raw catalog row and turn it into a Caterer
+
+    Accepts either a ``coordinates`` pair (list, tuple or "lat,lon" string) or
+    separate ``latitude``/``longitude`` columns, and specialties as a list, a
+    JSON array string or a "|"/";" separated string. Raises ValueError for
+    rows that can't be used.
+    """
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    try:
+        coordinates = row.get('coordinates')
+        if coordinates in (None, ''):
+            latitude, longitude = row['latitude'], row['longitude']
+        elif isinstance(coordinates, str):
+            latitude, longitude = coordinates.strip('()[] ').split(',')
+        else:
+            latitude, longitude = coordinates
+        latitude, longitude = float(latitude), float(longitude)
+        rating = float(row['rating'])
+        min_order = _number(row['min_order'])
+        specialties = _specialties(row.get('specialties'))
+        caterer_id = int(row['id'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"bad value ({e})")
+
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError(f"coordinates out of range ({latitude}, {longitude})")
+    if not 0.0 <= rating <= 5.0:
+        raise ValueError(f"rating out of range ({rating})")
+    if min_order < 0:
+        raise ValueError(f"negative min_order ({min_order})")
+
+    return Caterer(
+        id=caterer_id,
+        name=_text(row['name']),
+        cuisine=_text(row['cuisine']).title(),
+        location=_text(row['location']),
+        latitude=latitude,
+        longitude=longitude,
+        rating=rating,
+        price_range=_text(row['price_range']),
+        min_order=min_order,
+        specialties=specialties,
+        phone=_text(row['phone']),
+        description=_text(row.get('description') or '')
+    )
+
+
+class CatalogLoader:
+    """Streams catalog files into a CateringService
+
+    Rows flow through reader -> normalize_record -> ``add_services`` in
+    batches, so memory stays flat and searches can run between batches while
+    a catalog is still being indexed. ``reload`` builds a complete new
+    service in the background and hands it to ``publish`` only once it is
+    fully indexed, so callers never see a half-built catalog.
+    """
+
+    def __init__(self, factory: Callable[[], object], publish: Callable[[object, str], None],
+                 batch_size: int = 1000):
+        self.factory = factory
+        self.publish = publish
+        self.batch_size = batch_size
+        self.state = "idle"
+        self.source = None
+        self.loaded = 0
+        self.rejected = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def records(self, source: str) -> Iterator[Caterer]:
+        """Yield validated caterers, reporting and skipping bad rows"""
+        for row_number, row in enumerate(read_rows(source), 1):
+            try:
+                yield normalize_record(row)
+            except ValueError as e:
+                self.rejected += 1
+                print(f"Skipping catalog row {row_number}: {e}")
+
+    def load(self, source: str, target) -> int:
+        """Stream a catalog file into target, one batch at a time; returns rows loaded"""
+        records = self.records(source)
+        loaded = 0
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                return loaded
+            target.add_services(batch)
+            loaded += len(batch)
+            self.loaded += len(batch)
+
+    def load_in_background(self, source: str, target) -> Optional[threading.Thread]:
+        """Index a catalog into an already-published service while it serves requests, republishing it when done"""
+        def build():
+            self.load(source, target)
+            self.publish(target, source)
+        return self._start(source, build)
+
+    def reload(self, source: str) -> Optional[threading.Thread]:
+        """Build a fresh service from source in the background, then swap it in"""
+        def build():
+            service = self.factory()
+            self.load(source, service)
+            self.publish(service, source)
+        return self._start(source, build)
+
+    def _start(self, source: str, job: Callable[[], None]) -> Optional[threading.Thread]:
+        """Run a load job on a daemon thread; returns None if one is already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return None
+            self.state = "loading"
+            self.source = source
+            self.loaded = self.rejected = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.error = None
+            self._thread = threading.Thread(target=self._run, args=(job,), name="catalog-loader", daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def _run(self, job: Callable[[], None]) -> None:
+        try:
+            job()
+            self.state = "ready"
+        except Exception as e:
+            print(f"Catalog load error: {e}")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            self.finished_at = time.time()
+
+    def status(self) -> Dict:
+        """Progress of the current or last load"""
+        return {
+            "state": self.state,
+            "source": self.source,
+            "loaded": self.loaded,
+            "rejected": self.rejected,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else None,
+            "error": self.error
+        }
+
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""Versioned binary catalog snapshots that workers map instead of parsing
+
+Layout (little-endian, every section 8-byte aligned)::
+
+    header     magic "EZCSNAP\\0", format version (u16), reserved (u16), section count (u32)
+    directory  per section: name (8 bytes, NUL padded), offset (u64), length (u64)
+    sections   meta     JSON: source, created, caterers
+               strofs   u64 offsets into the string table, one more than there are strings
+               strings  UTF-8 string table; every distinct string is stored once
+               records  one fixed-width row per caterer, in catalog order (RECORD_DTYPE)
+               specs    u32 string ids of each caterer's specialties
+               ids/lats/lons  i8/f8/f8 coordinate columns, row-aligned with records
+               cuiterm/cuiofs/cuiids  cuisine index: term string ids, posting offsets, caterer ids
+               spcterm/spcofs/spcids  specialty index, same layout
+
+Arrays are read with ``numpy.frombuffer`` and postings as ``memoryview``
+slices straight off a copy-on-write mapping, so pre-forked workers share
+those pages until one of them modifies its catalog. Caterer records and
+strings are only decoded when something reads them (see SnapshotRecords).
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from caterers import Caterer
+
+MAGIC = b'EZCSNAP\0'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<8sHHI')
+_SECTION = struct.Struct('<8sQQ')
+
+RECORD_DTYPE = np.dtype([
+    ('id', '<i8'), ('rating', '<f8'), ('min_order', '<f8'),
+    ('name', '<u4'), ('cuisine', '<u4'), ('location', '<u4'), ('price_range', '<u4'),
+    ('phone', '<u4'), ('description', '<u4'), ('spec_start', '<u4'), ('spec_count', '<u4'),
+    ('flags', '<u4'), ('reserved', '<u4')
+])
+# min_order is stored as f8; this flag restores it as an int so API output is unchanged
+_INTEGRAL_MIN_ORDER = 1
+
+_INDEXES = (('cuisine_index', b'cui'), ('specialty_index', b'spc'))
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.encoded: List[bytes] = []
+
+    def __call__(self, value: str) -> int:
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.encoded)
+            self.encoded.append(value.encode('utf-8'))
+        return string_id
+
+
+def write_snapshot(service, path: str, source: Optional[str] = None) -> int:
+    """Write a service's catalog and indexes to path (atomically); returns the caterer count
+
+    ``service`` is a CateringService. Its lock is held only while the
+    catalog and index postings are copied; encoding and writing happen after
+    it is released, so searches don't wait on the disk.
+    """
+    with service._lock:
+        caterers = list(service._caterers.values())
+        postings = {attribute: [(term, list(ids)) for term, ids in getattr(service, attribute).postings()]
+                    for attribute, _ in _INDEXES}
+
+    strings = _StringTable()
+    records = np.zeros(len(caterers), dtype=RECORD_DTYPE)
+    specialties: List[int] = []
+    for row, caterer in enumerate(caterers):
+        record = records[row]
+        record['id'] = caterer.id
+        record['rating'] = caterer.rating
+        record['min_order'] = caterer.min_order
+        record['flags'] = _INTEGRAL_MIN_ORDER if isinstance(caterer.min_order, int) else 0
+        for field in ('name', 'cuisine', 'location', 'price_range', 'phone', 'description'):
+            record[field] = strings(getattr(caterer, field))
+        record['spec_start'] = len(specialties)
+        record['spec_count'] = len(caterer.specialties)
+        specialties.extend(strings(specialty) for specialty in caterer.specialties)
+
+    sections = [
+        (b'records', records.tobytes()),
+        (b'specs', np.asarray(specialties, dtype='<u4').tobytes()),
+        (b'ids', np.asarray([caterer.id for caterer in caterers], dtype='<i8').tobytes()),
+        (b'lats', np.asarray([caterer.latitude for caterer in caterers], dtype='<f8').tobytes()),
+        (b'lons', np.asarray([caterer.longitude for caterer in caterers], dtype='<f8').tobytes()),
+    ]
+    for attribute, prefix in _INDEXES:
+        terms, offsets, ids = [], [0], []
+        for term, term_ids in sorted(postings[attribute]):
+            terms.append(strings(term))
+            ids.extend(sorted(term_ids))
+            offsets.append(len(ids))
+        sections += [
+            (prefix + b'term', np.asarray(terms, dtype='<u4').tobytes()),
+            (prefix + b'ofs', np.asarray(offsets, dtype='<u8').tobytes()),
+            (prefix + b'ids', np.asarray(ids, dtype='<i8').tobytes()),
+        ]
+
+    string_offsets = np.zeros(len(strings.encoded) + 1, dtype='<u8')
+    np.cumsum([len(value) for value in strings.encoded], out=string_offsets[1:])
+    meta = {"source": source, "created": time.time(), "caterers": len(caterers)}
+    sections = [
+        (b'meta', json.dumps(meta).encode('utf-8')),
+        (b'strofs', string_offsets.tobytes()),
+        (b'strings', b''.join(strings.encoded)),
+    ] + sections
+
+    directory_end = _HEADER.size + _SECTION.size * len(sections)
+    offset = _align(directory_end)
+    entries = []
+    for name, data in sections:
+        entries.append((name, offset, len(data)))
+        offset = _align(offset + len(data))
+
+    # A unique temporary name, so workers publishing at the same time never share one
+    directory, base = os.path.split(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=base + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(sections)))
+            for name, section_offset, length in entries:
+                handle.write(_SECTION.pack(name, section_offset, length))
+            for (name, data), (_, section_offset, _) in zip(sections, entries):
+                handle.write(b'\0' * (section_offset - handle.tell()))
+                handle.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return len(caterers)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class CatalogSnapshot:
+    """A snapshot file mapped copy-on-write; raises ValueError for foreign or newer formats"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        magic, version, _, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+        self._sections: Dict[bytes, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(self._map, _HEADER.size + i * _SECTION.size)
+            if offset + length > len(self._map):
+                raise ValueError(f"{path} is truncated")
+            self._sections[name.rstrip(b'\0')] = (offset, length)
+        self.meta = json.loads(bytes(self._section(b'meta')))
+        self._string_offsets = self._array(b'strofs', '<u8')
+        self._string_blob = self._section(b'strings')
+        self._strings: List[Optional[str]] = [None] * (len(self._string_offsets) - 1)
+        self._records = self._array(b'records', RECORD_DTYPE)
+        self._specialties = self._array(b'specs', '<u4')
+        self._lats = self._array(b'lats', '<f8')
+        self._lons = self._array(b'lons', '<f8')
+
+    def _section(self, name: bytes) -> memoryview:
+        try:
+            offset, length = self._sections[name]
+        except KeyError:
+            raise ValueError(f"{self.path} has no {name.decode()} section")
+        return memoryview(self._map)[offset:offset + length]
+
+    def _array(self, name: bytes, dtype) -> np.ndarray:
+        return np.frombuffer(self._section(name), dtype=dtype)
+
+    def string(self, string_id: int) -> str:
+        """Decode one string table entry (once)"""
+        value = self._strings[string_id]
+        if value is None:
+            start, end = int(self._string_offsets[string_id]), int(self._string_offsets[string_id + 1])
+            value = self._strings[string_id] = str(self._string_blob[start:end], 'utf-8')
+        return value
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def caterer(self, row: int) -> Caterer:
+        """Decode the caterer stored at a row"""
+        (service_id, rating, min_order, name, cuisine, location, price_range,
+         phone, description, spec_start, spec_count, flags, _) = self._records[row].item()
+        string = self.string
+        return Caterer(
+            id=service_id,
+            name=string(name),
+            cuisine=string(cuisine),
+            location=string(location),
+            latitude=float(self._lats[row]),
+            longitude=float(self._lons[row]),
+            rating=rating,
+            price_range=string(price_range),
+            min_order=int(min_order) if flags & _INTEGRAL_MIN_ORDER else min_order,
+            specialties=[string(i) for i in self._specialties[spec_start:spec_start + spec_count].tolist()],
+            phone=string(phone),
+            description=string(description)
+        )
+
+    def column(self, field: str) -> np.ndarray:
+        """One RECORD_DTYPE field for every row, as a view of the mapped file"""
+        return self._records[field]
+
+    def records(self) -> "SnapshotRecords":
+        """The catalog as an id -> Caterer mapping that decodes records on first access"""
+        return SnapshotRecords(self)
+
+    def coordinates(self) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """(ids, latitudes, longitudes); the arrays are views of the mapped file"""
+        return self._array(b'ids', '<i8').tolist(), self._array(b'lats', '<f8'), self._array(b'lons', '<f8')
+
+    def postings(self, attribute: str) -> Iterator[Tuple[str, Sequence[int]]]:
+        """(term, ids) pairs of one of the service's term indexes, ids as views of the mapped file"""
+        prefix = dict(_INDEXES)[attribute]
+        terms = self._array(prefix + b'term', '<u4').tolist()
+        offsets = self._array(prefix + b'ofs', '<u8').tolist()
+        ids = self._section(prefix + b'ids').cast('q')
+        for i, term in enumerate(terms):
+            yield self.string(term), ids[offsets[i]:offsets[i + 1]]
+
+
+class SnapshotRecords(MutableMapping):
+    """id -> Caterer over a snapshot, in catalog order
+
+    Behaves like the dict CateringService keeps its records in: records are
+    decoded the first time they are read and kept, and assignments and
+    deletions (catalog updates after startup) are held in memory.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self._snapshot = snapshot
+        # id -> row, built on first lookup
+        self._rows: Optional[Dict[int, int]] = None
+        # Ids in catalog order, built when the catalog first changes; until then the snapshot's
+        self._order: Optional[Dict[int, None]] = None
+        self._decoded: Dict[int, Caterer] = {}
+
+    def _row_map(self) -> Dict[int, int]:
+        if self._rows is None:
+            self._rows = {service_id: row for row, service_id in enumerate(self._snapshot.coordinates()[0])}
+        return self._rows
+
+    def _changed_order(self) -> Dict[int, None]:
+        if self._order is None:
+            self._order = dict.fromkeys(self._snapshot.coordinates()[0])
+        return self._order
+
+    def __getitem__(self, service_id: int) -> Caterer:
+        caterer = self._decoded.get(service_id)
+        if caterer is None:
+            caterer = self._decoded[service_id] = self._snapshot.caterer(self._row_map()[service_id])
+        return caterer
+
+    def get(self, service_id: int, default=None):
+        if service_id not in self:
+            return default
+        return self[service_id]
+
+    def __setitem__(self, service_id: int, caterer: Caterer) -> None:
+        order = self._changed_order()
+        order.pop(service_id, None)
+        order[service_id] = None
+        self._decoded[service_id] = caterer
+
+    def __delitem__(self, service_id: int) -> None:
+        del self._changed_order()[service_id]
+        self._decoded.pop(service_id, None)
+        self._row_map().pop(service_id, None)
+
+    def __contains__(self, service_id) -> bool:
+        if self._order is None:
+            return service_id in self._row_map()
+        return service_id in self._order
+
+    def __iter__(self) -> Iterator[int]:
+        if self._order is None:
+            return iter(self._snapshot.coordinates()[0])
+        return iter(self._order)
+
+    def __len__(self) -> int:
+        return len(self._snapshot) if self._order is None else len(self._order)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import sys
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+class Caterer:
+    """Compact catalog record for one catering partner
+
+    Uses ``__slots__`` instead of a per-instance dict, and interns the
+    low-cardinality strings (cuisine, location, price range, specialties)
+    so every caterer sharing a value points at the same string object.
+    Records are treated as immutable; replace them through CateringService.
+    """
+
+    __slots__ = ('id', 'name', 'cuisine', 'location', 'latitude', 'longitude', 'rating',
+                 'price_range', 'min_order', 'specialties', 'phone', 'description')
+
+    def __init__(self, id: int, name: str, cuisine: str, location: str, latitude: float,
+                 longitude: float, rating: float, price_range: str, min_order: float,
+                 specialties: Iterable[str], phone: str, description: str = ""):
+        self.id = id
+        self.name = name
+        self.cuisine = sys.intern(cuisine)
+        self.location = sys.intern(location)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.rating = rating
+        self.price_range = sys.intern(price_range)
+        self.min_order = min_order
+        self.specialties = tuple(sys.intern(specialty) for specialty in specialties)
+        self.phone = phone
+        self.description = description
+
+    @property
+    def coordinates(self) -> Tuple[float, float]:
+        return (self.latitude, self.longitude)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Caterer":
+        """Build a record from the catalog's dict format"""
+        latitude, longitude = data['coordinates']
+        return cls(
+            id=data['id'],
+            name=data['name'],
+            cuisine=data['cuisine'],
+            location=data['location'],
+            latitude=float(latitude),
+            longitude=float(longitude),
+            rating=data['rating'],
+            price_range=data['price_range'],
+            min_order=data['min_order'],
+            specialties=data['specialties'],
+            phone=data['phone'],
+            description=data.get('description', "")
+        )
+
+    def project(self, fields: Iterable[str]) -> Dict:
+        """Serialize only the given API fields (names from FIELDS)"""
+        data = {}
+        for field in fields:
+            if field == 'coordinates':
+                data[field] = [self.latitude, self.longitude]
+            elif field == 'specialties':
+                data[field] = list(self.specialties)
+            else:
+                data[field] = getattr(self, field)
+        return data
+
+    def to_dict(self, distance: Optional[float] = None) -> Dict:
+        """Serialize for the API, adding the search distance when there is one"""
+        data = {
+            "id": self.id,
+            "name": self.name,
+            "cuisine": self.cuisine,
+            "location": self.location,
+            "coordinates": [self.latitude, self.longitude],
+            "rating": self.rating,
+            "price_range": self.price_range,
+            "min_order": self.min_order,
+            "specialties": list(self.specialties),
+            "phone": self.phone,
+            "description": self.description
+        }
+        if distance is not None:
+            data["distance"] = round(distance, 1)
+        return data
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Caterer):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"Caterer(id={self.id!r}, name={self.name!r})"
+
+
+# Field names of the API representation, in to_dict order
+FIELDS = ('id', 'name', 'cuisine', 'location', 'coordinates', 'rating', 'price_range',
+          'min_order', 'specialties', 'phone', 'description')
+
+
+class SearchHit(NamedTuple):
+    """One search result: a caterer id with its distance (miles) and relevance score"""
+    id: int
+    distance: Optional[float] = None
+    score: Optional[float] = None
+
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Optional
+
+from call_session import CallSession
+
+# Contexts measured per stats() call; the memory estimate scales their mean size up to every live context
+SIZE_SAMPLE = 200
+
+
+def approximate_size(obj, _seen=None) -> int:
+    """Rough deep size in bytes of plain containers, slotted objects and their contents"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(key, seen) + approximate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(approximate_size(item, seen) for item in obj)
+    elif hasattr(obj, '__slots__'):
+        size += sum(approximate_size(getattr(obj, slot), seen) for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+
+class ContextStore(MutableMapping):
+    """Per-call conversation contexts with LRU and idle-time eviction
+
+    Behaves like the dict it replaces, keyed by call_id. Reading a context
+    marks it as recently used; once more than ``max_entries`` calls are
+    live the least recently used one is dropped, and contexts idle for
+    longer than ``idle_ttl`` seconds expire. Expired entries are removed
+    lazily on access and by an optional background sweeper, so contexts
+    whose ``call_ended`` event never arrives don't accumulate.
+    """
+
+    def __init__(self, max_entries: int = 10000, idle_ttl: float = 1800):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[str, CallSession]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.created = 0
+        self.ended = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, call_id: str, now: float) -> bool:
+        return now - self._last_access[call_id] > self.idle_ttl
+
+    def _drop(self, call_id: str) -> None:
+        del self._entries[call_id]
+        del self._last_access[call_id]
+
+    def __getitem__(self, call_id: str) -> CallSession:
+        with self._lock:
+            if call_id not in self._entries:
+                raise KeyError(call_id)
+            now = time.monotonic()
+            if self._expired(call_id, now):
+                self._drop(call_id)
+                self.expirations += 1
+                raise KeyError(call_id)
+            self._entries.move_to_end(call_id)
+            self._last_access[call_id] = now
+            return self._entries[call_id]
+
+    def __setitem__(self, call_id: str, context: CallSession) -> None:
+        with self._lock:
+            if call_id not in self._entries:
+                self.created += 1
+            self._entries[call_id] = context
+            self._entries.move_to_end(call_id)
+            self._last_access[call_id] = time.monotonic()
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def __delitem__(self, call_id: str) -> None:
+        with self._lock:
+            self._drop(call_id)
+            self.ended += 1
+
+    def __contains__(self, call_id) -> bool:
+        with self._lock:
+            if call_id not in self._entries:
+                return False
+            if self._expired(call_id, time.monotonic()):
+                self._drop(call_id)
+                self.expirations += 1
+                return False
+            return True
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def sweep(self) -> int:
+        """Drop every context idle for longer than idle_ttl; returns how many expired"""
+        now = time.monotonic()
+        expired = 0
+        with self._lock:
+            # Entries are kept in access order, so expired ones are all at the front
+            for call_id in self._entries:
+                if not self._expired(call_id, now):
+                    break
+                expired += 1
+            for _ in range(expired):
+                self._drop(next(iter(self._entries)))
+            self.expirations += expired
+        return expired
+
+    def start_sweeper(self, interval: float = 60) -> threading.Thread:
+        """Sweep expired contexts every ``interval`` seconds on a daemon thread"""
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._stop.clear()
+                self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,),
+                                                 name="context-sweeper", daemon=True)
+                self._sweeper.start()
+            return self._sweeper
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Context sweep error: {e}")
+
+    def stats(self) -> Dict:
+        """Live contexts, eviction counters and an estimate of the memory they hold
+
+        Only a random sample of contexts is measured, and outside the lock,
+        so a stats call never holds up webhook turns while it walks objects.
+        """
+        with self._lock:
+            stats = {
+                "live": len(self._entries),
+                "max_entries": self.max_entries,
+                "idle_ttl": self.idle_ttl,
+                "created": self.created,
+                "ended": self.ended,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "sweeper": self._sweeper is not None and self._sweeper.is_alive()
+            }
+            entries = list(self._entries.items())
+        sample = random.sample(entries, min(SIZE_SAMPLE, len(entries)))
+        sizes = []
+        for entry in sample:
+            try:
+                sizes.append(approximate_size(entry))
+            except RuntimeError:
+                # The call's history changed while it was being measured; leave it out
+                continue
+        mean = sum(sizes) / len(sizes) if sizes else 0
+        stats["memory_bytes"] = sys.getsizeof(self._entries) + int(mean * len(entries))
+        return stats
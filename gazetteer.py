@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import csv
+import os
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from geocoding import normalize_query
+
+Coordinates = Tuple[float, float]
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+# Trailing state qualifiers that don't change which place is meant
+_STATE_SUFFIX = re.compile(r'[,\s]+(ma|mass|massachusetts)$')
+# Filler around a place name in transcribed speech ("the back bay area")
+_FILLER = re.compile(r'^(the|downtown of)\s+|\s+(area|neighborhood|neighbourhood)$')
+_ZIP = re.compile(r'^(?:zip(?: code)?\s*)?(\d{5})(?:-\d{4})?$')
+# Qualifiers after a comma that agree with every entry (the gazetteer covers Massachusetts)
+_AGREEING_QUALIFIERS = {'ma', 'mass', 'massachusetts', 'us', 'usa', 'united states', 'united states of america'}
+
+
+def place_key(query: str) -> str:
+    """Normalize a place name for lookup, dropping a trailing Massachusetts qualifier and filler words"""
+    key = _STATE_SUFFIX.sub('', normalize_query(query))
+    return _FILLER.sub('', key).strip()
+
+
+def split_qualifiers(query: str) -> Tuple[str, List[str]]:
+    """Split "back bay, boston, ma" into the place key ("back bay") and its qualifiers (["boston", "ma"])"""
+    key = normalize_query(query)
+    qualifiers = []
+    stripped = _STATE_SUFFIX.sub('', key)
+    if stripped != key:
+        qualifiers.append('ma')
+        key = stripped
+    name, *rest = key.split(',')
+    return _FILLER.sub('', name.strip()).strip(), [part.strip() for part in rest if part.strip()] + qualifiers
+
+
+def max_edits(key: str) -> int:
+    """Edits tolerated when fuzzy matching a name of this length"""
+    if len(key) <= 4:
+        return 0
+    return 1 if len(key) <= 7 else 2
+
+
+def _deletes(key: str) -> Iterator[str]:
+    for i in range(len(key)):
+        yield key[:i] + key[i + 1:]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent swaps), capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class Place(NamedTuple):
+    """One gazetteer entry; ``distance`` is the number of edits the query needed to match it"""
+    name: str
+    kind: str
+    coordinates: Coordinates
+    distance: int = 0
+
+
+class Gazetteer:
+    """Offline place name -> centroid index consulted before any geocoder
+
+    Exact names, aliases and ZIP codes are a single dict lookup (``match``).
+    A comma qualifier must agree with the entry: a Massachusetts or US
+    qualifier, or another gazetteer place ("back bay, boston"), so
+    "cambridge, uk" is left to the geocoder.
+
+    Misspelled names (typically speech recognition errors like
+    "sommerville") are matched by ``fuzzy_match`` with a symmetric-delete
+    index: every name is stored under each of its one-character deletions,
+    and a query generates its own. That finds every name one edit away
+    (an adjacent swap counts as one) but, of those two edits away, only
+    the ones where deleting a character from each side makes them equal;
+    two substitutions are never found. Candidates are verified with a real
+    edit distance. Fuzzy matches are a last resort for the location resolver,
+    after the geocoder, since a real town can be one letter from a known one
+    (Bedford, Medford).
+    """
+
+    def __init__(self, places: Optional[List[Place]] = None):
+        self._places: List[Place] = []
+        self._spellings: List[List[str]] = []
+        self._exact: Dict[str, int] = {}
+        self._deleted: Dict[str, Set[int]] = {}
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        for place in places or ():
+            self.add(place.name, place.coordinates, place.kind)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_GAZETTEER_PATH) -> "Gazetteer":
+        """Read a CSV with name, kind, latitude, longitude and "|"-separated aliases"""
+        gazetteer = cls()
+        with open(path, encoding='utf-8', newline='') as handle:
+            for row in csv.DictReader(handle):
+                aliases = [alias for alias in (row.get('aliases') or '').split('|') if alias.strip()]
+                gazetteer.add(row['name'], (float(row['latitude']), float(row['longitude'])),
+                              row.get('kind') or 'place', aliases)
+        return gazetteer
+
+    def add(self, name: str, coordinates: Coordinates, kind: str = 'place', aliases: List[str] = ()) -> None:
+        index = len(self._places)
+        self._places.append(Place(name, kind, (float(coordinates[0]), float(coordinates[1]))))
+        self._spellings.append([])
+        for spelling in (name, *aliases):
+            key = place_key(spelling)
+            self._spellings[index].append(key)
+            self._exact.setdefault(key, index)
+            if kind != 'zip' and max_edits(key):
+                for deleted in _deletes(key):
+                    self._deleted.setdefault(deleted, set()).add(index)
+
+    def _agrees(self, qualifier: str) -> bool:
+        if qualifier in _AGREEING_QUALIFIERS:
+            return True
+        index = self._exact.get(qualifier)
+        return index is not None and self._places[index].kind != 'zip'
+
+    def _parse(self, query: str) -> Tuple[str, Optional[List[str]]]:
+        """The place key for query and its qualifiers; None qualifiers when one disagrees with the gazetteer"""
+        key, qualifiers = split_qualifiers(query)
+        zip_code = _ZIP.match(key)
+        if zip_code:
+            key = zip_code.group(1)
+        if not all(self._agrees(qualifier) for qualifier in qualifiers):
+            return key, None
+        return key, qualifiers
+
+    def match(self, query: str) -> Optional[Place]:
+        """The entry whose name, alias or ZIP code is exactly query; None if there is none"""
+        self.lookups += 1
+        key, qualifiers = self._parse(query)
+        index = self._exact.get(key) if qualifiers is not None else None
+        if index is None:
+            self.misses += 1
+            return None
+        self.exact_hits += 1
+        return self._places[index]
+
+    def fuzzy_match(self, query: str, require_qualifier: bool = True) -> Optional[Place]:
+        """The closest entry within a few edits of query; None if nothing is close
+
+        With ``require_qualifier`` the query must carry an agreeing qualifier
+        ("sommerville, ma"). Without it a bare name is accepted too, but only
+        one edit away, which is what a speech transcript usually needs once
+        the geocoder has had its say. A disagreeing qualifier never matches.
+        """
+        key, qualifiers = self._parse(query)
+        if qualifiers is None or (require_qualifier and not qualifiers):
+            return None
+        limit = max_edits(key) if qualifiers else min(max_edits(key), 1)
+        place = self._fuzzy(key, limit)
+        if place is not None:
+            self.fuzzy_hits += 1
+        return place
+
+    def _fuzzy(self, key: str, limit: int) -> Optional[Place]:
+        if not limit or key.isdigit():
+            return None
+        indexes = set(self._deleted.get(key, ()))
+        for deleted in _deletes(key):
+            indexes.update(self._deleted.get(deleted, ()))
+            index = self._exact.get(deleted)
+            if index is not None:
+                indexes.add(index)
+
+        best = None
+        for index in sorted(indexes):
+            place = self._places[index]
+            distance = min(edit_distance(key, spelling, limit) for spelling in self._spellings[index])
+            if distance <= limit and (best is None or distance < best.distance):
+                best = place._replace(distance=distance)
+        return best
+
+    @property
+    def places(self) -> List[Place]:
+        """Every entry, in the order it was added"""
+        return list(self._places)
+
+    def lookup(self, query: str) -> Optional[Coordinates]:
+        place = self.match(query)
+        return place.coordinates if place else None
+
+    def stats(self) -> Dict:
+        """Index size and hit counters"""
+        return {
+            "places": len(self._places),
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses
+        }
+
+    def __len__(self) -> int:
+        return len(self._places)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+import math
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+Coordinates = Tuple[float, float]
+
+# Mean earth radius; haversine on this sphere stays within ~0.5% of the WGS84 geodesic
+EARTH_RADIUS_MILES = 3958.7613
+HAVERSINE_TOLERANCE = 0.005
+
+# Conservative (smallest) ground distance covered by one degree, so bounding
+# boxes derived from them never cut off a point that is really within range
+MILES_PER_DEGREE_LAT = 68.7
+MILES_PER_DEGREE_LON_EQUATOR = 69.17
+
+
+def bounding_box(lat: float, lon: float, radius_miles: float) -> Tuple[float, float, float, float]:
+    """Return (min_lat, max_lat, min_lon, max_lon) enclosing a radius around a point"""
+    dlat = radius_miles / MILES_PER_DEGREE_LAT
+    min_lat = max(lat - dlat, -90.0)
+    max_lat = min(lat + dlat, 90.0)
+
+    # Longitude degrees shrink towards the poles; size the box for the worst latitude
+    widest_lat = max(abs(min_lat), abs(max_lat))
+    cos_lat = math.cos(math.radians(widest_lat))
+    if cos_lat < 1e-6:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = radius_miles / (MILES_PER_DEGREE_LON_EQUATOR * cos_lat)
+    if dlon >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - dlon, lon + dlon
+
+
+def haversine_miles(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in miles from one point to arrays of points, in a single vectorized pass"""
+    lat1 = math.radians(lat)
+    lats2 = np.radians(lats)
+    sin_dlat = np.sin((lats2 - lat1) * 0.5)
+    sin_dlon = np.sin(np.radians(lons - lon) * 0.5)
+    a = sin_dlat * sin_dlat + math.cos(lat1) * np.cos(lats2) * sin_dlon * sin_dlon
+    return (2.0 * EARTH_RADIUS_MILES) * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    """A read-only float64 view of values (a copy only if they are another dtype)"""
+    view = np.asarray(values, dtype=np.float64).view()
+    view.flags.writeable = False
+    return view
+
+
+class CoordinateColumns:
+    """Struct-of-arrays coordinate store keyed by id
+
+    Latitudes and longitudes live in contiguous float64 arrays so distances to
+    any subset of points can be computed with one vectorized call. Removal
+    swaps the last row into the hole, keeping the arrays dense.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.lats = np.empty(capacity, dtype=np.float64)
+        self.lons = np.empty(capacity, dtype=np.float64)
+        self.ids: List[Hashable] = []
+        self._rows: Optional[Dict[Hashable, int]] = {}
+        # Set while lats, lons and ids are still the ones from_arrays was given
+        self._shared = False
+
+    @classmethod
+    def from_arrays(cls, ids: List[Hashable], lats: np.ndarray, lons: np.ndarray) -> "CoordinateColumns":
+        """Build columns over existing coordinate arrays (e.g. mapped from a snapshot)
+
+        The arrays are kept as read-only views and ids are mapped to rows on
+        first lookup. The first insertion or removal copies them, since rows
+        are overwritten in place and that must not reach the memory they came from.
+        """
+        columns = cls(capacity=0)
+        columns.lats = _read_only(lats)
+        columns.lons = _read_only(lons)
+        columns.ids = ids
+        columns._rows = None
+        columns._shared = True
+        return columns
+
+    def _row_map(self) -> Dict[Hashable, int]:
+        if self._rows is None:
+            self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+        return self._rows
+
+    def _own(self) -> None:
+        """Copy shared columns before the first write"""
+        if self._shared:
+            self.lats = np.array(self.lats, dtype=np.float64)
+            self.lons = np.array(self.lons, dtype=np.float64)
+            self.ids = list(self.ids)
+            self._shared = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._row_map()
+
+    def get(self, item_id: Hashable) -> Coordinates:
+        row = self._row_map()[item_id]
+        return (float(self.lats[row]), float(self.lons[row]))
+
+    def set(self, item_id: Hashable, lat: float, lon: float) -> None:
+        """Insert or update a point"""
+        self._own()
+        row = self._row_map().get(item_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.lats):
+                self._grow()
+            self._rows[item_id] = row
+            self.ids.append(item_id)
+        self.lats[row] = lat
+        self.lons[row] = lon
+
+    def remove(self, item_id: Hashable) -> None:
+        """Drop a point; unknown ids are ignored"""
+        row = self._row_map().pop(item_id, None)
+        if row is None:
+            return
+        self._own()
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            self.lats[row] = self.lats[last]
+            self.lons[row] = self.lons[last]
+            self._rows[moved] = row
+        self.ids.pop()
+
+    def _grow(self) -> None:
+        capacity = max(2 * len(self.lats), 16)
+        for name in ('lats', 'lons'):
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:len(self.ids)] = getattr(self, name)[:len(self.ids)]
+            setattr(self, name, grown)
+
+    def rows(self, item_ids: Iterable[Hashable]) -> np.ndarray:
+        """Translate ids into row positions"""
+        rows = self._row_map()
+        return np.fromiter((rows[item_id] for item_id in item_ids), dtype=np.intp)
+
+    def distances(self, lat: float, lon: float, rows: np.ndarray = None) -> np.ndarray:
+        """Haversine miles from a point to the given rows (or every row)"""
+        if rows is None:
+            size = len(self.ids)
+            return haversine_miles(lat, lon, self.lats[:size], self.lons[:size])
+        return haversine_miles(lat, lon, self.lats[rows], self.lons[rows])
+
+
+class GridIndex:
+    """Uniform lat/lon grid for pruning radius and nearest-neighbour searches
+
+    Points are bucketed into ``cell_size``-degree cells. Queries only visit
+    the cells overlapping the search bounding box, then compute haversine
+    distances for the surviving candidates in one vectorized pass over the
+    columnar coordinate store.
+    """
+
+    def __init__(self, cell_size: float = 0.1):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = defaultdict(set)
+        self.columns = CoordinateColumns()
+
+    @classmethod
+    def from_arrays(cls, ids: List[Hashable], lats: np.ndarray, lons: np.ndarray,
+                    cell_size: float = 0.1) -> "GridIndex":
+        """Bulk-build an index over existing coordinate arrays, bucketing every point in one pass"""
+        index = cls(cell_size)
+        index.columns = CoordinateColumns.from_arrays(ids, lats, lons)
+        if not len(index.columns):
+            return index
+        rows = np.floor(lats / cell_size).astype(np.int64)
+        cols = np.floor(lons / cell_size).astype(np.int64)
+        # Group points by cell with one sort instead of a dict insert per point
+        width = int(cols.max() - cols.min()) + 1
+        keys = (rows - rows.min()) * width + (cols - cols.min())
+        order = np.argsort(keys, kind='stable')
+        starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+        ends = np.append(starts[1:], len(order))
+        ordered_ids = [index.columns.ids[i] for i in order.tolist()]
+        firsts = order[starts]
+        for row, col, start, end in zip(rows[firsts].tolist(), cols[firsts].tolist(), starts.tolist(), ends.tolist()):
+            index._cells[(row, col)] = set(ordered_ids[start:end])
+        return index
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self.columns
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def insert(self, item_id: Hashable, lat: float, lon: float) -> None:
+        """Add or move a point"""
+        if item_id in self.columns:
+            self.remove(item_id)
+        self.columns.set(item_id, lat, lon)
+        self._cells[self._cell(lat, lon)].add(item_id)
+
+    def remove(self, item_id: Hashable) -> None:
+        """Drop a point; unknown ids are ignored"""
+        if item_id not in self.columns:
+            return
+        cell = self._cell(*self.columns.get(item_id))
+        self.columns.remove(item_id)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(item_id)
+            if not bucket:
+                del self._cells[cell]
+
+    def _cells_in_box(self, min_lat: float, max_lat: float,
+                      min_lon: float, max_lon: float) -> Iterator[Tuple[int, int]]:
+        """Yield the occupied cells overlapping a box, wrapping around the antimeridian"""
+        row_lo, row_hi = math.floor(min_lat / self.cell_size), math.floor(max_lat / self.cell_size)
+        col_lo, col_hi = math.floor(min_lon / self.cell_size), math.floor(max_lon / self.cell_size)
+        cols_per_turn = round(360.0 / self.cell_size)
+        wraps = (max_lon - min_lon) >= 360.0
+
+        # Cheaper to walk occupied cells when the box covers more cells than exist
+        box_cells = (row_hi - row_lo + 1) * (col_hi - col_lo + 1)
+        if wraps or box_cells > len(self._cells):
+            for cell in self._cells:
+                row, col = cell
+                if row_lo <= row <= row_hi and (wraps or self._col_in_range(col, col_lo, col_hi, cols_per_turn)):
+                    yield cell
+            return
+
+        for row in range(row_lo, row_hi + 1):
+            for col in range(col_lo, col_hi + 1):
+                cell = (row, self._wrap_col(col, cols_per_turn))
+                if cell in self._cells:
+                    yield cell
+
+    def _wrap_col(self, col: int, cols_per_turn: int) -> int:
+        """Map a column index back into the [-180, 180) longitude range"""
+        half = cols_per_turn // 2
+        return (col + half) % cols_per_turn - half
+
+    def _col_in_range(self, col: int, col_lo: int, col_hi: int, cols_per_turn: int) -> bool:
+        return any(col_lo <= c <= col_hi for c in (col, col - cols_per_turn, col + cols_per_turn))
+
+    def candidates(self, lat: float, lon: float, radius_miles: float) -> Iterator[Hashable]:
+        """Yield ids whose cell overlaps the bounding box of the search radius"""
+        for cell in self._cells_in_box(*bounding_box(lat, lon, radius_miles)):
+            yield from self._cells[cell]
+
+    def within_radius(self, lat: float, lon: float, radius_miles: float) -> List[Tuple[Hashable, float]]:
+        """Return (id, haversine miles) pairs within radius, closest first"""
+        ids = list(self.candidates(lat, lon, radius_miles))
+        if not ids:
+            return []
+        distances = self.columns.distances(lat, lon, self.columns.rows(ids))
+        inside = np.flatnonzero(distances <= radius_miles)
+        order = inside[np.argsort(distances[inside], kind='stable')]
+        return [(ids[i], float(distances[i])) for i in order]
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_radius: float = float('inf')) -> List[Tuple[Hashable, float]]:
+        """Return up to k (id, haversine miles) pairs closest to a point
+
+        The search radius doubles from one cell width until k points are
+        found inside it, so only the neighbourhood of the query is scanned.
+        """
+        if k <= 0 or not len(self.columns):
+            return []
+        radius = self.cell_size * MILES_PER_DEGREE_LAT
+        while True:
+            radius = min(radius, max_radius)
+            hits = self.within_radius(lat, lon, radius)
+            # Half the earth's circumference covers every point
+            if len(hits) >= k or radius >= max_radius or radius >= 12451:
+                return hits[:k]
+            radius *= 2
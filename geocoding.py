@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+Coordinates = Tuple[float, float]
+
+# Sentinel stored for places the geocoder could not resolve
+_NOT_FOUND = None
+
+NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+
+
+class AsyncNominatim:
+    """Non-blocking Nominatim client sharing one pooled HTTP connection set
+
+    The httpx client is created on first use, inside the running event
+    loop, with a bounded connection pool and a timeout per request, so a
+    slow geocoder delays only the calls waiting on it.
+    """
+
+    def __init__(self, user_agent: str, url: str = NOMINATIM_SEARCH_URL, timeout: float = 2.0,
+                 max_connections: int = 20):
+        self.user_agent = user_agent
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": self.user_agent},
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    async def geocode(self, query: str) -> Optional[Coordinates]:
+        """Return (latitude, longitude) for the best match, or None if there is none"""
+        response = await self._http().get(self.url, params={"q": query, "format": "json", "limit": 1})
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a free-form location so equivalent spellings share a cache key"""
+    key = re.sub(r'\s+', ' ', (query or '').lower()).strip()
+    key = re.sub(r'\s*,\s*', ', ', key)
+    return key.strip(' .,')
+
+
+class GeocodeCache:
+    """Caching layer in front of a geopy geocoder
+
+    Resolved coordinates live in an in-process LRU and, when ``db_path`` is
+    given, in a SQLite table that survives restarts. Unknown places are cached
+    too (for ``negative_ttl`` seconds) so repeated misses don't hit the network.
+    ``geocode_async`` serves async callers from the same cache.
+    """
+
+    def __init__(self, geocoder, max_entries: int = 1024, ttl: float = 7 * 24 * 3600,
+                 negative_ttl: float = 3600, db_path: Optional[str] = None, async_geocoder=None):
+        self.geocoder = geocoder
+        self.async_geocoder = async_geocoder
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[Optional[Coordinates], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                "query TEXT PRIMARY KEY, latitude REAL, longitude REAL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    def geocode(self, query: str) -> Optional[Coordinates]:
+        """Return (latitude, longitude) for a query, or None if the place is unknown"""
+        key = normalize_query(query)
+        if not key:
+            return None
+
+        found, coords = self._lookup(key)
+        if found:
+            return coords
+
+        self.misses += 1
+        coords = self._fetch(query)
+        self._store(key, coords)
+        return coords
+
+    def lookup(self, query: str) -> Tuple[bool, Optional[Coordinates]]:
+        """Answer from memory or disk only, never the geocoder; returns (found, coordinates)"""
+        key = normalize_query(query)
+        if not key:
+            return True, None
+        return self._lookup(key)
+
+    def _fetch(self, query: str) -> Optional[Coordinates]:
+        location = self.geocoder.geocode(query)
+        return (location.latitude, location.longitude) if location else _NOT_FOUND
+
+    async def geocode_async(self, query: str) -> Optional[Coordinates]:
+        """Like geocode, but misses go through ``async_geocoder`` without blocking the event loop
+
+        Without an async geocoder the blocking one runs on a worker thread.
+        Concurrent misses for the same place share one request.
+        """
+        key = normalize_query(query)
+        if not key:
+            return None
+
+        found, coords = self._lookup(key)
+        if found:
+            return coords
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        if self.async_geocoder is not None:
+            pending = asyncio.ensure_future(self.async_geocoder.geocode(query))
+        else:
+            pending = asyncio.get_running_loop().run_in_executor(None, self._fetch, query)
+        self._inflight[key] = pending
+        try:
+            coords = await asyncio.shield(pending)
+        finally:
+            self._inflight.pop(key, None)
+        self._store(key, coords if coords else _NOT_FOUND)
+        return coords
+
+    def _lookup(self, key: str) -> Tuple[bool, Optional[Coordinates]]:
+        """Check memory then disk; returns (found, coordinates)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                coords, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if coords is _NOT_FOUND:
+                        self.negative_hits += 1
+                    return True, coords
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT latitude, longitude, expires_at FROM geocode_cache WHERE query = ?",
+                    (key,)
+                ).fetchone()
+                if row and row[2] > now:
+                    coords = (row[0], row[1]) if row[0] is not None else _NOT_FOUND
+                    self._remember(key, coords, row[2])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    if coords is _NOT_FOUND:
+                        self.negative_hits += 1
+                    return True, coords
+        return False, None
+
+    def _store(self, key: str, coords: Optional[Coordinates]) -> None:
+        """Record a geocoder answer in memory and on disk"""
+        ttl = self.ttl if coords is not _NOT_FOUND else self.negative_ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, coords, expires_at)
+            if self._db is not None:
+                lat, lon = coords if coords else (None, None)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?)",
+                    (key, lat, lon, expires_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, coords: Optional[Coordinates], expires_at: float) -> None:
+        """Insert into the LRU, evicting the least recently used entry when full"""
+        self._entries[key] = (coords, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def clear(self) -> None:
+        """Drop every cached entry, including the on-disk store"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM geocode_cache")
+                self._db.commit()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Keyword tables, in priority order: when several entries of one category
+# match, the one listed first wins
+CUISINE_KEYWORDS = {
+    'italian': ['italian', 'pasta', 'pizza', 'spaghetti', 'lasagna', 'marinara'],
+    'mexican': ['mexican', 'tacos', 'burritos', 'nachos', 'fajitas', 'quesadilla', 'salsa'],
+    'chinese': ['chinese', 'lo mein', 'fried rice', 'dumplings', 'sweet and sour', 'chow mein'],
+    'mediterranean': ['mediterranean', 'hummus', 'falafel', 'kebabs', 'pita', 'greek'],
+    'american': ['american', 'bbq', 'barbecue', 'fried chicken', 'mac and cheese', 'burger', 'sandwich']
+}
+
+MENU_ITEMS = ['pizza', 'pasta', 'tacos', 'burritos', 'sandwiches', 'salads', 'chicken', 'rice', 'noodles']
+
+BOOKING_KEYWORDS = ['order', 'book', 'place an order', 'want to order', 'schedule', 'reserve', 'buy']
+
+# Whole-word price words, by the price range they ask for
+PRICE_KEYWORDS = {
+    '$': ['cheap', 'affordable', 'inexpensive', 'budget friendly', 'low cost', 'economical'],
+    '$$$': ['upscale', 'fancy', 'high end', 'premium', 'luxury', 'gourmet']
+}
+
+# A stated budget: "$500", "$1,200", "500 dollars", "300 bucks"
+BUDGET_PATTERN = r'\$\s*(\d[\d,]*(?:\.\d+)?)|\b(\d[\d,]*(?:\.\d+)?)\s*(?:dollars|bucks)\b'
+
+# Whole-word phrases that refer back to earlier turns of the conversation
+CONTINUATION_PHRASES = {
+    'positive': ['yes', 'yeah', 'yep', 'sure', 'ok', 'okay', 'sounds good', 'that works', 'perfect'],
+    'negative': ['no', 'nope', 'not really', 'maybe not', 'different', 'something else'],
+    'more_info': ['tell me more', 'more info', 'details', 'what else', 'continue'],
+    'selection': ['the first one', 'first option', 'second one', 'third option'],
+    'contact': ['call them', 'contact', 'phone', 'order', 'book']
+}
+
+SELECTION_PHRASES = {
+    'first': ['first one', 'first option'],
+    'second': ['second one', 'second option'],
+    'third': ['third one', 'third option']
+}
+
+LOCATION_PATTERNS = [
+    r'\b(in|near|around|from)\s+([a-zA-Z\s]+(?:,\s*[A-Z]{2})?)\b',
+    r'\b([A-Z][a-zA-Z\s]+(?:,\s*[A-Z]{2})?)\s+area\b',
+    r'\b(boston|cambridge|somerville|newton|brookline)\b'
+]
+
+# Payload attached to each keyword: (category, value, priority, whole_word)
+Payload = Tuple[str, str, int, bool]
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting every (possibly overlapping) keyword hit in one pass"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Payload]]] = [[]]
+        self._built = False
+
+    def add(self, keyword: str, payload: Payload) -> None:
+        state = 0
+        for ch in keyword:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(keyword), payload))
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links breadth-first and merge suffix outputs"""
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(ch, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._built = True
+
+    def scan(self, text: str) -> Iterator[Tuple[int, int, Payload]]:
+        """Yield (start, end, payload) for every keyword occurrence in text"""
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in output[state]:
+                yield i - length + 1, i + 1, payload
+
+
+class MatchSet:
+    """Every keyword category hit found in one utterance"""
+
+    __slots__ = ('hits',)
+
+    def __init__(self):
+        self.hits: Dict[str, Dict[str, int]] = {}
+
+    def add(self, category: str, value: str, priority: int) -> None:
+        values = self.hits.setdefault(category, {})
+        if priority < values.get(value, priority + 1):
+            values[value] = priority
+
+    def has(self, category: str, value: Optional[str] = None) -> bool:
+        values = self.hits.get(category)
+        if not values:
+            return False
+        return value is None or value in values
+
+    def best(self, category: str) -> Optional[str]:
+        """The highest-priority value hit in a category"""
+        values = self.hits.get(category)
+        if not values:
+            return None
+        return min(values, key=values.__getitem__)
+
+    def values(self, category: str) -> Set[str]:
+        return set(self.hits.get(category, ()))
+
+
+class IntentEngine:
+    """Keyword and pattern matching for intent analysis, compiled once at startup
+
+    All cuisine, menu, booking, continuation and selection keywords share one
+    automaton, so a single pass over the utterance produces the full match
+    set no matter how many keywords are configured. Location extraction uses
+    precompiled regexes.
+    """
+
+    def __init__(self, cuisine_keywords: Dict[str, List[str]] = None, menu_items: List[str] = None,
+                 booking_keywords: List[str] = None, continuation_phrases: Dict[str, List[str]] = None,
+                 selection_phrases: Dict[str, List[str]] = None, location_patterns: List[str] = None,
+                 price_keywords: Dict[str, List[str]] = None):
+        self.automaton = KeywordAutomaton()
+
+        menu_items = MENU_ITEMS if menu_items is None else menu_items
+        for priority, item in enumerate(menu_items):
+            self._add(item, 'menu', item, priority, whole_word=False)
+
+        cuisine_keywords = CUISINE_KEYWORDS if cuisine_keywords is None else cuisine_keywords
+        for priority, (cuisine, keywords) in enumerate(cuisine_keywords.items()):
+            for keyword in keywords:
+                self._add(keyword, 'cuisine', cuisine, priority, whole_word=False)
+
+        booking_keywords = BOOKING_KEYWORDS if booking_keywords is None else booking_keywords
+        for priority, keyword in enumerate(booking_keywords):
+            self._add(keyword, 'booking', keyword, priority, whole_word=False)
+
+        for category, groups in (('continuation', continuation_phrases or CONTINUATION_PHRASES),
+                                 ('selection', selection_phrases or SELECTION_PHRASES),
+                                 ('price', price_keywords or PRICE_KEYWORDS)):
+            for priority, (group, phrases) in enumerate(groups.items()):
+                for phrase in phrases:
+                    self._add(phrase, category, group, priority, whole_word=True)
+
+        self.automaton.build()
+        self.location_patterns = [re.compile(pattern, re.IGNORECASE)
+                                  for pattern in (location_patterns or LOCATION_PATTERNS)]
+        self.budget_pattern = re.compile(BUDGET_PATTERN)
+
+    def _add(self, keyword: str, category: str, value: str, priority: int, whole_word: bool) -> None:
+        self.automaton.add(keyword.lower(), (category, value, priority, whole_word))
+
+    def match(self, message_lower: str) -> MatchSet:
+        """Find every keyword hit in an already lowercased utterance"""
+        matches = MatchSet()
+        last = len(message_lower)
+        for start, end, (category, value, priority, whole_word) in self.automaton.scan(message_lower):
+            if whole_word and ((start > 0 and _is_word_char(message_lower[start - 1])) or
+                               (end < last and _is_word_char(message_lower[end]))):
+                continue
+            matches.add(category, value, priority)
+        return matches
+
+    def extract_budget(self, message: str) -> Optional[float]:
+        """Dollar amount stated in the utterance, if any"""
+        match = self.budget_pattern.search(message)
+        if match is None:
+            return None
+        return float((match.group(1) or match.group(2)).replace(',', ''))
+
+    def extract_location(self, message: str) -> Optional[str]:
+        """Pull a location phrase out of the original-case utterance"""
+        for pattern in self.location_patterns:
+            match = pattern.search(message)
+            if match:
+                # Extract location based on which group matched
+                if len(match.groups()) >= 2 and match.group(2):
+                    location = match.group(2)
+                else:
+                    location = match.group(1)
+                return location.strip()
+        return None
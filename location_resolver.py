@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from gazetteer import Gazetteer
+from geocoding import GeocodeCache, normalize_query
+from metrics import StageTimings
+
+Coordinates = Tuple[float, float]
+
+STAGES = ('gazetteer', 'cache', 'remote', 'wait', 'total')
+
+
+class Resolution(NamedTuple):
+    """Outcome of resolving a place name
+
+    ``source`` is "gazetteer", "cache" or "remote", or "pending" when the
+    deadline passed before the geocoder answered (the lookup keeps running
+    and lands in the cache), or "error" when the geocoder failed. "fuzzy"
+    marks a misspelled gazetteer name accepted after the other stages came
+    up empty.
+    """
+    coordinates: Optional[Coordinates]
+    source: str
+
+    @property
+    def pending(self) -> bool:
+        return self.source == "pending"
+
+    @property
+    def failed(self) -> bool:
+        return self.source == "error"
+
+
+class LocationResolver:
+    """Gazetteer -> geocode cache -> remote geocoder -> fuzzy gazetteer, bounded by a deadline
+
+    The first two stages are local and answer in microseconds. Only exact
+    gazetteer names are taken up front. A remote lookup runs on a background
+    pool; if it hasn't answered by the deadline the caller gets a pending
+    Resolution straight away and the lookup keeps going, storing its answer
+    in the cache for the next turn. When the cache or geocoder knows no such
+    place, or the geocoder timed out or failed, a fuzzy gazetteer match
+    (such as a misspelled name in a transcript) is the fallback. Concurrent
+    lookups of the same place share one remote request. Every stage records
+    its latency in a histogram.
+    """
+
+    def __init__(self, cache: GeocodeCache, gazetteer: Optional[Gazetteer] = None,
+                 deadline: float = 0.8, max_workers: int = 8):
+        self.cache = cache
+        self.gazetteer = gazetteer
+        self.deadline = deadline
+        self.timings = StageTimings(list(STAGES))
+        self.sources: Dict[str, int] = {source: 0 for source in ('gazetteer', 'cache', 'remote', 'fuzzy', 'pending', 'error')}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="geocode")
+        self._inflight: Dict[str, Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    def _local(self, query: str, started: float) -> Optional[Resolution]:
+        """Gazetteer then cache; None when only the remote geocoder can answer"""
+        if self.gazetteer is not None:
+            coordinates = self.gazetteer.lookup(query)
+            now = time.perf_counter()
+            self.timings.observe('gazetteer', now - started)
+            if coordinates is not None:
+                return Resolution(coordinates, 'gazetteer')
+            started = now
+
+        found, coordinates = self.cache.lookup(query)
+        self.timings.observe('cache', time.perf_counter() - started)
+        if found:
+            return Resolution(coordinates, 'cache')
+        return None
+
+    def _fallback(self, query: str, resolution: Resolution) -> Resolution:
+        """A fuzzy gazetteer match in place of a miss, timeout or error, when there is one
+
+        The geocoder has already had its chance, so unqualified names (as
+        transcripts give them) are accepted, within the tighter edit limit.
+        """
+        if resolution.coordinates is not None or self.gazetteer is None:
+            return resolution
+        place = self.gazetteer.fuzzy_match(query, require_qualifier=False)
+        return Resolution(place.coordinates, 'fuzzy') if place is not None else resolution
+
+    def _finish(self, resolution: Resolution, started: float, query: str) -> Resolution:
+        resolution = self._fallback(query, resolution)
+        self.sources[resolution.source] += 1
+        self.timings.observe('total', time.perf_counter() - started)
+        return resolution
+
+    def resolve(self, query: str, timeout: Optional[float] = None) -> Resolution:
+        """Resolve a place, waiting at most ``timeout`` seconds (default: the deadline) on the geocoder"""
+        started = time.perf_counter()
+        resolution = self._local(query, started)
+        if resolution is not None:
+            return self._finish(resolution, started, query)
+
+        remote = self._remote(query)
+        waited = time.perf_counter()
+        try:
+            coordinates = remote.result(timeout=max(self.deadline if timeout is None else timeout, 0.0))
+            resolution = Resolution(coordinates, 'remote')
+        except FutureTimeout:
+            resolution = Resolution(None, 'pending')
+        except Exception:
+            resolution = Resolution(None, 'error')
+        self.timings.observe('wait', time.perf_counter() - waited)
+        return self._finish(resolution, started, query)
+
+    def resolve_many(self, queries: Iterable[str], timeout: Optional[float] = None) -> Iterator[Tuple[str, Resolution]]:
+        """Resolve many places at once, yielding (query, resolution) as each is answered
+
+        Local answers come first. Every remote lookup is started before this
+        returns and they all share one ``timeout``; whatever hasn't answered
+        by then is yielded as pending.
+        """
+        started = time.perf_counter()
+        local: List[Tuple[str, Resolution]] = []
+        remote: Dict[Future, List[str]] = {}
+        for query in dict.fromkeys(queries):
+            resolution = self._local(query, started)
+            if resolution is not None:
+                local.append((query, self._finish(resolution, started, query)))
+            else:
+                remote.setdefault(self._remote(query), []).append(query)
+        return self._gather(local, remote, started, self.deadline if timeout is None else timeout)
+
+    def _gather(self, local: List[Tuple[str, Resolution]], remote: Dict[Future, List[str]],
+                started: float, timeout: float) -> Iterator[Tuple[str, Resolution]]:
+        yield from local
+        if not remote:
+            return
+        waited = time.perf_counter()
+        try:
+            for future in as_completed(list(remote), timeout=max(timeout - (waited - started), 0.0)):
+                try:
+                    resolution = Resolution(future.result(), 'remote')
+                except Exception:
+                    resolution = Resolution(None, 'error')
+                for query in remote.pop(future):
+                    yield query, self._finish(resolution, started, query)
+        except FutureTimeout:
+            pass
+        self.timings.observe('wait', time.perf_counter() - waited)
+        for queries in remote.values():
+            for query in queries:
+                yield query, self._finish(Resolution(None, 'pending'), started, query)
+
+    def _remote(self, query: str) -> Future:
+        """The running remote lookup for query, starting one if needed"""
+        key = normalize_query(query)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._geocode, query)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+                future.add_done_callback(_log_failure)
+            return future
+
+    def _geocode(self, query: str) -> Optional[Coordinates]:
+        started = time.perf_counter()
+        try:
+            return self.cache.geocode(query)
+        finally:
+            self.timings.observe('remote', time.perf_counter() - started)
+
+    async def resolve_async(self, query: str, timeout: Optional[float] = None) -> Resolution:
+        """Async variant of resolve; the remote lookup keeps running on the event loop after a timeout"""
+        started = time.perf_counter()
+        resolution = self._local(query, started)
+        if resolution is not None:
+            return self._finish(resolution, started, query)
+
+        task = asyncio.ensure_future(self._geocode_async(query))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(_log_failure)
+        waited = time.perf_counter()
+        try:
+            coordinates = await asyncio.wait_for(asyncio.shield(task),
+                                                 max(self.deadline if timeout is None else timeout, 0.0))
+            resolution = Resolution(coordinates, 'remote')
+        except asyncio.TimeoutError:
+            resolution = Resolution(None, 'pending')
+        except Exception:
+            resolution = Resolution(None, 'error')
+        self.timings.observe('wait', time.perf_counter() - waited)
+        return self._finish(resolution, started, query)
+
+    def resolve_many_async(self, queries: Iterable[str],
+                           timeout: Optional[float] = None) -> AsyncIterator[Tuple[str, Resolution]]:
+        """Async variant of resolve_many; call it from the event loop, which starts every lookup"""
+        async def resolve(query: str) -> Tuple[str, Resolution]:
+            return query, await self.resolve_async(query, timeout)
+
+        lookups = [asyncio.ensure_future(resolve(query)) for query in dict.fromkeys(queries)]
+
+        async def completed() -> AsyncIterator[Tuple[str, Resolution]]:
+            for lookup in asyncio.as_completed(lookups):
+                yield await lookup
+        return completed()
+
+    async def _geocode_async(self, query: str) -> Optional[Coordinates]:
+        started = time.perf_counter()
+        try:
+            return await self.cache.geocode_async(query)
+        finally:
+            self.timings.observe('remote', time.perf_counter() - started)
+
+    def stats(self) -> Dict:
+        """Answers by source and per-stage latency histograms"""
+        return {
+            "deadline": self.deadline,
+            "sources": dict(self.sources),
+            "in_flight": len(self._inflight) + len(self._tasks),
+            "gazetteer": self.gazetteer.stats() if self.gazetteer is not None else None,
+            "stages": self.timings.snapshot()
+        }
+
+
+def _log_failure(lookup) -> None:
+    """Report a failed remote lookup, whether or not a turn is still waiting on it"""
+    if not lookup.cancelled() and lookup.exception() is not None:
+        print(f"Geocoding error: {lookup.exception()}")
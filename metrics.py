@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from 10 µs to 5 s
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: constant memory, O(log buckets) per observation"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot counts values above every bound
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (None when empty or beyond the last bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> Dict:
+        """Counts and quantile estimates in milliseconds, for JSON"""
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.quantile(0.50)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "buckets_ms": {str(ms(bound)): count for bound, count in zip(self.buckets, self.counts) if count},
+            "over_ms": {str(ms(self.buckets[-1])): self.counts[-1]} if self.counts[-1] else {}
+        }
+
+
+class StageTimings:
+    """Named latency histograms, one per pipeline stage"""
+
+    def __init__(self, stages: List[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.histograms = {stage: LatencyHistogram(buckets) for stage in stages}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.histograms[stage].observe(seconds)
+
+    def snapshot(self) -> Dict:
+        return {stage: histogram.snapshot() for stage, histogram in self.histograms.items()}
+
+
+class _NoSpan:
+    """Stand-in returned by a disabled tracer: entering and leaving it does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'stage', 'started')
+
+    def __init__(self, tracer: "Tracer", stage: str):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class Tracer:
+    """Stage timers for the request hot path
+
+    ``span(stage)`` times a block into that stage's histogram; spans nest, so
+    a stage's time includes the stages it calls. Whole turns are timed per
+    intent with ``observe_turn``. Between ``start_turn`` and ``end_turn`` the
+    spans of the current request (thread or asyncio task) are also summed
+    for that request alone. A disabled tracer hands out a shared no-op span.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.turns: Dict[str, LatencyHistogram] = {}
+        self._current: contextvars.ContextVar = contextvars.ContextVar('turn_spans', default=None)
+        self._lock = threading.Lock()
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, stage)
+
+    def _histogram(self, family: Dict[str, LatencyHistogram], label: str) -> LatencyHistogram:
+        histogram = family.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(label, LatencyHistogram(self.buckets))
+        return histogram
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self._histogram(self.stages, stage).observe(seconds)
+        spans = self._current.get()
+        if spans is not None:
+            spans[stage] = spans.get(stage, 0.0) + seconds
+
+    def observe_turn(self, intent: str, seconds: float) -> None:
+        if self.enabled:
+            self._histogram(self.turns, intent).observe(seconds)
+
+    def start_turn(self) -> Optional[contextvars.Token]:
+        """Start summing this request's spans; returns a token for end_turn (None when disabled)"""
+        if not self.enabled:
+            return None
+        return self._current.set({})
+
+    def end_turn(self, token: Optional[contextvars.Token]) -> Dict[str, float]:
+        """Stop summing spans and return milliseconds per stage for the request"""
+        if token is None:
+            return {}
+        spans = self._current.get() or {}
+        self._current.reset(token)
+        return {stage: round(seconds * 1000, 3) for stage, seconds in spans.items()}
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def prometheus_histograms(name: str, help_text: str, label: str,
+                          histograms: Dict[str, LatencyHistogram]) -> List[str]:
+    """Prometheus text exposition lines for a family of histograms, one series per label value"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for value, histogram in sorted(histograms.items()):
+        with histogram._lock:
+            counts, total = list(histogram.counts), histogram.total
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels({label: value, 'le': repr(bound)})} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{name}_bucket{_labels({label: value, 'le': '+Inf'})} {cumulative}")
+        lines.append(f"{name}_sum{_labels({label: value})} {total}")
+        lines.append(f"{name}_count{_labels({label: value})} {cumulative}")
+    return lines
+
+
+def prometheus_values(name: str, help_text: str, kind: str,
+                      samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """Prometheus text exposition lines for a counter or gauge"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {value}" for labels, value in samples)
+    return lines
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Leaf frames of threads that are blocked rather than working (waiting on a lock,
+# a queue, a socket or the event loop's selector); left out unless asked for
+IDLE_FRAMES = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('queue.py', 'get'),
+    ('selectors.py', 'select'), ('socket.py', 'accept'), ('socket.py', 'readinto'),
+    ('socketserver.py', 'serve_forever'), ('thread.py', '_worker'),
+}
+
+# Functions whose local variable names what a sampled thread is working on
+ATTRIBUTION = {'webhook': 'event_type'}
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples every thread's stack from inside the process
+
+    Each sample walks ``sys._current_frames()``; nothing is installed in the
+    sampled threads, so the server runs at full speed between samples and
+    profiling needs no restart. Samples are attributed to the webhook event
+    a thread is handling by reading ``event_type`` from its ``webhook``
+    frame, and come back as collapsed stacks (flamegraph.pl / speedscope
+    input) plus a top-functions table.
+    """
+
+    def __init__(self, max_seconds: float = 60.0, max_rate: float = 1000.0):
+        self.max_seconds = max_seconds
+        self.max_rate = max_rate
+        self._running = threading.Lock()
+
+    def profile(self, seconds: float, rate: float = 100.0, include_idle: bool = False) -> Optional[Dict]:
+        """Sample for ``seconds`` at ``rate`` Hz; None when another profile is already running"""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self._sample(min(max(seconds, 0.01), self.max_seconds),
+                                min(max(rate, 1.0), self.max_rate), include_idle)
+        finally:
+            self._running.release()
+
+    def _sample(self, seconds: float, rate: float, include_idle: bool) -> Dict:
+        interval = 1.0 / rate
+        own_thread = threading.get_ident()
+        stacks: Counter = Counter()
+        events: Counter = Counter()
+        rounds = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        next_sample = started
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_sample:
+                time.sleep(next_sample - now)
+            next_sample += interval
+            rounds += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                if not include_idle and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack, event = self._walk(frame)
+                stacks[(event,) + stack] += 1
+                events[event] += 1
+        elapsed = time.perf_counter() - started
+        return self._report(stacks, events, rounds, elapsed, rate)
+
+    @staticmethod
+    def _walk(frame) -> Tuple[Tuple[str, ...], str]:
+        """(root-to-leaf frame labels, event being handled) for one thread"""
+        labels: List[str] = []
+        event = None
+        while frame is not None:
+            code = frame.f_code
+            labels.append(_frame_label(code))
+            if event is None and code.co_name in ATTRIBUTION:
+                value = frame.f_locals.get(ATTRIBUTION[code.co_name])
+                if value is not None:
+                    event = str(value)
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels), event or 'other'
+
+    @staticmethod
+    def _report(stacks: Counter, events: Counter, rounds: int, elapsed: float, rate: float) -> Dict:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in stacks.items():
+            frames = stack[1:]
+            if frames:
+                own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        samples = sum(stacks.values())
+
+        def share(count: int) -> float:
+            return round(100.0 * count / samples, 2) if samples else 0.0
+
+        return {
+            "seconds": round(elapsed, 3),
+            "rate": rate,
+            "rounds": rounds,
+            "samples": samples,
+            "by_event": dict(events.most_common()),
+            "top": [{"function": label, "self": count, "self_pct": share(count),
+                     "total": total[label], "total_pct": share(total[label])}
+                    for label, count in own.most_common(25)],
+            "collapsed": collapsed(stacks)
+        }
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed-stack format: "event;root;...;leaf count" per line"""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
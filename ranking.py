@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+from typing import Dict, Hashable, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from caterers import Caterer, SearchHit
+
+# Price range symbols by level; anything else ranks as mid-priced
+PRICE_LEVELS = {'$': 1, '$$': 2, '$$$': 3, '$$$$': 4}
+MIDDLE_PRICE_LEVEL = 2
+
+# Distance at which the distance component has dropped to half its best value
+DISTANCE_HALF_SCORE_MILES = 5.0
+
+
+class RankingWeights(NamedTuple):
+    """Share of the score carried by each component; every component lies in [0, 1]"""
+    distance: float = 0.35
+    rating: float = 0.30
+    match: float = 0.15
+    price: float = 0.10
+    min_order: float = 0.10
+
+
+class RankQuery(NamedTuple):
+    """What a search asked for, beyond the filters that produced its hits
+
+    ``matches`` maps ids to how closely their cuisine or specialty matched
+    the query (1.0 for the whole term); None when nothing was matched on.
+    """
+    budget: Optional[float] = None
+    price_range: Optional[str] = None
+    matches: Optional[Sequence[Mapping[Hashable, float]]] = None
+
+
+def price_level(price_range: str) -> int:
+    return PRICE_LEVELS.get(price_range, MIDDLE_PRICE_LEVEL)
+
+
+class Ranker:
+    """Scores search hits on distance, rating, price fit, minimum order fit and match strength
+
+    The per-caterer inputs that don't depend on the query (rating, price
+    level, minimum order) are precomputed into columns when a caterer is
+    added, so scoring a result set is a handful of vectorized operations.
+    Only the best k hits are ordered: they are selected with a partial
+    partition, and a full sort happens only when every hit is wanted.
+    Ties keep the order the hits came in (closest first, or catalog order).
+    """
+
+    def __init__(self, capacity: int = 1024, weights: RankingWeights = RankingWeights()):
+        self.weights = weights
+        self.quality = np.empty(capacity, dtype=np.float64)
+        self.price_levels = np.empty(capacity, dtype=np.float64)
+        self.min_orders = np.empty(capacity, dtype=np.float64)
+        self.ids: List[Hashable] = []
+        self._rows: Optional[Dict[Hashable, int]] = {}
+        # Set while price_levels, min_orders and ids are still the ones from_arrays was given
+        self._shared = False
+
+    @classmethod
+    def from_arrays(cls, ids: Sequence[Hashable], ratings: np.ndarray, min_orders: np.ndarray,
+                    price_levels: np.ndarray, weights: RankingWeights = RankingWeights()) -> "Ranker":
+        """Build the columns for a whole catalog at once (e.g. from a snapshot)
+
+        Price levels and minimum orders stay read-only views of the inputs,
+        and ids are mapped to rows on first lookup; the first add or remove
+        copies them, since rows are overwritten in place.
+        """
+        ranker = cls(capacity=0, weights=weights)
+        ranker.quality = np.clip(np.asarray(ratings, dtype=np.float64) / 5.0, 0.0, 1.0)
+        for name, values in (('price_levels', price_levels), ('min_orders', min_orders)):
+            view = np.asarray(values, dtype=np.float64).view()
+            view.flags.writeable = False
+            setattr(ranker, name, view)
+        ranker.ids = ids
+        ranker._rows = None
+        ranker._shared = True
+        return ranker
+
+    @classmethod
+    def from_snapshot(cls, snapshot, weights: RankingWeights = RankingWeights()) -> "Ranker":
+        """Build the columns straight from a CatalogSnapshot's record arrays"""
+        price_ids = snapshot.column('price_range')
+        # Price ranges are string table ids; translate each distinct one once
+        levels = np.full(int(price_ids.max()) + 1 if len(price_ids) else 0, MIDDLE_PRICE_LEVEL, dtype=np.float64)
+        for string_id in np.unique(price_ids).tolist():
+            levels[string_id] = price_level(snapshot.string(string_id))
+        return cls.from_arrays(snapshot.coordinates()[0], snapshot.column('rating'),
+                               snapshot.column('min_order'), levels[price_ids], weights)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _row_map(self) -> Dict[Hashable, int]:
+        if self._rows is None:
+            self._rows = {item_id: row for row, item_id in enumerate(self.ids)}
+        return self._rows
+
+    def _own(self) -> None:
+        """Copy shared columns before the first write"""
+        if self._shared:
+            self.price_levels = np.array(self.price_levels, dtype=np.float64)
+            self.min_orders = np.array(self.min_orders, dtype=np.float64)
+            self.ids = list(self.ids)
+            self._shared = False
+
+    def add(self, caterer: Caterer) -> None:
+        """Precompute (or refresh) a caterer's static scoring inputs"""
+        self._own()
+        row = self._row_map().get(caterer.id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.quality):
+                self._grow()
+            self._rows[caterer.id] = row
+            self.ids.append(caterer.id)
+        self.quality[row] = min(max(caterer.rating / 5.0, 0.0), 1.0)
+        self.price_levels[row] = price_level(caterer.price_range)
+        self.min_orders[row] = caterer.min_order
+
+    def remove(self, item_id: Hashable) -> None:
+        """Drop a caterer, moving the last row into its place; unknown ids are ignored"""
+        row = self._row_map().pop(item_id, None)
+        if row is None:
+            return
+        self._own()
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.ids[row] = moved
+            for column in (self.quality, self.price_levels, self.min_orders):
+                column[row] = column[last]
+            self._rows[moved] = row
+        self.ids.pop()
+
+    def _grow(self) -> None:
+        capacity = max(2 * len(self.quality), 16)
+        for name in ('quality', 'price_levels', 'min_orders'):
+            grown = np.empty(capacity, dtype=np.float64)
+            grown[:len(self.ids)] = getattr(self, name)[:len(self.ids)]
+            setattr(self, name, grown)
+
+    def scores(self, hits: Sequence[SearchHit], query: RankQuery) -> np.ndarray:
+        """Score of every hit, in hit order"""
+        row_of = self._row_map()
+        rows = np.fromiter((row_of[hit.id] for hit in hits), dtype=np.intp, count=len(hits))
+        distances = None
+        if hits[0].distance is not None:
+            distances = np.fromiter((hit.distance for hit in hits), dtype=np.float64, count=len(hits))
+        return self._scores(rows, distances, [hit.id for hit in hits] if query.matches else None, query)
+
+    def _scores(self, rows: np.ndarray, distances: Optional[np.ndarray], ids: Optional[Sequence[Hashable]],
+                query: RankQuery) -> np.ndarray:
+        weights = self.weights
+        scores = weights.rating * self.quality[rows]
+
+        if distances is not None:
+            scores += weights.distance / (1.0 + distances / DISTANCE_HALF_SCORE_MILES)
+
+        if query.price_range:
+            gap = np.abs(self.price_levels[rows] - price_level(query.price_range))
+            scores += weights.price * (1.0 - gap / (len(PRICE_LEVELS) - 1))
+        else:
+            scores += weights.price
+
+        if query.budget:
+            # Full marks when the minimum order fits the budget, none once it is double the budget
+            over = np.maximum(self.min_orders[rows] - query.budget, 0.0) / query.budget
+            scores += weights.min_order * np.maximum(1.0 - over, 0.0)
+        else:
+            scores += weights.min_order
+
+        if query.matches:
+            strength = np.zeros(len(rows))
+            for matches in query.matches:
+                strength += np.fromiter((matches.get(item_id, 0.0) for item_id in ids), dtype=np.float64, count=len(rows))
+            scores += weights.match * strength / len(query.matches)
+        else:
+            scores += weights.match
+        return scores
+
+    def top(self, hits: List[SearchHit], query: RankQuery, k: Optional[int] = None,
+            tiebreak: Optional[Mapping[Hashable, int]] = None) -> List[SearchHit]:
+        """The k best hits (all of them when k is None), best first, with their scores set
+
+        Equal scores keep hit order, or the order of ``tiebreak[id]`` when given
+        (e.g. catalog positions, for hits collected from a set).
+        """
+        if not hits or k == 0:
+            return []
+        scores = self.scores(hits, query)
+        if tiebreak is None:
+            positions = np.arange(len(hits))
+        else:
+            positions = np.fromiter((tiebreak[hit.id] for hit in hits), dtype=np.int64, count=len(hits))
+        order = self._select(scores, positions, k)
+        return [hits[i]._replace(score=score) for i, score in zip(order.tolist(), scores[order].tolist())]
+
+    def top_all(self, query: RankQuery, k: Optional[int] = None,
+                tiebreak: Optional[Mapping[Hashable, int]] = None) -> List[SearchHit]:
+        """Like top over every caterer, without building a hit for each (only query-independent components apply)"""
+        if not self.ids or k == 0:
+            return []
+        rows = np.arange(len(self.ids))
+        scores = self._scores(rows, None, None, query._replace(matches=None))
+        if tiebreak is None:
+            positions = rows
+        else:
+            positions = np.fromiter((tiebreak[item_id] for item_id in self.ids), dtype=np.int64, count=len(rows))
+        order = self._select(scores, positions, k)
+        ids = self.ids
+        return [SearchHit(ids[i], None, score) for i, score in zip(order.tolist(), scores[order].tolist())]
+
+    @staticmethod
+    def _select(scores: np.ndarray, positions: np.ndarray, k: Optional[int]) -> np.ndarray:
+        """Indexes of the k highest scores, best first, lower positions first among equals"""
+        if k is None or k >= len(scores):
+            return np.lexsort((positions, -scores))
+        # Everything above the k-th best score, then the earliest of the entries tied with it
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)
+        needed = k - len(above)
+        if needed < len(ties):
+            ties = ties[np.argpartition(positions[ties], needed - 1)[:needed]]
+        best = np.concatenate((above, ties))
+        return best[np.lexsort((positions[best], -scores[best]))]
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is slower but produces the same JSON
+    orjson = None
+
+
+def encode_json(payload) -> bytes:
+    """Serialize a JSON-ready payload to bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class CachedResponse(NamedTuple):
+    """An encoded JSON body and its strong ETag"""
+    body: bytes
+    etag: str
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True when an If-None-Match header already names this body"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        return self.etag in (tag.strip().lstrip('W/') for tag in if_none_match.split(','))
+
+
+def make_response(payload) -> CachedResponse:
+    """Encode a payload once; the ETag is a content hash, so every worker agrees on it"""
+    body = encode_json(payload)
+    return CachedResponse(body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"')
+
+
+class ResponseCache:
+    """LRU cache of encoded API responses
+
+    Keys must include the catalog version the response was built from, so a
+    catalog change makes older entries unreachable; ``clear`` drops them
+    outright when a new catalog is published.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, payload) -> CachedResponse:
+        """Encode and remember a payload, returning the encoded response"""
+        response = make_response(payload)
+        if self.max_entries <= 0:
+            return response
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return response
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(entry.body) for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "encoder": "orjson" if orjson is not None else "json"
+            }
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from call_session import CallSession
+from context_store import ContextStore
+
+try:
+    import msgpack
+except ImportError:  # fall back to JSON when msgpack isn't installed
+    msgpack = None
+
+# A pending write: (call_id, expected stored version, new version, packed context)
+StateWrite = Tuple[str, int, int, bytes]
+
+# First byte of every packed context says how the rest is encoded
+_MSGPACK = b'm'
+_JSON = b'j'
+
+
+def pack_context(session: CallSession) -> bytes:
+    """Serialize a call session to compact bytes (msgpack, or JSON without it)"""
+    data = session.to_state()
+    if msgpack is not None:
+        return _MSGPACK + msgpack.packb(data, use_bin_type=True)
+    return _JSON + json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def unpack_context(blob: bytes, history_limit: Optional[int] = None) -> CallSession:
+    """Rebuild a call session packed by pack_context"""
+    encoding, payload = blob[:1], blob[1:]
+    if encoding == _MSGPACK:
+        if msgpack is None:
+            raise ValueError("Conversation state was written with msgpack, which is not installed")
+        data = msgpack.unpackb(payload, raw=False)
+    else:
+        data = json.loads(payload.decode('utf-8'))
+    return CallSession.from_state(data, history_limit)
+
+
+class StateBackend(ABC):
+    """Shared store of versioned, serialized conversation contexts keyed by call_id
+
+    Writes are compare-and-set: a context is only stored if the version
+    already there is the one the writer started from (0 for a new call).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, call_id: str) -> Optional[Tuple[int, bytes]]:
+        """Return (version, packed context), or None if the call is unknown or expired"""
+
+    @abstractmethod
+    def put_many(self, writes: List[StateWrite], ttl: float) -> List[str]:
+        """Apply a batch of compare-and-set writes; returns the call_ids that conflicted"""
+
+    @abstractmethod
+    def delete(self, call_id: str) -> None:
+        """Forget a call"""
+
+    def purge(self) -> int:
+        """Remove expired entries for backends without native expiry; returns how many"""
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Process-local backend, mainly for tests and single-worker runs"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, call_id: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            entry = self._entries.get(call_id)
+            if entry is None or entry[2] <= time.time():
+                return None
+            return entry[0], entry[1]
+
+    def put_many(self, writes: List[StateWrite], ttl: float) -> List[str]:
+        now = time.time()
+        conflicts = []
+        with self._lock:
+            for call_id, expected, version, blob in writes:
+                entry = self._entries.get(call_id)
+                current = entry[0] if entry and entry[2] > now else 0
+                if current != expected:
+                    conflicts.append(call_id)
+                    continue
+                self._entries[call_id] = (version, blob, now + ttl)
+        return conflicts
+
+    def delete(self, call_id: str) -> None:
+        with self._lock:
+            self._entries.pop(call_id, None)
+
+    def purge(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [call_id for call_id, entry in self._entries.items() if entry[2] <= now]
+            for call_id in expired:
+                del self._entries[call_id]
+        return len(expired)
+
+
+class SQLiteBackend(StateBackend):
+    """Single-host backend shared by every worker process through one SQLite file (WAL mode)"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "conversation_state.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_state ("
+            "call_id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, call_id: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, data FROM conversation_state WHERE call_id = ? AND expires_at > ?",
+                (call_id, time.time())
+            ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def put_many(self, writes: List[StateWrite], ttl: float) -> List[str]:
+        now = time.time()
+        conflicts = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for call_id, expected, version, blob in writes:
+                    # An expired row counts as version 0, like a missing one
+                    updated = self._db.execute(
+                        "UPDATE conversation_state SET version = ?, data = ?, expires_at = ? "
+                        "WHERE call_id = ? AND (version = ? OR (? = 0 AND expires_at <= ?))",
+                        (version, blob, now + ttl, call_id, expected, expected, now)
+                    ).rowcount
+                    if not updated and expected == 0:
+                        updated = self._db.execute(
+                            "INSERT OR IGNORE INTO conversation_state VALUES (?, ?, ?, ?)",
+                            (call_id, version, blob, now + ttl)
+                        ).rowcount
+                    if not updated:
+                        conflicts.append(call_id)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return conflicts
+
+    def delete(self, call_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM conversation_state WHERE call_id = ?", (call_id,))
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM conversation_state WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# Compare-and-set every key in one round trip; returns the 1-based positions that conflicted
+_REDIS_CAS_SCRIPT = """
+local conflicts = {}
+local ttl = ARGV[#ARGV]
+for i, key in ipairs(KEYS) do
+    local base = (i - 1) * 3
+    local current = tonumber(redis.call('HGET', key, 'v') or '0')
+    if current == tonumber(ARGV[base + 1]) then
+        redis.call('HSET', key, 'v', ARGV[base + 2], 'd', ARGV[base + 3])
+        redis.call('EXPIRE', key, ttl)
+    else
+        table.insert(conflicts, i)
+    end
+end
+return conflicts
+"""
+
+
+class RedisBackend(StateBackend):
+    """Multi-host backend for Redis or any server speaking the Redis protocol
+
+    Each call is a hash (``v`` version, ``d`` packed context) that expires
+    natively. A batch of writes is one Lua script call, so it costs a single
+    round trip and is applied atomically. Pass ``client`` to use an existing
+    redis-py compatible client, such as fakeredis or the stand-in in
+    benchmarks/bench_state.py.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "ezcaters:call:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ValueError("STATE_BACKEND=redis requires the redis package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._cas = client.register_script(_REDIS_CAS_SCRIPT)
+
+    def get(self, call_id: str) -> Optional[Tuple[int, bytes]]:
+        version, blob = self.client.hmget(self.prefix + call_id, 'v', 'd')
+        if version is None or blob is None:
+            return None
+        return int(version), bytes(blob)
+
+    def put_many(self, writes: List[StateWrite], ttl: float) -> List[str]:
+        keys, args = [], []
+        for call_id, expected, version, blob in writes:
+            keys.append(self.prefix + call_id)
+            args.extend((expected, version, blob))
+        args.append(max(int(math.ceil(ttl)), 1))
+        conflicts = self._cas(keys=keys, args=args)
+        return [writes[int(position) - 1][0] for position in conflicts]
+
+    def delete(self, call_id: str) -> None:
+        self.client.delete(self.prefix + call_id)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+    'redis': RedisBackend,
+}
+
+
+def make_backend(kind: str, url: Optional[str] = None) -> StateBackend:
+    """Build a backend by name; url is the SQLite path or Redis URL"""
+    kind = kind.lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown STATE_BACKEND: {kind} (expected one of {', '.join(BACKENDS)})")
+    if kind == 'memory' or not url:
+        return BACKENDS[kind]()
+    return BACKENDS[kind](url)
+
+
+class ContextSync:
+    """Keeps one worker's ContextStore in step with a shared StateBackend
+
+    At the start of a turn ``checkout`` fetches the call's stored version and
+    only decodes the context if another worker has written a newer one. At
+    the end ``commit`` bumps the version and queues the packed context;
+    queued writes are coalesced per call and flushed in batches every
+    ``flush_interval`` seconds (write-behind), or immediately when the
+    interval is 0. If another worker wrote the call first, the stored
+    version wins and the local copy is dropped so the next turn reloads it.
+    """
+
+    def __init__(self, backend: StateBackend, contexts: ContextStore, history_limit: Optional[int] = None,
+                 ttl: float = 1800, flush_interval: float = 0.05, purge_interval: float = 60):
+        self.backend = backend
+        self.contexts = contexts
+        self.history_limit = history_limit
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+        self._pending: Dict[str, StateWrite] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reads = 0
+        self.local_hits = 0
+        self.decodes = 0
+        self.writes = 0
+        self.batches = 0
+        self.conflicts = 0
+        self.bytes_written = 0
+        self.errors = 0
+
+    def checkout(self, call_id: str) -> Optional[CallSession]:
+        """The call's latest session, registered in the local store; None for a new call"""
+        with self._lock:
+            pending = self._pending.get(call_id)
+        local = self.contexts.get(call_id)
+        if pending is not None:
+            # Our own unflushed write is newer than anything stored
+            self.local_hits += 1
+            if local is None:
+                local = self._decode(call_id, pending[3])
+            return local
+
+        self.reads += 1
+        stored = self.backend.get(call_id)
+        if stored is None:
+            self.contexts.pop(call_id, None)
+            return None
+        version, blob = stored
+        if local is not None and local.version == version:
+            self.local_hits += 1
+            return local
+        return self._decode(call_id, blob)
+
+    def _decode(self, call_id: str, blob: bytes) -> CallSession:
+        self.decodes += 1
+        context = unpack_context(blob, self.history_limit)
+        self.contexts[call_id] = context
+        return context
+
+    def commit(self, call_id: str, context: CallSession) -> None:
+        """Record the end of a turn and queue the session for the shared store"""
+        expected = context.version
+        context.version = expected + 1
+        blob = pack_context(context)
+        with self._lock:
+            queued = self._pending.get(call_id)
+            if queued is not None:
+                # Coalesce with the unflushed write; the store still holds its base version
+                expected = queued[1]
+            self._pending[call_id] = (call_id, expected, context.version, blob)
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def discard(self, call_id: str) -> None:
+        """Forget a finished call locally and in the shared store"""
+        with self._lock:
+            self._pending.pop(call_id, None)
+        self.contexts.pop(call_id, None)
+        self.backend.delete(call_id)
+
+    def flush(self) -> int:
+        """Write every queued context in one batch; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                writes = list(self._pending.values())
+                self._pending.clear()
+            if not writes:
+                return 0
+            try:
+                conflicts = self.backend.put_many(writes, self.ttl)
+            except Exception as e:
+                # Requeue anything not superseded meanwhile so the next flush retries it
+                print(f"Conversation state flush error: {e}")
+                with self._lock:
+                    for write in writes:
+                        self._pending.setdefault(write[0], write)
+                self.errors += 1
+                return 0
+            self.batches += 1
+            self.writes += len(writes) - len(conflicts)
+            self.bytes_written += sum(len(write[3]) for write in writes)
+            for call_id in conflicts:
+                self.conflicts += 1
+                self.contexts.pop(call_id, None)
+            return len(writes) - len(conflicts)
+
+    def start_flusher(self) -> Optional[threading.Thread]:
+        """Flush queued writes in the background; not needed for write-through"""
+        if self.flush_interval <= 0:
+            return None
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="state-flusher", daemon=True)
+            self._flusher.start()
+        return self._flusher
+
+    def stop(self) -> None:
+        """Stop the background flusher and write out anything still queued"""
+        self._stop.set()
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        next_purge = time.monotonic() + self.purge_interval
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            if time.monotonic() >= next_purge:
+                try:
+                    self.backend.purge()
+                except Exception as e:
+                    print(f"Conversation state purge error: {e}")
+                next_purge = time.monotonic() + self.purge_interval
+
+    def stats(self) -> Dict:
+        """Read, write and conflict counters for monitoring"""
+        return {
+            "backend": self.backend.name,
+            "serialization": "msgpack" if msgpack is not None else "json",
+            "flush_interval": self.flush_interval,
+            "pending": len(self._pending),
+            "reads": self.reads,
+            "local_hits": self.local_hits,
+            "decodes": self.decodes,
+            "writes": self.writes,
+            "batches": self.batches,
+            "conflicts": self.conflicts,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written
+        }
@@ -493,6 +493,9 @@ class EZCatersVoiceAgent {
 }
 
 // Search functionality
+// Last response per query, revalidated with If-None-Match so repeat searches come back as 304s
+const searchCache = new Map();
+
 async function performSearch() {
     const searchType = document.getElementById('searchType').value;
     const searchQuery = document.getElementById('searchQuery').value.trim();
@@ -512,20 +515,36 @@ async function performSearch() {
     `;
     
     try {
+        const body = JSON.stringify({
+            type: searchType,
+            query: searchQuery
+        });
+        const cached = searchCache.get(body);
+        const headers = {
+            'Content-Type': 'application/json',
+        };
+        if (cached) {
+            headers['If-None-Match'] = cached.etag;
+        }
+        
         const response = await fetch('/search', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                type: searchType,
-                query: searchQuery
-            })
+            headers: headers,
+            body: body
         });
         
+        if (response.status === 304 && cached) {
+            displaySearchResults(cached.data.results);
+            return;
+        }
+        
         const data = await response.json();
         
         if (response.ok) {
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                searchCache.set(body, { etag: etag, data: data });
+            }
             displaySearchResults(data.results);
         } else {
             throw new Error(data.error || 'Search failed');
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import re
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, Iterator, Sequence, Set, Tuple, Union
+
+GRAM_SIZE = 3
+
+
+def normalize_term(text: str) -> str:
+    """Lowercase and collapse whitespace so index keys and queries compare equal"""
+    return re.sub(r'\s+', ' ', (text or '').lower()).strip()
+
+
+def _grams(term: str) -> Set[str]:
+    return {term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)}
+
+
+class TermIndex:
+    """Inverted index from normalized terms to item ids with substring lookup
+
+    Postings map each distinct term (a cuisine name, a specialty) to the ids
+    that carry it. A trigram index over the term vocabulary answers substring
+    queries by intersecting gram sets, so a lookup touches only the matching
+    terms and their postings rather than every item in the catalog.
+
+    Postings loaded from a catalog snapshot stay read-only sequences over the
+    mapped file until an add or remove touches that term.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Union[Set[Hashable], Sequence[Hashable]]] = defaultdict(set)
+        self._grams: Dict[str, Set[str]] = defaultdict(set)
+
+    @classmethod
+    def from_postings(cls, postings: Iterable[Tuple[str, Sequence[Hashable]]]) -> "TermIndex":
+        """Build an index from already-normalized (term, ids) pairs, keeping the id sequences as given"""
+        index = cls()
+        for term, ids in postings:
+            for gram in _grams(term):
+                index._grams[gram].add(term)
+            index._postings[term] = ids
+        return index
+
+    def postings(self) -> Iterator[Tuple[str, Iterable[Hashable]]]:
+        """Every (term, ids) pair"""
+        return iter(self._postings.items())
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def _writable(self, term: str) -> Set[Hashable]:
+        postings = self._postings[term]
+        if not isinstance(postings, set):
+            postings = self._postings[term] = set(postings)
+        return postings
+
+    def add(self, item_id: Hashable, terms: Iterable[str]) -> None:
+        """Index an item under each of its terms"""
+        for term in map(normalize_term, terms):
+            if term not in self._postings:
+                for gram in _grams(term):
+                    self._grams[gram].add(term)
+            self._writable(term).add(item_id)
+
+    def remove(self, item_id: Hashable, terms: Iterable[str]) -> None:
+        """Unindex an item, dropping terms nobody carries any more"""
+        for term in map(normalize_term, terms):
+            if term not in self._postings:
+                continue
+            postings = self._writable(term)
+            postings.discard(item_id)
+            if postings:
+                continue
+            del self._postings[term]
+            for gram in _grams(term):
+                terms_with_gram = self._grams[gram]
+                terms_with_gram.discard(term)
+                if not terms_with_gram:
+                    del self._grams[gram]
+
+    def matching_terms(self, query: str) -> Set[str]:
+        """Return every indexed term that contains the query as a substring"""
+        query = normalize_term(query)
+        if len(query) < GRAM_SIZE:
+            # Too short for trigrams; the vocabulary is small compared with the catalog
+            return {term for term in self._postings if query in term}
+
+        candidates = None
+        for gram in sorted(_grams(query), key=lambda g: len(self._grams.get(g, ()))):
+            terms_with_gram = self._grams.get(gram)
+            if not terms_with_gram:
+                return set()
+            candidates = set(terms_with_gram) if candidates is None else candidates & terms_with_gram
+            if not candidates:
+                return set()
+        return {term for term in candidates if query in term}
+
+    def search_weighted(self, query: str) -> Dict[Hashable, float]:
+        """Ids of items with any term containing the query, each with how much of its best term the query covers"""
+        query = normalize_term(query)
+        weights: Dict[Hashable, float] = {}
+        # Weakest terms first, so an item carrying several keeps its strongest weight
+        for term in sorted(self.matching_terms(query), key=len, reverse=True):
+            weights.update(dict.fromkeys(self._postings[term], len(query) / len(term) if term else 1.0))
+        return weights
+
+    def search(self, query: str) -> Set[Hashable]:
+        """Return ids of items with any term containing the query"""
+        terms = self.matching_terms(query)
+        if len(terms) == 1:
+            return set(self._postings[terms.pop()])
+        ids = set()
+        for term in terms:
+            ids.update(self._postings[term])
+        return ids